@@ -0,0 +1,184 @@
+"""Prompt compile time on long chains and wide graphs.
+
+Compares ComfyPromptManager against the re-push stack it replaced, which
+ran a node again every time one of its inputs wasn't compiled yet, and a
+full compile against one after editing a single SaveImage input. The
+profile is the CompileProfile summary of a cold compile.
+
+    python -m benchmarks.compile --chain 1000 --wide 300
+"""
+
+from typing import Any, Callable, Dict, List, Type
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.throughput import connect
+from node import Node, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from server import ComfyPromptManager
+from style.socketStyle import SocketStyles
+
+fixture = os.path.join(os.path.dirname(__file__), "fixtures", "object_info.json")
+
+
+def chain(factory: ComfyFactory, length: int) -> SceneCollection:
+    """An empty latent upscaled `length` times in a row, then decoded."""
+    collection = SceneCollection(factory)
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    previous = factory.loadNode("EmptyLatentImage")
+    for _ in range(length):
+        upscale = factory.loadNode("LatentUpscaleBy")
+        connect(collection, previous, 0, upscale, "samples")
+        previous = upscale
+    decode = factory.loadNode("VAEDecode")
+    save = factory.loadNode("SaveImage")
+    connect(collection, previous, 0, decode, "samples")
+    connect(collection, ckpt, 2, decode, "vae")
+    connect(collection, decode, 0, save, "images")
+    return collection
+
+
+def wide(factory: ComfyFactory, width: int) -> SceneCollection:
+    """`width` sampler branches that all read the same loader and prompts."""
+    collection = SceneCollection(factory)
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    positive = factory.loadNode("CLIPTextEncode")
+    negative = factory.loadNode("CLIPTextEncode")
+    latent = factory.loadNode("EmptyLatentImage")
+    connect(collection, ckpt, 1, positive, "clip")
+    connect(collection, ckpt, 1, negative, "clip")
+    for _ in range(width):
+        sampler = factory.loadNode("KSampler")
+        decode = factory.loadNode("VAEDecode")
+        save = factory.loadNode("SaveImage")
+        connect(collection, ckpt, 0, sampler, "model")
+        connect(collection, positive, 0, sampler, "positive")
+        connect(collection, negative, 0, sampler, "negative")
+        connect(collection, latent, 0, sampler, "latent_image")
+        connect(collection, sampler, 0, decode, "samples")
+        connect(collection, ckpt, 2, decode, "vae")
+        connect(collection, decode, 0, save, "images")
+    return collection
+
+
+def repushCompile(collection: SceneCollection) -> ComfyPromptManager:
+    """The compile loop before the topological compiler."""
+    promptManager = ComfyPromptManager()
+    for scene in [collection.rootScene] + collection.scenes:
+        for output in [n for n in scene.nodes if n.isOutput]:
+            promptManager.executeNode(output)
+            while len(promptManager.executionStack) > 0:
+                node = promptManager.executionStack.pop()
+                result = node.execute(promptManager)
+                if result is not None:
+                    nodeAddress = node.getNodeAddress(promptManager)
+                    promptManager.idMap[node] = nodeAddress
+                    promptManager.partialPrompts[nodeAddress] = result[0]
+                    promptManager.outputMap[nodeAddress] = result[1]
+    promptManager.prompt = {
+        k: v.toPrompt()
+        for k, v in promptManager.partialPrompts.items()
+        if not v.isEmpty
+    }
+    return promptManager
+
+
+def topologicalCompile(collection: SceneCollection) -> ComfyPromptManager:
+    for scene in [collection.rootScene] + collection.scenes:
+        for node in scene.nodes:
+            node.compiled = None
+    return collection.compile()
+
+
+def editedCompile(collection: SceneCollection) -> ComfyPromptManager:
+    save = [n for n in collection.rootScene.nodes if n.nodeClass == "SaveImage"][-1]
+    prefix = [s for s in save.inputs if s.name == "filename_prefix"][0]
+    prefix.content = "edited" if prefix.content != "edited" else "ComfyUI"
+    return collection.compile()
+
+
+def executingClasses() -> List[Type[Node]]:
+    """Node and every subclass with its own execute, group and reroute
+    nodes override it without calling Node.execute."""
+    classes: List[Type[Node]] = []
+    pending: List[Type[Node]] = [Node]
+    while len(pending) > 0:
+        cls = pending.pop()
+        if "execute" in cls.__dict__ and cls not in classes:
+            classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def measure(
+    collection: SceneCollection,
+    compile: Callable[[SceneCollection], ComfyPromptManager],
+    repeat: int,
+) -> Dict[str, Any]:
+    executions = 0
+
+    def counting(execute: Callable[..., Any]) -> Callable[..., Any]:
+        def countingExecute(node: Node, promptManager: ComfyPromptManager) -> Any:
+            nonlocal executions
+            executions += 1
+            return execute(node, promptManager)
+
+        return countingExecute
+
+    executes = {cls: cls.__dict__["execute"] for cls in executingClasses()}
+    for cls, execute in executes.items():
+        setattr(cls, "execute", counting(execute))
+    try:
+        compile(collection)
+    finally:
+        for cls, execute in executes.items():
+            setattr(cls, "execute", execute)
+    times: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compile(collection)
+        times.append(time.perf_counter() - started)
+    return {
+        "ms": round(min(times) * 1000, 2),
+        "nodeExecutions": executions,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chain", type=int, default=1000)
+    parser.add_argument("--wide", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    factory = ComfyFactory(SocketStyles())
+    with open(fixture, "rb") as f:
+        factory.loadNodeDefinitions(f.read())
+    report: Dict[str, Any] = {}
+    for name, collection in (
+        (f"chain{args.chain}", chain(factory, args.chain)),
+        (f"wide{args.wide}", wide(factory, args.wide)),
+    ):
+        nodes = sum(len(s.nodes) for s in [collection.rootScene] + collection.scenes)
+        old = repushCompile(collection)
+        new = collection.compile()
+        report[name] = {
+            "nodes": nodes,
+            "samePrompt": old.prompt == new.prompt,
+            "repush": measure(collection, repushCompile, args.repeat),
+            "topological": measure(collection, topologicalCompile, args.repeat),
+            "afterOneEdit": measure(collection, editedCompile, args.repeat),
+            "profile": collection.profile().summary(),
+        }
+    print(json.dumps(report, indent=2))
+    # PySide can crash tearing down the scene graph at interpreter exit
+    os._exit(0)
@@ -0,0 +1,447 @@
+"""Stand-in for a ComfyUI server, standard library only.
+
+Serves a recorded /object_info, accepts prompts on /prompt and plays back the
+websocket traffic of executing them (executing, progress, binary previews,
+executed) with configurable timings, so the client can be exercised and
+benchmarked without a GPU. Pending prompts can be deleted through /queue and
+the running one stopped through /interrupt.
+
+    python -m benchmarks.fakeComfy --port 8188 --step-time 0.05
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+import argparse
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import urllib.parse as parse
+import uuid
+import zlib
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "object_info.json")
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# binary websocket event types and image formats as sent by ComfyUI
+PREVIEW_IMAGE = 1
+PNG = 2
+
+
+def solidPng(
+    width: int, height: int, rgb: Tuple[int, int, int] = (128, 96, 64)
+) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeTimings:
+    """How long the fake server pretends things take, in seconds."""
+
+    def __init__(
+        self,
+        postLatency: float = 0.0,
+        nodeTime: float = 0.0,
+        stepTime: float = 0.0,
+        maxSteps: int | None = None,
+        previewEvery: int = 0,
+        previewSize: int = 64,
+    ) -> None:
+        self.postLatency = postLatency
+        self.nodeTime = nodeTime
+        self.stepTime = stepTime
+        # caps the steps input of samplers, None keeps the prompt's value
+        self.maxSteps = maxSteps
+        # send a preview every n sampler steps, 0 disables previews
+        self.previewEvery = previewEvery
+        self.previewSize = previewSize
+
+
+class webSocketClient:
+    """Server side of a websocket connection, frames are never fragmented."""
+
+    def __init__(self, handler: BaseHTTPRequestHandler, clientId: str) -> None:
+        self.handler = handler
+        self.clientId = clientId
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, opcode: int, payload: bytes) -> None:
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([126]) + struct.pack(">H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack(">Q", len(payload))
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.handler.wfile.write(header + payload)
+            except OSError:
+                self.closed = True
+
+    def sendJSON(self, msgType: str, data: Dict[str, Any]) -> None:
+        self.send(0x1, json.dumps({"type": msgType, "data": data}).encode())
+
+    def _read(self, n: int) -> bytes:
+        data = self.handler.rfile.read(n)
+        if len(data) < n:
+            raise ConnectionError("websocket closed")
+        return data
+
+    def serve(self) -> None:
+        """Answers pings and close frames until the client goes away."""
+        try:
+            while True:
+                first, second = self._read(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack(">H", self._read(2))[0]
+                elif length == 127:
+                    length = struct.unpack(">Q", self._read(8))[0]
+                mask = self._read(4) if second & 0x80 else b"\x00" * 4
+                payload = bytes(
+                    b ^ mask[i % 4] for i, b in enumerate(self._read(length))
+                )
+                if opcode == 0x8:
+                    self.send(0x8, payload[:2])
+                    break
+                if opcode == 0x9:
+                    self.send(0xA, payload)
+        except (OSError, ConnectionError):
+            pass
+        with self._lock:
+            self.closed = True
+
+
+class FakeComfyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        timings: FakeTimings | None = None,
+        objectInfoPath: str = FIXTURE,
+    ) -> None:
+        super().__init__(address, fakeComfyHandler)
+        self.timings = timings if timings is not None else FakeTimings()
+        with open(objectInfoPath, "rb") as f:
+            self.objectInfo = f.read()
+        self.clients: Dict[str, webSocketClient] = {}
+        self.history: Dict[str, Dict[str, Any]] = {}
+        self.pending: List[Tuple[int, str, Dict[str, Any], str]] = []
+        self.running: Tuple[int, str, Dict[str, Any], str] | None = None
+        self.images: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stopped = False
+        self._interrupt = threading.Event()
+        self._number = 0
+        self.promptsExecuted = 0
+        self._executor = threading.Thread(target=self._execute, daemon=True)
+
+    @property
+    def serverAddress(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host!s}:{port}"
+
+    def start(self) -> "FakeComfyServer":
+        self._executor.start()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        self.shutdown()
+        self.server_close()
+
+    def queuePrompt(
+        self, prompt: Dict[str, Any], clientId: str, front: bool = False
+    ) -> Tuple[str, int]:
+        promptId = str(uuid.uuid4())
+        with self._wake:
+            # like ComfyUI, the lowest number runs first
+            number = -self._number if front else self._number
+            self._number += 1
+            entry = (number, promptId, prompt, clientId)
+            self.pending.append(entry)
+            self.pending.sort(key=lambda e: e[0])
+            self._wake.notify()
+        return promptId, number
+
+    def deleteQueued(self, promptIds: List[str]) -> None:
+        with self._lock:
+            self.pending = [e for e in self.pending if e[1] not in promptIds]
+
+    def clearQueue(self) -> None:
+        with self._lock:
+            self.pending = []
+
+    def interrupt(self) -> None:
+        self._interrupt.set()
+
+    def queueState(self) -> Dict[str, Any]:
+        def item(entry: Tuple[int, str, Dict[str, Any], str]) -> List[Any]:
+            number, promptId, prompt, clientId = entry
+            return [number, promptId, prompt, {"client_id": clientId}, []]
+
+        with self._lock:
+            return {
+                "queue_running": [item(self.running)] if self.running else [],
+                "queue_pending": [item(e) for e in self.pending],
+            }
+
+    def _send(self, clientId: str, msgType: str, data: Dict[str, Any]) -> None:
+        client = self.clients.get(clientId, None)
+        if client is not None:
+            client.sendJSON(msgType, data)
+
+    def _execute(self) -> None:
+        while True:
+            with self._wake:
+                while len(self.pending) == 0 and not self._stopped:
+                    self._wake.wait()
+                if self._stopped:
+                    return
+                entry = self.pending.pop(0)
+                self.running = entry
+                self._interrupt.clear()
+            number, promptId, prompt, clientId = entry
+            self._run(promptId, prompt, clientId)
+            with self._lock:
+                self.running = None
+                self.promptsExecuted += 1
+
+    def _run(self, promptId: str, prompt: Dict[str, Any], clientId: str) -> None:
+        timings = self.timings
+        client = self.clients.get(clientId, None)
+        preview = solidPng(timings.previewSize, timings.previewSize)
+        previewFrame = struct.pack(">II", PREVIEW_IMAGE, PNG) + preview
+        outputs: Dict[str, Any] = {}
+        self._send(clientId, "execution_start", {"prompt_id": promptId})
+        for nodeId, node in prompt.items():
+            if self._interrupt.is_set():
+                self._send(
+                    clientId,
+                    "execution_interrupted",
+                    {"prompt_id": promptId, "node_id": nodeId},
+                )
+                return
+            self._send(
+                clientId,
+                "executing",
+                {"node": nodeId, "display_node": nodeId, "prompt_id": promptId},
+            )
+            if timings.nodeTime > 0:
+                time.sleep(timings.nodeTime)
+            steps = node.get("inputs", {}).get("steps", None)
+            if isinstance(steps, int):
+                if timings.maxSteps is not None:
+                    steps = min(steps, timings.maxSteps)
+                for step in range(1, steps + 1):
+                    if self._interrupt.is_set():
+                        break
+                    if timings.stepTime > 0:
+                        time.sleep(timings.stepTime)
+                    self._send(
+                        clientId,
+                        "progress",
+                        {
+                            "value": step,
+                            "max": steps,
+                            "prompt_id": promptId,
+                            "node": nodeId,
+                        },
+                    )
+                    if client is not None and timings.previewEvery > 0:
+                        if step % timings.previewEvery == 0:
+                            client.send(0x2, previewFrame)
+            if node.get("class_type", "") in ("SaveImage", "PreviewImage"):
+                filename = f"{promptId}_{nodeId}.png"
+                with self._lock:
+                    self.images[filename] = preview
+                images = [{"filename": filename, "subfolder": "", "type": "output"}]
+                outputs[nodeId] = {"images": images}
+                self._send(
+                    clientId,
+                    "executed",
+                    {"node": nodeId, "output": outputs[nodeId], "prompt_id": promptId},
+                )
+        with self._lock:
+            self.history[promptId] = {
+                "prompt": [0, promptId, prompt, {"client_id": clientId}, []],
+                "outputs": outputs,
+                "status": {"status_str": "success", "completed": True},
+            }
+        self._send(clientId, "executing", {"node": None, "prompt_id": promptId})
+
+
+class fakeComfyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, don't let them wait on delayed acks
+    disable_nagle_algorithm = True
+    server: FakeComfyServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(
+        self, body: bytes, status: int = 200, contentType: str = "application/json"
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _replyJSON(self, data: Any, status: int = 200) -> None:
+        self._reply(json.dumps(data).encode(), status)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self) -> None:
+        url = parse.urlsplit(self.path)
+        query = parse.parse_qs(url.query)
+        if url.path == "/ws":
+            self._webSocket(query.get("clientId", [str(uuid.uuid4())])[0])
+        elif url.path == "/object_info":
+            self._reply(self.server.objectInfo)
+        elif url.path == "/queue":
+            self._replyJSON(self.server.queueState())
+        elif url.path.startswith("/history/"):
+            promptId = parse.unquote(url.path[len("/history/") :])
+            entry = self.server.history.get(promptId, None)
+            self._replyJSON({promptId: entry} if entry is not None else {})
+        elif url.path == "/view":
+            image = self.server.images.get(query.get("filename", [""])[0], None)
+            if image is None:
+                self._reply(b"", 404)
+            else:
+                self._reply(image, contentType="image/png")
+        else:
+            self._reply(b"", 404)
+
+    def do_HEAD(self) -> None:
+        url = parse.urlsplit(self.path)
+        query = parse.parse_qs(url.query)
+        filename = query.get("filename", [""])[0]
+        if url.path == "/view" and filename in self.server.images:
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(self.server.images[filename])))
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        if self.path == "/queue":
+            data = json.loads(self._body() or b"{}")
+            if data.get("clear", False):
+                self.server.clearQueue()
+            if "delete" in data:
+                self.server.deleteQueued(data["delete"])
+            self._reply(b"")
+            return
+        if self.path == "/interrupt":
+            self._body()
+            self.server.interrupt()
+            self._reply(b"")
+            return
+        if self.path != "/prompt":
+            self._reply(b"", 404)
+            return
+        try:
+            data = json.loads(self._body())
+            prompt = data["prompt"]
+            clientId = data.get("client_id", "")
+            front = bool(data.get("front", False))
+        except (ValueError, KeyError):
+            error = {"type": "invalid_prompt", "message": "Invalid prompt"}
+            self._replyJSON({"error": error, "node_errors": {}}, 400)
+            return
+        if self.server.timings.postLatency > 0:
+            time.sleep(self.server.timings.postLatency)
+        promptId, number = self.server.queuePrompt(prompt, clientId, front)
+        self._replyJSON({"prompt_id": promptId, "number": number, "node_errors": {}})
+
+    def _webSocket(self, clientId: str) -> None:
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        client = webSocketClient(self, clientId)
+        self.server.clients[clientId] = client
+        remaining = self.server.queueState()
+        client.sendJSON(
+            "status",
+            {
+                "status": {
+                    "exec_info": {
+                        "queue_remaining": len(remaining["queue_pending"])
+                        + len(remaining["queue_running"])
+                    }
+                },
+                "sid": clientId,
+            },
+        )
+        client.serve()
+        if self.server.clients.get(clientId, None) is client:
+            del self.server.clients[clientId]
+        self.close_connection = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--object-info", default=FIXTURE)
+    parser.add_argument("--post-latency", type=float, default=0.0)
+    parser.add_argument("--node-time", type=float, default=0.0)
+    parser.add_argument("--step-time", type=float, default=0.05)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--preview-every", type=int, default=1)
+    parser.add_argument("--preview-size", type=int, default=256)
+    args = parser.parse_args()
+    server = FakeComfyServer(
+        (args.host, args.port),
+        FakeTimings(
+            args.post_latency,
+            args.node_time,
+            args.step_time,
+            args.max_steps,
+            args.preview_every,
+            args.preview_size,
+        ),
+        args.object_info,
+    )
+    print(f"fake ComfyUI on {server.serverAddress}")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
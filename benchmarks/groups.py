@@ -0,0 +1,102 @@
+"""Compile time of a graph reusing one group scene many times.
+
+A group of `--size` latent upscales is chained `--instances` times and
+compared with the same graph built flat, cold and after editing a node
+inside the group or in the root scene.
+
+    python -m benchmarks.groups --size 50 --instances 100
+"""
+
+from typing import Any, Dict
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.compile import chain, editedCompile, fixture, measure
+from benchmarks.compile import topologicalCompile
+from benchmarks.throughput import connect
+from node import NodeEdge, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from server import ComfyPromptManager
+from specialNodes.nodes.groupNode import GroupNode
+from style.socketStyle import SocketStyles
+
+
+def grouped(factory: ComfyFactory, size: int, instances: int) -> SceneCollection:
+    """The chain benchmark graph with its upscales in `instances` group
+    nodes of `size` upscales each."""
+    collection = SceneCollection(factory)
+    group = collection.addGroupScene("upscale")
+    factory.activeScene = group
+    groupIn = factory.loadNode("GroupIn")
+    groupOut = factory.loadNode("GroupOut")
+    previous, slot = groupIn, 0
+    for _ in range(size):
+        upscale = factory.loadNode("LatentUpscaleBy")
+        target = [s for s in upscale.inputs if s.name == "samples"][0]
+        NodeEdge(group, previous.outputs[slot].socket, target.socket)
+        previous, slot = upscale, 0
+    NodeEdge(group, previous.outputs[0].socket, groupOut.inputs[0].socket)
+
+    factory.activeScene = collection.rootScene
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    previous = factory.loadNode("EmptyLatentImage")
+    for _ in range(instances):
+        groupNode = factory.loadNode("GroupNode")
+        assert isinstance(groupNode, GroupNode)
+        groupNode.setGroupScene(group)
+        connect(collection, previous, 0, groupNode, "samples")
+        previous = groupNode
+    decode = factory.loadNode("VAEDecode")
+    save = factory.loadNode("SaveImage")
+    connect(collection, previous, 0, decode, "samples")
+    connect(collection, ckpt, 2, decode, "vae")
+    connect(collection, decode, 0, save, "images")
+    return collection
+
+
+def coldCompile(collection: SceneCollection) -> ComfyPromptManager:
+    for scene in collection.scenes:
+        scene.groupTemplate = None
+    return topologicalCompile(collection)
+
+
+def groupEditedCompile(collection: SceneCollection) -> ComfyPromptManager:
+    upscale = [n for n in collection.scenes[0].nodes if n.nodeClass != "GroupIn"][-1]
+    scale = [s for s in upscale.inputs if s.name == "scale_by"][0]
+    scale.content = 2.0 if scale.content != 2.0 else 1.5
+    return collection.compile()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=50)
+    parser.add_argument("--instances", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    factory = ComfyFactory(SocketStyles())
+    with open(fixture, "rb") as f:
+        factory.loadNodeDefinitions(f.read())
+    flat = chain(factory, args.size * args.instances)
+    groups = grouped(factory, args.size, args.instances)
+    report: Dict[str, Any] = {
+        "promptNodes": {
+            "flat": len(flat.compile().prompt),
+            "grouped": len(groups.compile().prompt),
+        },
+        "flat": measure(flat, topologicalCompile, args.repeat),
+        "grouped": measure(groups, coldCompile, args.repeat),
+        "groupedAfterGroupEdit": measure(groups, groupEditedCompile, args.repeat),
+        "groupedAfterRootEdit": measure(groups, editedCompile, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    # PySide can crash tearing down the scene graph at interpreter exit
+    os._exit(0)
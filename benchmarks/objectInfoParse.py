@@ -0,0 +1,113 @@
+"""Time and peak memory of loading /object_info, eager against lazy.
+
+Without --file the fixture is blown up to --nodes node classes with
+--combo entries in every combo list, about what a large custom node install
+sends.
+
+    python -m benchmarks.objectInfoParse --nodes 3000 --combo 500
+"""
+
+from typing import Any, Callable, Dict
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from node.factory.comfyFactory import ComfyFactory
+from node.factory.nodeDefinitions import LazyNodeDefinitions, parseSpec
+from style.socketStyle import SocketStyles
+
+fixture = os.path.join(os.path.dirname(__file__), "fixtures", "object_info.json")
+
+
+def syntheticPayload(nodes: int, combo: int) -> bytes:
+    with open(fixture, "rb") as f:
+        base: Dict[str, Any] = json.load(f)
+    payload: Dict[str, Any] = {}
+    for i in range(nodes):
+        name, spec = list(base.items())[i % len(base)]
+        spec = copy.deepcopy(spec)
+        spec["category"] = f"custom_{i // 50}/{spec['category']}"
+        spec["display_name"] = f"{spec['display_name']} {i}"
+        for inputs in spec["input"].values():
+            for inputSpec in inputs.values():
+                if isinstance(inputSpec[0], list):
+                    inputSpec[0] = [
+                        f"models/option_{j}.safetensors" for j in range(combo)
+                    ]
+        payload[f"{name}_{i}"] = spec
+    return json.dumps(payload).encode("utf-8")
+
+
+def measure(run: Callable[[], Any]) -> Dict[str, float]:
+    """Best of three times, then the peak memory in a separate run since
+    tracing allocations slows the allocation heavy paths down the most."""
+    times = []
+    for _ in range(3):
+        gc.collect()
+        started = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - started)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"ms": round(min(times) * 1000, 1), "peakMB": round(peak / 2**20, 1)}
+
+
+def loadFactory(data: bytes, lazy: bool) -> ComfyFactory:
+    factory = ComfyFactory(SocketStyles(), lazy)
+    factory.loadNodeDefinitions(data)
+    return factory
+
+
+def firstUse(data: bytes, count: int) -> Any:
+    """Index, then look up `count` node classes like a small graph would."""
+    definitions = LazyNodeDefinitions(data)
+    for name in list(definitions)[:count]:
+        definitions[name]
+    return definitions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--file", default=None, help="A saved /object_info payload.")
+    parser.add_argument("--nodes", type=int, default=3000)
+    parser.add_argument("--combo", type=int, default=500)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    if args.file is not None:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    else:
+        data = syntheticPayload(args.nodes, args.combo)
+    definitions = LazyNodeDefinitions(data)
+    report: Dict[str, Any] = {
+        "payloadMB": round(len(data) / 2**20, 1),
+        "nodes": len(definitions),
+        "parse": {
+            "eager": measure(lambda: parseSpec(data)),
+            "lazy": measure(lambda: LazyNodeDefinitions(data)),
+            "lazy+20 nodes": measure(lambda: firstUse(data, 20)),
+            "lazy+all nodes": measure(lambda: firstUse(data, len(definitions))),
+        },
+        "factory": {
+            "eager": measure(lambda: loadFactory(data, False)),
+            "lazy": measure(lambda: loadFactory(data, True)),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    os._exit(0)
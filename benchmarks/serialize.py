@@ -0,0 +1,143 @@
+"""Serializing a compiled prompt for sending: dict tree vs PromptWriter.
+
+Each send hashes the prompt and writes the /prompt request body. The dict
+path builds the prompt dict from the partial prompts and encodes it twice,
+like submitting did before PromptWriter. The writer copies the cached JSON
+of every node into its buffer, cold is the first send after every node
+changed.
+
+    python -m benchmarks.serialize --branches 200 --text 8192
+"""
+
+from typing import Any, Callable, Dict, List
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.compile import fixture
+from benchmarks.throughput import connect
+from node import SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from server import ComfyPromptManager, PromptWriter
+from style.socketStyle import SocketStyles
+
+clientId = "benchmark"
+
+
+def prompts(factory: ComfyFactory, branches: int, text: int) -> SceneCollection:
+    """`branches` samplers, each with its own prompt of `text` characters."""
+    collection = SceneCollection(factory)
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    negative = factory.loadNode("CLIPTextEncode")
+    latent = factory.loadNode("EmptyLatentImage")
+    connect(collection, ckpt, 1, negative, "clip")
+    words = "a watercolor painting of a lighthouse at dusk, ölfarbe, 夕暮れ, "
+    for i in range(branches):
+        positive = factory.loadNode("CLIPTextEncode")
+        [s for s in positive.inputs if s.name == "text"][0].content = (
+            f"{i} " + words * (text // len(words) + 1)
+        )[:text]
+        sampler = factory.loadNode("KSampler")
+        decode = factory.loadNode("VAEDecode")
+        save = factory.loadNode("SaveImage")
+        connect(collection, ckpt, 1, positive, "clip")
+        connect(collection, ckpt, 0, sampler, "model")
+        connect(collection, positive, 0, sampler, "positive")
+        connect(collection, negative, 0, sampler, "negative")
+        connect(collection, latent, 0, sampler, "latent_image")
+        connect(collection, sampler, 0, decode, "samples")
+        connect(collection, ckpt, 2, decode, "vae")
+        connect(collection, decode, 0, save, "images")
+    return collection
+
+
+def dictSend(promptManager: ComfyPromptManager) -> bytes:
+    """Hashing and writing the body the way submitting did before."""
+    prompt = {
+        k: v.toPrompt()
+        for k, v in promptManager.partialPrompts.items()
+        if not v.isEmpty
+    }
+    canonical = json.dumps(
+        prompt, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return json.dumps({"prompt": prompt, "client_id": clientId}).encode("utf-8")
+
+
+def writerSend(writer: PromptWriter) -> Callable[[ComfyPromptManager], Any]:
+    def send(promptManager: ComfyPromptManager) -> None:
+        writer.write(promptManager.partialPrompts).release()
+        writer.promptHash()
+        writer.writeBody(promptManager.partialPrompts, clientId).release()
+
+    return send
+
+
+def uncache(promptManager: ComfyPromptManager) -> None:
+    for partial in promptManager.partialPrompts.values():
+        partial._json = None
+
+
+def measure(
+    promptManager: ComfyPromptManager,
+    send: Callable[[ComfyPromptManager], Any],
+    repeat: int,
+    cold: bool = False,
+) -> Dict[str, Any]:
+    send(promptManager)
+    times: List[float] = []
+    for _ in range(repeat):
+        if cold:
+            uncache(promptManager)
+        started = time.perf_counter()
+        send(promptManager)
+        times.append(time.perf_counter() - started)
+    if cold:
+        uncache(promptManager)
+    tracemalloc.start()
+    send(promptManager)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(min(times) * 1000, 2), "peakMB": round(peak / 2**20, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--branches", type=int, default=200)
+    parser.add_argument("--text", type=int, default=8192)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    factory = ComfyFactory(SocketStyles())
+    with open(fixture, "rb") as f:
+        factory.loadNodeDefinitions(f.read())
+    promptManager = prompts(factory, args.branches, args.text).compile()
+    writer = PromptWriter()
+    body = bytes(writer.writeBody(promptManager.partialPrompts, clientId))
+    canonical = json.dumps(
+        promptManager.prompt, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    report: Dict[str, Any] = {
+        "nodes": len(promptManager.prompt),
+        "bodyMB": round(len(body) / 2**20, 2),
+        "sameBody": json.loads(body)
+        == {"prompt": promptManager.prompt, "client_id": clientId},
+        "sameHash": writer.promptHash() == hashlib.sha256(canonical).hexdigest(),
+        "dict": measure(promptManager, dictSend, args.repeat),
+        "writerCold": measure(promptManager, writerSend(writer), args.repeat, True),
+        "writer": measure(promptManager, writerSend(writer), args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    # PySide can crash tearing down the scene graph at interpreter exit
+    os._exit(0)
@@ -0,0 +1,94 @@
+"""Parameter sweep prompts, stamped from a template against recompiled.
+
+Sweeps seed, cfg and the positive prompt of the default workflow. The
+recompiled side edits the slots like the widgets would and compiles after
+each edit, it runs --recompile variations and is scaled up to --variations.
+
+    python -m benchmarks.sweep --variations 10000
+"""
+
+from typing import Any, Dict, List
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.compile import fixture
+from benchmarks.throughput import txt2img
+from node import SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from nodeSlots.nodeSlot import NodeSlot
+from server import sweep
+from style.socketStyle import SocketStyles
+
+
+def sweptSlots(collection: SceneCollection) -> Dict[str, NodeSlot]:
+    nodes = collection.rootScene.nodes
+    sampler = [n for n in nodes if n.nodeClass == "KSampler"][0]
+    positive = [n for n in nodes if n.nodeClass == "CLIPTextEncode"][0]
+    return {
+        "seed": [s for s in sampler.inputs if s.name == "seed"][0],
+        "cfg": [s for s in sampler.inputs if s.name == "cfg"][0],
+        "text": [s for s in positive.inputs if s.name == "text"][0],
+    }
+
+
+def variations(count: int) -> List[Dict[str, Any]]:
+    texts = ["a cat", "a dog", "a fox", "an owl"]
+    cfgs = [5.0, 6.5, 8.0]
+    seeds = range(count // (len(texts) * len(cfgs)) + 1)
+    return list(itertools.islice(sweep(text=texts, cfg=cfgs, seed=seeds), count))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--variations", type=int, default=10000)
+    parser.add_argument("--recompile", type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    factory = ComfyFactory(SocketStyles())
+    with open(fixture, "rb") as f:
+        factory.loadNodeDefinitions(f.read())
+    collection = txt2img(factory)
+    slots = sweptSlots(collection)
+    values = variations(args.variations)
+
+    started = time.perf_counter()
+    template = collection.template(slots)
+    templated = time.perf_counter()
+    prompts = list(template.generate(values))
+    stamped = time.perf_counter()
+
+    recompiled: List[Dict[str, Any]] = []
+    recompileStarted = time.perf_counter()
+    for variation in values[: args.recompile]:
+        for name, value in variation.items():
+            slots[name].content = value
+        recompiled.append(collection.prompt())
+    recompileSeconds = time.perf_counter() - recompileStarted
+
+    perPrompt = recompileSeconds / max(1, len(recompiled))
+    report = {
+        "variations": len(prompts),
+        "samePrompts": recompiled == prompts[: len(recompiled)],
+        "template": {
+            "compileMs": round((templated - started) * 1000, 2),
+            "stampMs": round((stamped - templated) * 1000, 2),
+            "usPerPrompt": round((stamped - templated) / len(prompts) * 1e6, 2),
+        },
+        "recompile": {
+            "usPerPrompt": round(perPrompt * 1e6, 2),
+            "estimatedMs": round(perPrompt * len(prompts) * 1000, 1),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    # PySide can crash tearing down the scene graph at interpreter exit
+    os._exit(0)
@@ -0,0 +1,193 @@
+"""End to end throughput of compile -> POST /prompt -> websocket completion.
+
+Runs against the fake server from benchmarks.fakeComfy unless --server is
+given, keeps --concurrency prompts in flight and reports prompts per second
+and latency percentiles.
+
+    python -m benchmarks.throughput --prompts 500 --concurrency 8
+"""
+
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.fakeComfy import FakeComfyServer, FakeTimings
+from node import Node, NodeEdge, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from server import ComfyConnection
+from style.socketStyle import SocketStyles
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def connect(
+    collection: SceneCollection, a: Node, output: int, b: Node, name: str
+) -> None:
+    target = [slot for slot in b.inputs if slot.name == name][0]
+    NodeEdge(collection.rootScene, a.outputs[output].socket, target.socket)
+
+
+def txt2img(factory: ComfyFactory) -> SceneCollection:
+    """The default ComfyUI workflow."""
+    collection = SceneCollection(factory)
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    positive = factory.loadNode("CLIPTextEncode")
+    negative = factory.loadNode("CLIPTextEncode")
+    latent = factory.loadNode("EmptyLatentImage")
+    sampler = factory.loadNode("KSampler")
+    decode = factory.loadNode("VAEDecode")
+    save = factory.loadNode("SaveImage")
+    connect(collection, ckpt, 0, sampler, "model")
+    connect(collection, ckpt, 1, positive, "clip")
+    connect(collection, ckpt, 1, negative, "clip")
+    connect(collection, ckpt, 2, decode, "vae")
+    connect(collection, positive, 0, sampler, "positive")
+    connect(collection, negative, 0, sampler, "negative")
+    connect(collection, latent, 0, sampler, "latent_image")
+    connect(collection, sampler, 0, decode, "samples")
+    connect(collection, decode, 0, save, "images")
+    return collection
+
+
+class Benchmark:
+    def __init__(
+        self,
+        app: QApplication,
+        connection: ComfyConnection,
+        collection: SceneCollection,
+        prompts: int,
+        concurrency: int,
+    ) -> None:
+        self.app = app
+        self.connection = connection
+        self.collection = collection
+        self.prompts = prompts
+        self.concurrency = concurrency
+        self.submitted = 0
+        self.finished = 0
+        self.failed = 0
+        self.compileTimes: List[float] = []
+        self.postTimes: List[float] = []
+        self.latencies: List[float] = []
+        self.start = 0.0
+        self.end = 0.0
+        self._signals: Dict[str, Any] = {}
+
+    def run(self) -> None:
+        self.start = time.perf_counter()
+        for _ in range(min(self.concurrency, self.prompts)):
+            self.submit()
+        self.app.exec()
+        self.end = time.perf_counter()
+
+    def submit(self) -> None:
+        started = time.perf_counter()
+        prompt = self.collection.compile().prompt
+        # distinct seeds so no layer between here and the sampler can skip work
+        for node in prompt.values():
+            if "seed" in node["inputs"]:
+                node["inputs"]["seed"] = self.submitted
+        compiled = time.perf_counter()
+        self.submitted += 1
+        signals = self.connection.sendPrompt(prompt)
+        posted = time.perf_counter()
+        self.compileTimes.append(compiled - started)
+        self.postTimes.append(posted - compiled)
+        self._signals[signals.promptId] = signals
+        signals.failed.connect(self.onFailed)
+        signals.finished.connect(lambda: self.onFinished(signals.promptId, started))
+
+    def onFailed(self, msgType: str, data: Any) -> None:
+        self.failed += 1
+
+    def onFinished(self, promptId: str, started: float) -> None:
+        self.latencies.append(time.perf_counter() - started)
+        self._signals.pop(promptId, None)
+        self.finished += 1
+        if self.submitted < self.prompts:
+            self.submit()
+        elif self.finished == self.prompts:
+            self.app.quit()
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = self.end - self.start
+        report: Dict[str, Any] = {
+            "prompts": self.finished,
+            "failed": self.failed,
+            "concurrency": self.concurrency,
+            "seconds": round(elapsed, 3),
+            "promptsPerSecond": round(self.finished / elapsed, 1),
+        }
+        for name, values in (
+            ("latency", self.latencies),
+            ("compile", self.compileTimes),
+            ("post", self.postTimes),
+        ):
+            report[name] = {
+                f"p{int(p * 100)}": round(percentile(values, p) * 1000, 3)
+                for p in (0.5, 0.9, 0.99)
+            }
+            report[name]["max"] = round(max(values) * 1000, 3)
+        report["http"] = self.connection.stats()
+        report["messages"] = self.connection.messageStats()
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--server", default=None, help="Benchmark a running server instead."
+    )
+    parser.add_argument("--post-latency", type=float, default=0.0)
+    parser.add_argument("--node-time", type=float, default=0.0)
+    parser.add_argument("--step-time", type=float, default=0.0)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--preview-every", type=int, default=5)
+    parser.add_argument("--preview-size", type=int, default=64)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    fake = None
+    address = args.server
+    if address is None:
+        fake = FakeComfyServer(
+            timings=FakeTimings(
+                args.post_latency,
+                args.node_time,
+                args.step_time,
+                args.steps,
+                args.preview_every,
+                args.preview_size,
+            )
+        ).start()
+        address = fake.serverAddress
+    connection = ComfyConnection(address)
+    # messages sent before the websocket is up would never reach us
+    deadline = time.monotonic() + 10
+    while not connection.session.connected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    factory = ComfyFactory(SocketStyles())
+    factory.loadNodeDefinitions(connection.getNodeDefs())
+    benchmark = Benchmark(
+        app, connection, txt2img(factory), args.prompts, args.concurrency
+    )
+    benchmark.run()
+    print(json.dumps(benchmark.report(), indent=2))
+    connection.close()
+    if fake is not None:
+        fake.stop()
+    # PySide can crash tearing down the scene graph at interpreter exit
+    os._exit(0)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict
+
+import PySide6.QtGui as QGui
+import PySide6.QtCore as QCor
+import PySide6.QtWidgets as QWgt
+
+from graphOps import GraphOp, GR_OP_STATUS, registerOp
+from specialNodes.nodes.groupNode import GroupNode, newGroupScene
+
+if TYPE_CHECKING:
+    from gui.view import QNodeGraphicsView
+    from node import NodeScene
+
+
+@registerOp
+class OpAddGroup(GraphOp):
+    """Places a group node at the cursor, running a new group or one of the
+    groups of the graph."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            [
+                QGui.QKeySequence(
+                    QCor.QKeyCombination(
+                        QGui.Qt.KeyboardModifier.ControlModifier, QGui.Qt.Key.Key_G
+                    )
+                )
+            ],
+            1,
+            True,
+        )
+
+    def doAction(self, nodeView: QNodeGraphicsView) -> GR_OP_STATUS:
+        collection = nodeView.nodeScene.sceneCollection
+        menu = QWgt.QMenu(nodeView)
+        newAction = menu.addAction("New group")
+        menu.addSeparator()
+        groups: Dict[QGui.QAction, NodeScene] = {
+            menu.addAction(s.name): s
+            for s in collection.scenes
+            if s is not nodeView.nodeScene
+        }
+        chosen = menu.exec(QGui.QCursor.pos())
+        if chosen is None:
+            return GR_OP_STATUS.NOTHING
+        pos = nodeView.mapToScene(nodeView.mapFromGlobal(QGui.QCursor.pos()))
+        with collection.ntm:
+            if chosen is newAction:
+                groupScene = newGroupScene(collection, "group")
+            else:
+                groupScene = groups[chosen]
+            groupNode = collection.nodeFactory.loadNode("GroupNode")
+            assert isinstance(groupNode, GroupNode)
+            groupNode.setGroupScene(groupScene)
+            groupNode.grNode.setPos(pos)
+        for item in nodeView.getSelected():
+            item.setSelected(False)
+        groupNode.grNode.setSelected(True)
+        return GR_OP_STATUS.NOTHING
@@ -0,0 +1,32 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, List
+
+import PySide6.QtGui as QGui
+
+from graphOps import GraphOp, GR_OP_STATUS, registerOp
+from specialNodes.nodes.groupNode import GroupNode
+
+if TYPE_CHECKING:
+    from gui.view import QNodeGraphicsView
+    from node import NodeScene
+
+
+@registerOp
+class OpEnterGroup(GraphOp):
+    """Shows the group of the selected group node, without one selected it
+    goes back to the scene the group was opened from."""
+
+    def __init__(self) -> None:
+        super().__init__([QGui.QKeySequence(QGui.Qt.Key.Key_Tab)], 1, True)
+        self.parents: List[NodeScene] = []
+
+    def doAction(self, nodeView: QNodeGraphicsView) -> GR_OP_STATUS:
+        selected = [item.node for item in nodeView.getSelected()]
+        if len(selected) == 1 and isinstance(selected[0], GroupNode):
+            groupScene = selected[0].groupScene
+            if groupScene is not None:
+                self.parents.append(nodeView.nodeScene)
+                nodeView.setNodeScene(groupScene)
+        elif len(self.parents) > 0:
+            nodeView.setNodeScene(self.parents.pop())
+        return GR_OP_STATUS.NOTHING
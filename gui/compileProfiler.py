@@ -0,0 +1,72 @@
+from typing import Any, List, Tuple
+
+import PySide6.QtCore as QCor
+import PySide6.QtWidgets as QWgt
+
+from server import CompileProfile
+
+
+class CompileProfileDialog(QWgt.QDialog):
+    """A sortable table of what compiling every node of a graph cost, with the
+    time of every phase above it."""
+
+    # asks for the current graph to be profiled again
+    profileRequested = QCor.Signal()
+
+    def __init__(self, parent: QWgt.QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Compile profile")
+        self.resize(860, 480)
+        self.profile: CompileProfile | None = None
+        self.summary = QWgt.QLabel()
+        self.table = QWgt.QTableWidget(0, len(CompileProfile.columns))
+        self.table.setHorizontalHeaderLabels(CompileProfile.columns)
+        self.table.setEditTriggers(QWgt.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        profileButton = QWgt.QPushButton("Profile again")
+        profileButton.clicked.connect(self.profileRequested.emit)
+        exportButton = QWgt.QPushButton("Export JSON")
+        exportButton.clicked.connect(self.export)
+        buttons = QWgt.QHBoxLayout()
+        buttons.addWidget(profileButton)
+        buttons.addWidget(exportButton)
+        layout = QWgt.QVBoxLayout(self)
+        layout.addWidget(self.summary)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+    def showProfile(self, profile: CompileProfile) -> None:
+        self.profile = profile
+        summary = profile.summary()
+        phases = ", ".join(f"{k} {v:.2f} ms" for k, v in summary["phases"].items())
+        self.summary.setText(
+            f"{summary['nodes']} nodes, {summary['visits']} visits: {phases}"
+        )
+        self._fill(profile.rows())
+        self.show()
+        self.raise_()
+
+    def _fill(self, rows: List[Tuple[Any, ...]]) -> None:
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                item = QWgt.QTableWidgetItem()
+                if isinstance(value, float):
+                    # sorts numerically, shown in milliseconds
+                    value = round(value * 1000, 3)
+                item.setData(QCor.Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(i, j, item)
+        self.table.setSortingEnabled(True)
+        # slowest first
+        self.table.sortItems(4, QCor.Qt.SortOrder.DescendingOrder)
+
+    def export(self) -> None:
+        if self.profile is None:
+            return
+        path, _ = QWgt.QFileDialog.getSaveFileName(
+            self, "Export compile profile", filter="JSON (*.json)"
+        )
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.profile.toJSON())
@@ -0,0 +1,232 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+import csv
+import time
+import weakref
+
+import PySide6.QtCore as QCor
+import PySide6.QtWidgets as QWgt
+
+from node import Node
+from server.ComfyConnection import promptSignals
+
+
+class TimingStats:
+    """Execution times of one node or node class, the last `window` runs are
+    used for the rolling numbers."""
+
+    def __init__(self, window: int = 32) -> None:
+        self.runs: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.runs.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    @property
+    def last(self) -> float:
+        return self.runs[-1] if len(self.runs) > 0 else 0.0
+
+    @property
+    def mean(self) -> float:
+        return sum(self.runs) / len(self.runs) if len(self.runs) > 0 else 0.0
+
+    @property
+    def median(self) -> float:
+        if len(self.runs) == 0:
+            return 0.0
+        return sorted(self.runs)[len(self.runs) // 2]
+
+    @property
+    def max(self) -> float:
+        return max(self.runs) if len(self.runs) > 0 else 0.0
+
+
+class promptTrace:
+    """Node transitions of a prompt that is executing."""
+
+    def __init__(self, signals: promptSignals) -> None:
+        self.signals = signals
+        self.nodeMaps: List[Dict[str, List[Node]]] = []
+        self.nodeId: str | None = None
+        self.startedAt = 0.0
+        # arrival of the first executing message
+        self.firstAt: float | None = None
+        self.times: Dict[str, float] = {}
+
+
+class ExecutionProfiler(QCor.QObject):
+    """Times nodes from the executing messages of the server.
+
+    A node runs from its executing message until the next one, cached nodes
+    have no executing message and don't count as a run.
+    """
+
+    # prompt id and the nodes that got new timings
+    updated = QCor.Signal(str, object)
+
+    columns = ("Node", "Class", "Runs", "Last", "Mean", "Median", "Max", "Total")
+
+    def __init__(self, window: int = 32) -> None:
+        super().__init__()
+        self.window = window
+        self.nodeStats: weakref.WeakKeyDictionary[Node, TimingStats] = (
+            weakref.WeakKeyDictionary()
+        )
+        self.classStats: Dict[str, TimingStats] = {}
+        # whole prompts, from their first executing message to the last
+        self.promptStats = TimingStats(window)
+        self._traces: Dict[str, promptTrace] = {}
+
+    def track(
+        self, promptId: str, signals: promptSignals, nodeMap: Dict[str, List[Node]]
+    ) -> None:
+        trace = self._traces.get(promptId, None)
+        if trace is None:
+            trace = promptTrace(signals)
+            self._traces[promptId] = trace
+            signals.executing.connect(
+                lambda nodeId, at: self._executing(promptId, nodeId, at)
+            )
+            signals.failed.connect(lambda *args: self._traces.pop(promptId, None))
+        trace.nodeMaps.append(nodeMap)
+
+    def _executing(self, promptId: str, nodeId: str | None, at: float) -> None:
+        trace = self._traces.get(promptId, None)
+        if trace is None:
+            return
+        if trace.nodeId is not None:
+            elapsed = at - trace.startedAt
+            trace.times[trace.nodeId] = trace.times.get(trace.nodeId, 0.0) + elapsed
+        trace.nodeId = nodeId
+        trace.startedAt = at
+        if trace.firstAt is None:
+            trace.firstAt = at
+        if nodeId is None:
+            del self._traces[promptId]
+            self.promptStats.add(at - trace.firstAt)
+            self._record(promptId, trace)
+
+    def runningFor(self, promptId: str) -> float | None:
+        """Seconds since `promptId` started executing, None if it didn't."""
+        trace = self._traces.get(promptId, None)
+        if trace is None or trace.firstAt is None:
+            return None
+        return time.monotonic() - trace.firstAt
+
+    def _record(self, promptId: str, trace: promptTrace) -> None:
+        nodes: List[Node] = []
+        for nodeId, seconds in trace.times.items():
+            classRecorded = False
+            for nodeMap in trace.nodeMaps:
+                for node in nodeMap.get(nodeId, []):
+                    if node not in self.nodeStats:
+                        self.nodeStats[node] = TimingStats(self.window)
+                    self.nodeStats[node].add(seconds)
+                    nodes.append(node)
+                    if not classRecorded:
+                        classRecorded = True
+                        stats = self.classStats.setdefault(
+                            node.nodeClass, TimingStats(self.window)
+                        )
+                        stats.add(seconds)
+        self.updated.emit(promptId, nodes)
+
+    def heat(self, nodes: List[Node]) -> Dict[Node, float]:
+        """Rolling mean of every node relative to the slowest one of `nodes`."""
+        means = {n: self.nodeStats[n].mean for n in nodes if n in self.nodeStats}
+        slowest = max(means.values(), default=0.0)
+        if slowest <= 0:
+            return {n: 0.0 for n in means}
+        return {n: mean / slowest for n, mean in means.items()}
+
+    def nodeRows(self) -> List[Tuple[Any, ...]]:
+        return [
+            (node.title, node.nodeClass, *self._row(stats))
+            for node, stats in self.nodeStats.items()
+        ]
+
+    def classRows(self) -> List[Tuple[Any, ...]]:
+        return [
+            ("", nodeClass, *self._row(stats))
+            for nodeClass, stats in self.classStats.items()
+        ]
+
+    @staticmethod
+    def _row(stats: TimingStats) -> Tuple[Any, ...]:
+        return (
+            stats.count,
+            stats.last,
+            stats.mean,
+            stats.median,
+            stats.max,
+            stats.total,
+        )
+
+    def exportCSV(self, path: str) -> None:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("Scope",) + self.columns)
+            for row in self.nodeRows():
+                writer.writerow(("node",) + row)
+            for row in self.classRows():
+                writer.writerow(("class",) + row)
+
+
+class ExecutionProfileDialog(QWgt.QDialog):
+    """Sortable tables of the execution times collected by a profiler."""
+
+    def __init__(
+        self, profiler: ExecutionProfiler, parent: QWgt.QWidget | None = None
+    ) -> None:
+        super().__init__(parent)
+        self.profiler = profiler
+        self.setWindowTitle("Execution profile")
+        self.resize(720, 480)
+        self.nodeTable = self._table()
+        self.classTable = self._table()
+        tabs = QWgt.QTabWidget()
+        tabs.addTab(self.nodeTable, "Nodes")
+        tabs.addTab(self.classTable, "Classes")
+        exportButton = QWgt.QPushButton("Export CSV")
+        exportButton.clicked.connect(self.export)
+        layout = QWgt.QVBoxLayout(self)
+        layout.addWidget(tabs)
+        layout.addWidget(exportButton)
+        profiler.updated.connect(self.refresh)
+        self.refresh()
+
+    def _table(self) -> QWgt.QTableWidget:
+        table = QWgt.QTableWidget(0, len(ExecutionProfiler.columns))
+        table.setHorizontalHeaderLabels(ExecutionProfiler.columns)
+        table.setEditTriggers(QWgt.QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.verticalHeader().hide()
+        return table
+
+    def refresh(self, *args: Any) -> None:
+        self._fill(self.nodeTable, self.profiler.nodeRows())
+        self._fill(self.classTable, self.profiler.classRows())
+
+    @staticmethod
+    def _fill(table: QWgt.QTableWidget, rows: List[Tuple[Any, ...]]) -> None:
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                item = QWgt.QTableWidgetItem()
+                if isinstance(value, float):
+                    # sorts numerically, shown in seconds
+                    item.setData(QCor.Qt.ItemDataRole.DisplayRole, round(value, 3))
+                else:
+                    item.setData(QCor.Qt.ItemDataRole.DisplayRole, value)
+                table.setItem(i, j, item)
+        table.setSortingEnabled(True)
+
+    def export(self) -> None:
+        path, _ = QWgt.QFileDialog.getSaveFileName(
+            self, "Export execution profile", filter="CSV (*.csv)"
+        )
+        if path:
+            self.profiler.exportCSV(path)
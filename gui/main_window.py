@@ -1,16 +1,40 @@
-from typing import Optional, Dict, Any, cast
+from typing import Optional, Dict, Any, List, Set, Tuple, cast
 import PySide6.QtCore
+import PySide6.QtCore as QCor
 import PySide6.QtGui as QGui
 from PySide6.QtWidgets import *
 
 from gui import QNodeEditor
 import os
 import json
+import weakref
+from functools import partial
 
+from gui.compileProfiler import CompileProfileDialog
+from gui.executionProfiler import ExecutionProfileDialog, ExecutionProfiler
 from gui.navigator import NavigatorWidget
+from gui.previewPipeline import PreviewPipeline
+from gui.promptErrors import PromptErrorsDialog
+from gui.queuePanel import QueuePanel
+from gui.resultFetcher import ImageRef, ResultFetcher
 from gui.workFolder import WorkFolder, MaybeSceneCollection
+from node import Node, SceneCollection
 from node.factory.comfyFactory import ComfyFactory
-from server import ComfyConnection
+from nodeSlots.slots.comboSlot import ComboSlot
+from server.ComfyConnection import server_address
+from server import (
+    ComfyConnection,
+    CompileResult,
+    CompileWorker,
+    ObjectInfoCache,
+    ComfyPromptManager,
+    ObjectInfoRefreshWorker,
+    PromptDispatcher,
+    PromptSubmissionQueue,
+    PromptValidator,
+    Submission,
+    UploadManager,
+)
 from style.socketStyle import SocketStyles
 
 
@@ -19,15 +43,98 @@ class NodeEditorWindow(QMainWindow):
         super().__init__()
         self.settings = self.initSettings()
         self.accelerate = not args.cpu
-        self.connection = ComfyConnection()
+        self.dispatcher = PromptDispatcher(
+            [ComfyConnection(address) for address in self.getServers()]
+        )
+        # node definitions are taken from the first server
+        self.connection = self.dispatcher.primary
+        self.submissionQueue = PromptSubmissionQueue(
+            self.dispatcher, self.settings.get("submitConcurrency", 2)
+        )
+        self.submissionQueue.accepted.connect(self.promptAccepted)
+        self.submissionQueue.rejected.connect(self.promptRejected)
+        # one thread, so prompts are submitted in the order they were sent
+        self.compilePool = QCor.QThreadPool()
+        self.compilePool.setMaxThreadCount(1)
+        self.compileWorkers: Set[CompileWorker] = set()
+        # prompt node ids to nodes, per submission ticket, identical prompts
+        # from different graphs share a submission
+        self.nodeMaps: Dict[int, List[Dict[str, List[Node]]]] = {}
+        # the last prompt sent from every graph, queued ones that got replaced
+        # by a newer version are dropped
+        self.latestSubmissions: weakref.WeakKeyDictionary[
+            SceneCollection, Submission
+        ] = weakref.WeakKeyDictionary()
+        self.previewPipeline = PreviewPipeline(
+            QGui.QGuiApplication.primaryScreen().refreshRate()
+        )
+        self.previewPipeline.frameReady.connect(self.showPreview)
+        self.executionProfiler = ExecutionProfiler()
+        self.executionProfiler.updated.connect(self.showHeat)
+        self.profileDialog: ExecutionProfileDialog | None = None
+        self.compileProfileDialog: CompileProfileDialog | None = None
+        self.promptErrorsDialog: PromptErrorsDialog | None = None
 
-        self.nodeFactory = ComfyFactory(SocketStyles())
-        self.nodeFactory.loadNodeDefinitions(self.connection.getNodeDefs())
+        self.nodeFactory = ComfyFactory(
+            SocketStyles(), self.settings.get("lazyNodeDefinitions", True)
+        )
 
         self.workFolderLoc = self.getWorkFolderLoc()
         self.workFolder = WorkFolder(self.workFolderLoc, self.nodeFactory)
+        self.initNodeDefs()
+        self.resultFetcher = ResultFetcher(
+            os.path.join(self.workFolder.cacheFolder, "images"),
+            self.settings.get("imageCacheMB", 1024) * 1024 * 1024,
+        )
+        self.resultFetcher.outputsReady.connect(self.receiveOutputs)
+        self.resultFetcher.thumbnailReady.connect(self.showThumbnail)
+        self.outputNodeMaps: Dict[
+            str, Tuple[ComfyConnection, List[Dict[str, List[Node]]]]
+        ] = {}
+        # nodes waiting for a thumbnail, keyed like the fetcher's workers
+        self.thumbnailTargets: Dict[
+            Tuple[Tuple[str, str, str, str], int, int], List[Node]
+        ] = {}
+        self.uploadManager = UploadManager(
+            os.path.join(self.workFolder.cacheFolder, "uploads.json")
+        )
+        self.uploadManager.uploaded.connect(self.imageUploaded)
+        # image inputs waiting for the name of a file being uploaded
+        self.uploadTargets: Dict[str, List[ComboSlot]] = {}
+        self.uploadManager.failed.connect(self.imageFailed)
         self.initUI()
 
+    def initNodeDefs(self) -> None:
+        self.objectInfoCache = ObjectInfoCache(
+            self.workFolder.cacheFolder, self.connection.serverAddress
+        )
+        nodeDefs = self.objectInfoCache.load()
+        if nodeDefs is not None:
+            # start from the cache and check for changes in the background
+            self.nodeFactory.loadNodeDefinitions(nodeDefs)
+            self.refreshNodeDefs()
+            return
+        try:
+            nodeDefs = self.connection.getNodeDefs()
+        except OSError as error:
+            print(f"could not fetch node definitions: {error}")
+            self.nodeFactory.loadNodeDefinitions("{}")
+            return
+        self.objectInfoCache.store(nodeDefs)
+        self.nodeFactory.loadNodeDefinitions(nodeDefs)
+
+    def refreshNodeDefs(self) -> None:
+        worker = ObjectInfoRefreshWorker(self.connection)
+        worker.signals.fetched.connect(self.applyNodeDefs)
+        worker.signals.failed.connect(
+            lambda error: print(f"could not refresh node definitions: {error}")
+        )
+        QCor.QThreadPool.globalInstance().start(worker)
+
+    def applyNodeDefs(self, nodeDefs: bytes) -> None:
+        if self.objectInfoCache.store(nodeDefs):
+            self.nodeFactory.loadNodeDefinitions(nodeDefs)
+
     def initUI(self) -> None:
         self.navigator = NavigatorWidget(self.workFolder)
         self.navigator.opened.connect(self.openNodes)
@@ -55,6 +162,40 @@ class NodeEditorWindow(QMainWindow):
         sendAction = fileMenu.addAction("Send")
         sendAction.triggered.connect(self.sendPrompt)
 
+        sendFrontAction = fileMenu.addAction("Send to front")
+        sendFrontAction.triggered.connect(partial(self.sendPrompt, True))
+
+        runToHereAction = fileMenu.addAction("Run to selected node")
+        runToHereAction.triggered.connect(self.runToHere)
+
+        uploadAction = fileMenu.addAction("Upload images")
+        uploadAction.triggered.connect(self.uploadImages)
+
+        viewMenu = menu.addMenu("View")
+
+        self.heatAction = viewMenu.addAction("Execution heatmap")
+        self.heatAction.setCheckable(True)
+        self.heatAction.toggled.connect(self.toggleHeat)
+
+        profileAction = viewMenu.addAction("Execution profile")
+        profileAction.triggered.connect(self.showProfile)
+
+        compileProfileAction = viewMenu.addAction("Compile profile")
+        compileProfileAction.triggered.connect(self.profileCompile)
+
+        self.queuePanel = QueuePanel(
+            [backend.connection for backend in self.dispatcher.backends],
+            self.submissionQueue,
+            self.executionProfiler,
+        )
+        self.queueDock = QDockWidget("Queue", self)
+        self.queueDock.setWidget(self.queuePanel)
+        self.addDockWidget(QCor.Qt.DockWidgetArea.BottomDockWidgetArea, self.queueDock)
+        self.queueDock.hide()
+        viewMenu.addAction(self.queueDock.toggleViewAction())
+        # created up front so the first queue message doesn't resize the editor
+        self.statusBar()
+
         # loadAction = fileMenu.addAction("Load")
         # loadAction.triggered.connect(self.loadNodes)
 
@@ -67,6 +208,8 @@ class NodeEditorWindow(QMainWindow):
                 self.tabs.setCurrentIndex(i)
                 return
         editor = QNodeEditor(collection, accelerate=self.accelerate)
+        editor.promptRequested.connect(self.submitPrompt)
+        editor.sendRequested.connect(self.compileAndSubmit)
         ind_current = self.tabs.currentIndex()
         ind = self.tabs.insertTab(ind_current + 1, editor, collection.name)
         self.tabs.setCurrentIndex(ind)
@@ -92,6 +235,11 @@ class NodeEditorWindow(QMainWindow):
     def closeEvent(self, event: QGui.QCloseEvent) -> None:
         with open("settings.json", "w", encoding="utf-8") as f:
             json.dump(self.settings, f, ensure_ascii=False, indent=2)
+        self.compilePool.waitForDone(5000)
+        self.submissionQueue.waitForDone(5000)
+        self.uploadManager.waitForDone(5000)
+        self.queuePanel.waitForDone(5000)
+        self.dispatcher.close()
         return super().closeEvent(event)
 
     def getWorkFolderLoc(self) -> str:
@@ -101,6 +249,11 @@ class NodeEditorWindow(QMainWindow):
             self.settings["workFolder"] = path
         return self.settings["workFolder"]
 
+    def getServers(self) -> List[str]:
+        if "servers" not in self.settings:
+            self.settings["servers"] = [server_address]
+        return self.settings["servers"]
+
     def initSettings(self) -> Dict[str, Any]:
         if not os.path.isfile("settings.json"):
             with open("settings.json", "w", encoding="utf-8") as f:
@@ -126,8 +279,247 @@ class NodeEditorWindow(QMainWindow):
     #        saveString = f.readline()
     #    self.nodeEditorWidget.sceneCollection.fromJSON(saveString)
 
-    def sendPrompt(self) -> None:
+    def sendPrompt(self, front: bool = False) -> None:
+        editor = cast(QNodeEditor, self.tabs.currentWidget())
+        self.compileAndSubmit(editor.sceneCollection.collection, front)
+
+    def runToHere(self) -> None:
+        editor = cast(QNodeEditor, self.tabs.currentWidget())
+        if editor is not None:
+            editor.view.performRunToHere()
+
+    def uploadImages(self) -> None:
+        """Uploads images to every server, the image inputs of the selected
+        nodes get the uploaded images in order."""
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Upload images", filter="Images (*.png *.jpg *.jpeg *.webp)"
+        )
+        editor = cast(QNodeEditor, self.tabs.currentWidget())
+        slots: List[ComboSlot] = []
+        if editor is not None:
+            for grNode in editor.view.getSelected():
+                slots.extend(
+                    s
+                    for s in grNode.node.inputs
+                    if isinstance(s, ComboSlot) and s.name == "image"
+                )
+        for path, slot in zip(paths, slots):
+            self.uploadTargets.setdefault(path, []).append(slot)
+        for backend in self.dispatcher.backends:
+            self.uploadManager.upload(backend.connection, paths)
+
+    def imageUploaded(self, server: str, path: str, name: str) -> None:
+        # node definitions and the names set on nodes are those of the first
+        # server
+        if server != self.connection.serverAddress:
+            return
+        for slot in self.uploadTargets.pop(path, []):
+            slot.addItem(name)
+            slot.grItem.value = name
+            self.nodeFactory.addComboOption(slot.node.nodeClass, slot.name, name)
+        # the server lists the new file in the options of its image inputs
+        self.refreshNodeDefs()
+
+    def imageFailed(self, server: str, path: str, error: str) -> None:
+        print(f"could not upload {path} to {server}: {error}")
+        if server == self.connection.serverAddress:
+            self.uploadTargets.pop(path, None)
+
+    def compileAndSubmit(
+        self, collection: SceneCollection, front: bool = False
+    ) -> None:
+        """Compiles a snapshot of `collection` in the background, the editor
+        stays usable meanwhile."""
+        worker = CompileWorker(
+            collection.snapshot(),
+            PromptValidator(self.nodeFactory.nodeDefinitions),
+            self.settings.get("eliminateDuplicates", True),
+        )
+        worker.signals.done.connect(partial(self.compiled, worker, front))
+        self.compileWorkers.add(worker)
+        self.compilePool.start(worker)
+
+    def compiled(
+        self, worker: CompileWorker, front: bool, result: CompileResult
+    ) -> None:
+        self.compileWorkers.discard(worker)
+        if result.eliminated > 0:
+            print(f"merged {result.eliminated} duplicate nodes into identical ones")
+        if len(result.errors) > 0:
+            if self.promptErrorsDialog is None:
+                self.promptErrorsDialog = PromptErrorsDialog(self)
+            self.promptErrorsDialog.showErrors(result.errors, result.validationTime)
+            return
+        self.submitValidated(result.promptManager, front, result.promptHash)
+
+    def submitPrompt(
+        self, promptManager: ComfyPromptManager, front: bool = False
+    ) -> None:
+        if self.settings.get("eliminateDuplicates", True):
+            eliminated = promptManager.eliminateDuplicates()
+            if eliminated > 0:
+                print(f"merged {eliminated} duplicate nodes into identical ones")
+        validator = PromptValidator(self.nodeFactory.nodeDefinitions)
+        errors = validator.validate(promptManager)
+        if len(errors) > 0:
+            if self.promptErrorsDialog is None:
+                self.promptErrorsDialog = PromptErrorsDialog(self)
+            self.promptErrorsDialog.showErrors(errors, validator.elapsed)
+            return
+        self.submitValidated(promptManager, front)
+
+    def submitValidated(
+        self,
+        promptManager: ComfyPromptManager,
+        front: bool = False,
+        key: str | None = None,
+    ) -> None:
+        submission = self.submissionQueue.submit(
+            promptManager.partialPrompts, front, key
+        )
+        nodeMap = promptManager.nodeMap()
+        self.dropStale(nodeMap, submission)
+        if submission.completed:
+            self.statusBar().showMessage(
+                f"prompt unchanged, reusing the outputs of {submission.promptId}", 5000
+            )
+            self.promptFinished(submission, nodeMap)
+        elif submission.accepted:
+            self.statusBar().showMessage(
+                f"prompt unchanged, attached to #{submission.number}", 5000
+            )
+            self.followPrompt(submission, nodeMap)
+        else:
+            self.nodeMaps.setdefault(submission.ticket, []).append(nodeMap)
+
+    def dropStale(self, nodeMap: Dict[str, List[Node]], submission: Submission) -> None:
+        """Cancels the queued prompt `submission` replaces, unless another graph
+        still waits for it."""
+        nodes = next(iter(nodeMap.values()), [])
+        if len(nodes) == 0:
+            return
+        collection = nodes[0].nodeScene.sceneCollection
+        previous = self.latestSubmissions.get(collection, None)
+        self.latestSubmissions[collection] = submission
+        if previous is None or previous is submission:
+            return
+        if not self.settings.get("dropStaleQueued", True):
+            return
+        if previous in self.latestSubmissions.values():
+            return
+        self.submissionQueue.cancel(previous)
+
+    def promptAccepted(self, submission: Submission) -> None:
+        self.statusBar().showMessage(
+            f"prompt {submission.promptId} queued as #{submission.number}", 5000
+        )
+        for nodeMap in self.nodeMaps.pop(submission.ticket, []):
+            self.followPrompt(submission, nodeMap)
+
+    def followPrompt(
+        self, submission: Submission, nodeMap: Dict[str, List[Node]]
+    ) -> None:
+        assert submission.signals is not None
+        assert submission.promptId is not None
+        self.executionProfiler.track(submission.promptId, submission.signals, nodeMap)
+        submission.signals.preview.connect(partial(self.receivePreview, nodeMap))
+        submission.signals.finished.connect(
+            partial(self.promptFinished, submission, nodeMap)
+        )
+
+    def promptFinished(
+        self, submission: Submission, nodeMap: Dict[str, List[Node]]
+    ) -> None:
+        if submission.cancelled:
+            self.statusBar().showMessage(
+                f"prompt {submission.promptId} was dropped from the queue", 5000
+            )
+            return
+        assert submission.connection is not None
+        assert submission.promptId is not None
+        if submission.promptId in self.outputNodeMaps:
+            # outputs of this prompt are already on their way
+            self.outputNodeMaps[submission.promptId][1].append(nodeMap)
+            return
+        self.outputNodeMaps[submission.promptId] = (submission.connection, [nodeMap])
+        self.resultFetcher.fetchOutputs(submission.connection, submission.promptId)
+
+    def receiveOutputs(self, promptId: str, outputs: Dict[str, List[ImageRef]]) -> None:
+        if promptId not in self.outputNodeMaps:
+            return
+        connection, nodeMaps = self.outputNodeMaps.pop(promptId)
+        for nodeMap in nodeMaps:
+            for nodeId, images in outputs.items():
+                if len(images) == 0:
+                    continue
+                for node in nodeMap.get(nodeId, []):
+                    size = self.nodeDisplaySize(node)
+                    key = ResultFetcher.thumbnailKey(images[-1], size)
+                    self.thumbnailTargets.setdefault(key, []).append(node)
+                    self.resultFetcher.requestThumbnail(connection, images[-1], size)
+
+    def showThumbnail(
+        self, ref: ImageRef, size: QCor.QSize, image: QGui.QImage
+    ) -> None:
+        # dropped on failure too, the next prompt asks again
+        nodes = self.thumbnailTargets.pop(ResultFetcher.thumbnailKey(ref, size), [])
+        if image.isNull():
+            return
+        for node in nodes:
+            node.grNode.setPreview(image)
+
+    def promptRejected(self, submission: Submission) -> None:
+        self.nodeMaps.pop(submission.ticket, None)
+        # stays until the next message, rejections shouldn't go unnoticed
+        self.statusBar().showMessage(
+            f"prompt rejected: {submission.error} {submission.nodeErrors}"
+        )
+
+    def receivePreview(
+        self, nodeMap: Dict[str, List[Node]], nodeId: str, data: memoryview
+    ) -> None:
+        for node in nodeMap.get(nodeId, []):
+            self.previewPipeline.submitFrame(node, data, self.nodeDisplaySize(node))
+
+    def nodeDisplaySize(self, node: Node) -> QCor.QSize:
+        """Size in device pixels an image spanning the node width is shown at."""
+        views = node.grNode.scene().views() if node.grNode.scene() else []
+        if len(views) == 0:
+            return QCor.QSize()
+        scale = views[0].transform().m11() * views[0].devicePixelRatioF()
+        side = max(1, int(node.grNode.width * scale))
+        return QCor.QSize(side, side)
+
+    def showPreview(self, node: Node, image: QGui.QImage) -> None:
+        node.grNode.setPreview(image)
+
+    def showHeat(self, promptId: str, nodes: List[Node]) -> None:
+        if not self.heatAction.isChecked():
+            return
+        for node, heat in self.executionProfiler.heat(nodes).items():
+            stats = self.executionProfiler.nodeStats[node]
+            node.grNode.setHeat(heat, f"{stats.mean:.2f} s")
+
+    def toggleHeat(self, enabled: bool) -> None:
+        nodes = list(self.executionProfiler.nodeStats.keys())
+        if enabled:
+            self.showHeat("", nodes)
+            return
+        for node in nodes:
+            node.grNode.setHeat(None)
+
+    def showProfile(self) -> None:
+        if self.profileDialog is None:
+            self.profileDialog = ExecutionProfileDialog(self.executionProfiler, self)
+        self.profileDialog.show()
+        self.profileDialog.raise_()
+
+    def profileCompile(self) -> None:
         editor = cast(QNodeEditor, self.tabs.currentWidget())
-        prompt = editor.sceneCollection.collection.prompt()
-        result = self.connection.sendPrompt(prompt)
-        print(result)
+        if editor is None:
+            return
+        if self.compileProfileDialog is None:
+            self.compileProfileDialog = CompileProfileDialog(self)
+            self.compileProfileDialog.profileRequested.connect(self.profileCompile)
+        profile = editor.sceneCollection.collection.profile()
+        self.compileProfileDialog.showProfile(profile)
@@ -19,6 +19,9 @@ from style.socketStyle import SocketStyles
 
 
 class QNodeEditor(QWgt.QWidget):
+    promptRequested = QCor.Signal(object)
+    sendRequested = QCor.Signal(object)
+
     def __init__(
         self,
         sceneCollection: MaybeSceneCollection,
@@ -75,6 +78,8 @@ class QNodeEditor(QWgt.QWidget):
 
         self.sidePanel.move(self.width() - self.sidePanel.width() - 10, 10)
         self.view.activeNodeChanged.connect(self.activeNodeChange)
+        self.view.promptRequested.connect(self.promptRequested)
+        self.view.sendRequested.connect(self.sendRequested)
 
     def resizeEvent(self, event: QGui.QResizeEvent) -> None:
         self.sidePanel.move(self.view.width() - self.sidePanel.width() - 10, 10)
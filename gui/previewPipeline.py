@@ -0,0 +1,105 @@
+from typing import Any, Dict, Hashable, Set, Tuple
+
+import PySide6.QtCore as QCor
+import PySide6.QtGui as QGui
+
+
+class PreviewDecodeSignals(QCor.QObject):
+    decoded = QCor.Signal(object, object)
+
+
+class PreviewDecodeWorker(QCor.QRunnable):
+    def __init__(self, key: Hashable, data: memoryview, size: QCor.QSize) -> None:
+        super().__init__()
+        self.key = key
+        self.data = data
+        self.size = size
+        self.signals = PreviewDecodeSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        # PySide6 does not take a memoryview slice here, this is the only copy
+        image = QGui.QImage.fromData(self.data.tobytes())
+        if (
+            not image.isNull()
+            and self.size.isValid()
+            and (
+                image.width() > self.size.width() or image.height() > self.size.height()
+            )
+        ):
+            image = image.scaled(
+                self.size,
+                QCor.Qt.AspectRatioMode.KeepAspectRatio,
+                QCor.Qt.TransformationMode.SmoothTransformation,
+            )
+        self.signals.decoded.emit(self.key, image)
+
+
+class PreviewPipeline(QCor.QObject):
+    """Decodes preview frames off the UI thread and hands them out at display rate.
+
+    Every key (usually a node) has at most one frame decoding and one frame
+    waiting to be decoded, newer frames replace older ones that haven't been
+    picked up yet.
+    """
+
+    frameReady = QCor.Signal(object, object)
+
+    def __init__(self, refreshRate: float = 60.0, maxThreads: int = 2) -> None:
+        super().__init__()
+        self._pool = QCor.QThreadPool()
+        self._pool.setMaxThreadCount(maxThreads)
+        self._decoding: Set[Hashable] = set()
+        self._waiting: Dict[Hashable, Tuple[memoryview, QCor.QSize]] = {}
+        self._decoded: Dict[Hashable, QGui.QImage] = {}
+        self._workers: Dict[Hashable, PreviewDecodeWorker] = {}
+        self.received = 0
+        self.dropped = 0
+        self.delivered = 0
+        self._timer = QCor.QTimer(self)
+        self._timer.setInterval(max(1, int(1000 / refreshRate)))
+        self._timer.timeout.connect(self._deliver)
+
+    def submitFrame(self, key: Hashable, data: memoryview, size: QCor.QSize) -> None:
+        self.received += 1
+        if key in self._decoding:
+            if key in self._waiting:
+                self.dropped += 1
+            self._waiting[key] = (data, size)
+            return
+        self._decode(key, data, size)
+
+    def _decode(self, key: Hashable, data: memoryview, size: QCor.QSize) -> None:
+        self._decoding.add(key)
+        worker = PreviewDecodeWorker(key, data, size)
+        worker.signals.decoded.connect(self._onDecoded)
+        self._workers[key] = worker
+        self._pool.start(worker)
+
+    def _onDecoded(self, key: Hashable, image: QGui.QImage) -> None:
+        self._decoding.discard(key)
+        self._workers.pop(key, None)
+        if not image.isNull():
+            if key in self._decoded:
+                self.dropped += 1
+            self._decoded[key] = image
+            if not self._timer.isActive():
+                self._timer.start()
+        if key in self._waiting:
+            self._decode(key, *self._waiting.pop(key))
+
+    def _deliver(self) -> None:
+        decoded = self._decoded
+        self._decoded = {}
+        for key, image in decoded.items():
+            self.delivered += 1
+            self.frameReady.emit(key, image)
+        if len(self._decoding) == 0 and len(self._waiting) == 0:
+            self._timer.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "delivered": self.delivered,
+        }
@@ -0,0 +1,50 @@
+from typing import Dict, List
+
+import PySide6.QtCore as QCor
+import PySide6.QtWidgets as QWgt
+
+from server.promptValidator import PromptError
+
+
+class PromptErrorsDialog(QWgt.QDialog):
+    """Lists the problems that kept a prompt from being sent, double clicking
+    one brings its node into view."""
+
+    def __init__(self, parent: QWgt.QWidget | None = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Prompt not sent")
+        self.resize(480, 320)
+        self.summary = QWgt.QLabel()
+        self.list = QWgt.QListWidget()
+        self.list.itemDoubleClicked.connect(self.focusNode)
+        self._errors: Dict[int, PromptError] = {}
+        layout = QWgt.QVBoxLayout(self)
+        layout.addWidget(self.summary)
+        layout.addWidget(self.list)
+
+    def showErrors(self, errors: List[PromptError], elapsed: float) -> None:
+        self.summary.setText(
+            f"{len(errors)} problem{'s' if len(errors) != 1 else ''} "
+            f"found in {elapsed * 1000:.2f} ms"
+        )
+        self.list.clear()
+        self._errors = {}
+        for i, error in enumerate(errors):
+            item = QWgt.QListWidgetItem(str(error))
+            item.setData(QCor.Qt.ItemDataRole.UserRole, i)
+            self._errors[i] = error
+            self.list.addItem(item)
+        self.show()
+        self.raise_()
+
+    def focusNode(self, item: QWgt.QListWidgetItem) -> None:
+        error = self._errors.get(item.data(QCor.Qt.ItemDataRole.UserRole), None)
+        if error is None or error.node is None:
+            return
+        grNode = error.node.grNode
+        scene = grNode.scene()
+        if scene is None or len(scene.views()) == 0:
+            return
+        scene.clearSelection()
+        grNode.setSelected(True)
+        scene.views()[0].centerOn(grNode)
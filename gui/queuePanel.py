@@ -0,0 +1,199 @@
+from typing import Any, Dict, List
+
+import PySide6.QtCore as QCor
+import PySide6.QtWidgets as QWgt
+
+from gui.executionProfiler import ExecutionProfiler
+from server.ComfyConnection import ComfyConnection
+from server.submissionQueue import PromptSubmissionQueue
+
+
+class QueueListSignals(QCor.QObject):
+    listed = QCor.Signal(object, object)
+    failed = QCor.Signal(object, str)
+
+
+class QueueListWorker(QCor.QRunnable):
+    def __init__(self, connection: ComfyConnection) -> None:
+        super().__init__()
+        self.connection = connection
+        self.signals = QueueListSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        try:
+            queue = self.connection.getQueue()
+        except (OSError, ValueError) as error:
+            self.signals.failed.emit(self.connection, str(error))
+            return
+        self.signals.listed.emit(self.connection, queue)
+
+
+class QueuePanel(QWgt.QWidget):
+    """Running and pending prompts of every server with their estimated wait.
+
+    The wait is the number of prompts ahead times the mean duration of our own
+    prompts, the server doesn't tell how long the ones of other clients take.
+    Polls the servers only while it's visible.
+    """
+
+    columns = ("Server", "#", "Prompt", "State", "Est. wait")
+
+    def __init__(
+        self,
+        connections: List[ComfyConnection],
+        submissionQueue: PromptSubmissionQueue,
+        profiler: ExecutionProfiler,
+        interval: int = 1000,
+        parent: QWgt.QWidget | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.connections = connections
+        self.submissionQueue = submissionQueue
+        self.profiler = profiler
+        self._pool = QCor.QThreadPool()
+        self._pool.setMaxThreadCount(max(1, len(connections)))
+        self._workers: Dict[str, QueueListWorker] = {}
+        self._queues: Dict[str, Dict[str, Any]] = {}
+        self.tree = QWgt.QTreeWidget()
+        self.tree.setColumnCount(len(self.columns))
+        self.tree.setHeaderLabels(self.columns)
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSelectionMode(
+            QWgt.QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        cancelButton = QWgt.QPushButton("Cancel selected")
+        cancelButton.clicked.connect(self.cancelSelected)
+        interruptButton = QWgt.QPushButton("Interrupt")
+        interruptButton.setToolTip("Stops the selected running prompts we sent")
+        interruptButton.clicked.connect(self.interrupt)
+        buttons = QWgt.QHBoxLayout()
+        buttons.addWidget(cancelButton)
+        buttons.addWidget(interruptButton)
+        layout = QWgt.QVBoxLayout(self)
+        layout.addWidget(self.tree)
+        layout.addLayout(buttons)
+        self.timer = QCor.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+        submissionQueue.accepted.connect(lambda *args: self.poll())
+        submissionQueue.cancelled.connect(lambda *args: self.poll())
+
+    def showEvent(self, event: Any) -> None:
+        self.poll()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event: Any) -> None:
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def poll(self) -> None:
+        if not self.isVisible():
+            return
+        for connection in self.connections:
+            if connection.serverAddress in self._workers:
+                # the last request is still running
+                continue
+            worker = QueueListWorker(connection)
+            worker.signals.listed.connect(self._listed)
+            worker.signals.failed.connect(self._failed)
+            self._workers[connection.serverAddress] = worker
+            self._pool.start(worker)
+
+    def _listed(self, connection: ComfyConnection, queue: Dict[str, Any]) -> None:
+        self._workers.pop(connection.serverAddress, None)
+        self._queues[connection.serverAddress] = queue
+        self.refresh()
+
+    def _failed(self, connection: ComfyConnection, error: str) -> None:
+        self._workers.pop(connection.serverAddress, None)
+        self._queues.pop(connection.serverAddress, None)
+        print(f"could not list the queue of {connection.serverAddress}: {error}")
+        self.refresh()
+
+    def estimatedWaits(self, queue: Dict[str, Any]) -> Dict[str, float | None]:
+        """Seconds until every pending prompt of `queue` starts."""
+        mean = self.profiler.promptStats.mean
+        if mean <= 0:
+            return {}
+        ahead = 0.0
+        for item in queue.get("queue_running", []):
+            running = self.profiler.runningFor(item[1])
+            ahead += max(0.0, mean - running) if running is not None else mean
+        waits: Dict[str, float | None] = {}
+        for item in sorted(queue.get("queue_pending", []), key=lambda i: i[0]):
+            waits[item[1]] = ahead
+            ahead += mean
+        return waits
+
+    def refresh(self) -> None:
+        selected = {
+            item.data(2, QCor.Qt.ItemDataRole.UserRole)
+            for item in self.tree.selectedItems()
+        }
+        self.tree.clear()
+        for connection in self.connections:
+            queue = self._queues.get(connection.serverAddress, None)
+            if queue is None:
+                continue
+            waits = self.estimatedWaits(queue)
+            items = [("running", i) for i in queue.get("queue_running", [])] + [
+                ("pending", i)
+                for i in sorted(queue.get("queue_pending", []), key=lambda i: i[0])
+            ]
+            for state, entry in items:
+                number, promptId = entry[0], entry[1]
+                extra = entry[3] if len(entry) > 3 else {}
+                ours = extra.get("client_id", None) == connection.clientId
+                wait = waits.get(promptId, None)
+                item = QWgt.QTreeWidgetItem(
+                    [
+                        connection.serverAddress,
+                        str(number),
+                        promptId if ours else f"{promptId} (other client)",
+                        state,
+                        "" if state == "running" else self._formatWait(wait),
+                    ]
+                )
+                item.setData(0, QCor.Qt.ItemDataRole.UserRole, connection)
+                item.setData(2, QCor.Qt.ItemDataRole.UserRole, promptId)
+                item.setData(3, QCor.Qt.ItemDataRole.UserRole, state)
+                item.setData(1, QCor.Qt.ItemDataRole.UserRole, ours)
+                self.tree.addTopLevelItem(item)
+                item.setSelected(promptId in selected)
+
+    @staticmethod
+    def _formatWait(wait: float | None) -> str:
+        if wait is None:
+            return "?"
+        if wait < 60:
+            return f"{wait:.1f} s"
+        minutes, seconds = divmod(int(wait), 60)
+        if minutes < 60:
+            return f"{minutes}:{seconds:02}"
+        return f"{minutes // 60}:{minutes % 60:02}:{seconds:02}"
+
+    def ownSelected(self, state: str) -> List[QWgt.QTreeWidgetItem]:
+        """Selected prompts in `state` that we sent, prompts of other clients
+        are only listed."""
+        return [
+            item
+            for item in self.tree.selectedItems()
+            if item.data(3, QCor.Qt.ItemDataRole.UserRole) == state
+            and item.data(1, QCor.Qt.ItemDataRole.UserRole)
+        ]
+
+    def cancelSelected(self) -> None:
+        for item in self.ownSelected("pending"):
+            self.submissionQueue.cancelPrompt(
+                item.data(0, QCor.Qt.ItemDataRole.UserRole),
+                item.data(2, QCor.Qt.ItemDataRole.UserRole),
+            )
+
+    def interrupt(self) -> None:
+        for item in self.ownSelected("running"):
+            self.submissionQueue.interrupt(item.data(0, QCor.Qt.ItemDataRole.UserRole))
+
+    def waitForDone(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
@@ -0,0 +1,261 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+import hashlib
+import os
+import tempfile
+import threading
+
+import PySide6.QtCore as QCor
+import PySide6.QtGui as QGui
+
+from server import ComfyConnection
+
+
+class ImageRef:
+    """An output image as the server knows it."""
+
+    def __init__(
+        self, serverAddress: str, filename: str, subfolder: str, folderType: str
+    ) -> None:
+        self.serverAddress = serverAddress
+        self.filename = filename
+        self.subfolder = subfolder
+        self.folderType = folderType
+
+    @property
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.serverAddress, self.folderType, self.subfolder, self.filename)
+
+    @classmethod
+    def fromHistory(cls, serverAddress: str, entry: Dict[str, Any]) -> "ImageRef":
+        return cls(
+            serverAddress,
+            entry["filename"],
+            entry.get("subfolder", ""),
+            entry.get("type", "output"),
+        )
+
+
+class ImageDiskCache:
+    """Size capped cache of full images, least recently used files are evicted."""
+
+    def __init__(self, folder: str, maxBytes: int) -> None:
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._files: OrderedDict[str, int] = OrderedDict()
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(".tmp"):
+                # left over by a write that didn't finish
+                os.remove(entry.path)
+            elif entry.is_file():
+                entries.append(entry)
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            self._files[entry.name] = entry.stat().st_size
+        self._size = sum(self._files.values())
+
+    def _name(self, ref: ImageRef) -> str:
+        digest = hashlib.sha1("\n".join(ref.key).encode()).hexdigest()
+        return digest + os.path.splitext(ref.filename)[1]
+
+    def path(self, ref: ImageRef) -> str | None:
+        name = self._name(ref)
+        with self._lock:
+            if name not in self._files:
+                return None
+            self._files.move_to_end(name)
+        return os.path.join(self.folder, name)
+
+    def get(self, ref: ImageRef) -> bytes | None:
+        path = self.path(ref)
+        if path is None:
+            return None
+        try:
+            os.utime(path)
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, ref: ImageRef, data: bytes) -> None:
+        name = self._name(ref)
+        if len(data) > self.maxBytes:
+            return
+        # workers fetching the same image each write their own file
+        fd, tmpPath = tempfile.mkstemp(".tmp", dir=self.folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmpPath, os.path.join(self.folder, name))
+        except OSError:
+            os.remove(tmpPath)
+            raise
+        with self._lock:
+            self._size += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            while self._size > self.maxBytes:
+                oldName, oldSize = self._files.popitem(last=False)
+                self._size -= oldSize
+                try:
+                    os.remove(os.path.join(self.folder, oldName))
+                except OSError:
+                    pass
+
+
+class ThumbnailSignals(QCor.QObject):
+    done = QCor.Signal(object, object, object)
+
+
+class ThumbnailWorker(QCor.QRunnable):
+    def __init__(
+        self,
+        connection: ComfyConnection,
+        diskCache: ImageDiskCache,
+        ref: ImageRef,
+        size: QCor.QSize,
+    ) -> None:
+        super().__init__()
+        self.connection = connection
+        self.diskCache = diskCache
+        self.ref = ref
+        self.size = size
+        self.signals = ThumbnailSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        image = QGui.QImage()
+        try:
+            data = self.diskCache.get(self.ref)
+            if data is None:
+                data = self.connection.getImage(
+                    self.ref.filename, self.ref.subfolder, self.ref.folderType
+                )
+                self.diskCache.put(self.ref, data)
+            # the full image is dropped as soon as the thumbnail exists
+            image = QGui.QImage.fromData(data)
+            if not image.isNull() and self.size.isValid():
+                image = image.scaled(
+                    self.size,
+                    QCor.Qt.AspectRatioMode.KeepAspectRatio,
+                    QCor.Qt.TransformationMode.SmoothTransformation,
+                )
+        except OSError as error:
+            print(f"could not fetch {self.ref.filename}: {error}")
+        self.signals.done.emit(self.ref, self.size, image)
+
+
+class HistorySignals(QCor.QObject):
+    done = QCor.Signal(str, object)
+
+
+class HistoryWorker(QCor.QRunnable):
+    def __init__(self, connection: ComfyConnection, promptId: str) -> None:
+        super().__init__()
+        self.connection = connection
+        self.promptId = promptId
+        self.signals = HistorySignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        outputs: Dict[str, List[ImageRef]] = {}
+        try:
+            history = self.connection.getHistory(self.promptId)
+            entry = history.get(self.promptId, {})
+            for nodeId, nodeOutputs in entry.get("outputs", {}).items():
+                outputs[nodeId] = [
+                    ImageRef.fromHistory(self.connection.serverAddress, i)
+                    for i in nodeOutputs.get("images", [])
+                ]
+        except (OSError, ValueError, KeyError) as error:
+            print(f"could not fetch history of {self.promptId}: {error}")
+        self.signals.done.emit(self.promptId, outputs)
+
+
+class ResultFetcher(QCor.QObject):
+    """Fetches prompt outputs and keeps a bounded set of decoded thumbnails.
+
+    Full images only live in the disk cache, memory holds at most
+    `maxThumbnails` thumbnails.
+    """
+
+    outputsReady = QCor.Signal(str, object)
+    # ref, size and the thumbnail, a null image when it couldn't be fetched
+    thumbnailReady = QCor.Signal(object, object, object)
+
+    def __init__(
+        self,
+        cacheFolder: str,
+        maxDiskBytes: int = 1024 * 1024 * 1024,
+        maxThumbnails: int = 256,
+        maxThreads: int = 4,
+    ) -> None:
+        super().__init__()
+        self.diskCache = ImageDiskCache(cacheFolder, maxDiskBytes)
+        self.maxThumbnails = maxThumbnails
+        self._thumbnails: OrderedDict[
+            Tuple[Tuple[str, str, str, str], int, int], QGui.QImage
+        ] = OrderedDict()
+        self._pool = QCor.QThreadPool()
+        self._pool.setMaxThreadCount(maxThreads)
+        self._workers: Dict[Any, QCor.QRunnable] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fetchOutputs(self, connection: ComfyConnection, promptId: str) -> None:
+        worker = HistoryWorker(connection, promptId)
+        worker.signals.done.connect(self._onOutputs)
+        self._workers[("history", promptId)] = worker
+        self._pool.start(worker)
+
+    def _onOutputs(self, promptId: str, outputs: Dict[str, List[ImageRef]]) -> None:
+        self._workers.pop(("history", promptId), None)
+        self.outputsReady.emit(promptId, outputs)
+
+    @staticmethod
+    def thumbnailKey(
+        ref: ImageRef, size: QCor.QSize
+    ) -> Tuple[Tuple[str, str, str, str], int, int]:
+        return (ref.key, size.width(), size.height())
+
+    def thumbnail(self, ref: ImageRef, size: QCor.QSize) -> QGui.QImage | None:
+        key = self.thumbnailKey(ref, size)
+        image = self._thumbnails.get(key, None)
+        if image is not None:
+            self._thumbnails.move_to_end(key)
+        return image
+
+    def requestThumbnail(
+        self, connection: ComfyConnection, ref: ImageRef, size: QCor.QSize
+    ) -> None:
+        image = self.thumbnail(ref, size)
+        if image is not None:
+            self.hits += 1
+            self.thumbnailReady.emit(ref, size, image)
+            return
+        workerKey = self.thumbnailKey(ref, size)
+        if workerKey in self._workers:
+            return
+        self.misses += 1
+        worker = ThumbnailWorker(connection, self.diskCache, ref, size)
+        worker.signals.done.connect(self._onThumbnail)
+        self._workers[workerKey] = worker
+        self._pool.start(worker)
+
+    def _onThumbnail(self, ref: ImageRef, size: QCor.QSize, image: QGui.QImage) -> None:
+        key = self.thumbnailKey(ref, size)
+        self._workers.pop(key, None)
+        if not image.isNull():
+            self._thumbnails[key] = image
+            while len(self._thumbnails) > self.maxThumbnails:
+                self._thumbnails.popitem(last=False)
+        self.thumbnailReady.emit(ref, size, image)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "thumbnails": len(self._thumbnails),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
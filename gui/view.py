@@ -27,6 +27,9 @@ import PySide6.QtWidgets as QWgt
 
 class QNodeGraphicsView(QWgt.QGraphicsView):
     activeNodeChanged = QCor.Signal()
+    promptRequested = QCor.Signal(object)
+    # the graph to compile in the background and send
+    sendRequested = QCor.Signal(object)
 
     @property
     def activeOp(self) -> GraphOp | None:
@@ -151,11 +154,28 @@ class QNodeGraphicsView(QWgt.QGraphicsView):
         self.promptAction.triggered.connect(self.performPrompt)
         self.addAction(self.promptAction)
 
+        self.runToHereAction = QGui.QAction()
+        self.runToHereAction.setShortcut(
+            QCor.QKeyCombination(
+                QGui.Qt.KeyboardModifier.ControlModifier
+                | QGui.Qt.KeyboardModifier.ShiftModifier,
+                QGui.Qt.Key.Key_F5,
+            )
+        )
+        self.runToHereAction.triggered.connect(self.performRunToHere)
+        self.addAction(self.runToHereAction)
+
     def save(self) -> None:
         self.nodeScene.sceneCollection.toJSON()
 
     def performPrompt(self) -> None:
-        self.nodeScene.sceneCollection.prompt()
+        self.sendRequested.emit(self.nodeScene.sceneCollection)
+
+    def performRunToHere(self) -> None:
+        node = self.activeNode
+        if node is None:
+            return
+        self.promptRequested.emit(self.nodeScene.sceneCollection.compileUpTo(node))
 
     def performUndo(self) -> None:
         self.nodeScene.undo()
@@ -166,6 +186,15 @@ class QNodeGraphicsView(QWgt.QGraphicsView):
     def getSelected(self) -> List[BaseGrNode]:
         return [x for x in self.items() if x.isSelected() and isinstance(x, BaseGrNode)]
 
+    def setNodeScene(self, nodeScene: NodeScene) -> None:
+        """Shows another scene of the same graph, new nodes are added to it."""
+        self.activeNode = None
+        self.nodeScene = nodeScene
+        self.grScene = nodeScene.grScene
+        self.setScene(self.grScene)
+        nodeScene.sceneCollection.activeScene = nodeScene
+        nodeScene.sceneCollection.nodeFactory.activeScene = nodeScene
+
     def keyPressEvent(self, event: QGui.QKeyEvent) -> None:
         super().keyPressEvent(event)
 
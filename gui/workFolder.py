@@ -97,12 +97,14 @@ class WorkFolder:
     def __init__(self, folder: str, factory: ComfyFactory) -> None:
         self.workFolder = os.path.join(folder, "Pomfy workFolder")
         self.treeFolder = os.path.join(self.workFolder, "nodeTrees")
+        self.cacheFolder = os.path.join(self.workFolder, "cache")
         self.factory = factory
         self.sceneCollections: List[MaybeSceneCollection] = []
         if not os.path.exists(self.workFolder):
             os.makedirs(self.workFolder)
             os.makedirs(self.treeFolder)
             # TODO: setup empty subgraph library
+        os.makedirs(self.cacheFolder, exist_ok=True)
         treeFiles = glob(os.path.join(self.treeFolder, "*.pnt"))
         for f in treeFiles:
             obj = MaybeSceneCollection(f, factory)
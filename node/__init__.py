@@ -2,4 +2,5 @@ from .edge import NodeEdge
 from .socket import NodeSocket
 from .node import Node
 from .scene import NodeScene
+from .dependencyIndex import DependencyIndex
 from .sceneCollection import SceneCollection
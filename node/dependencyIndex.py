@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from node import Node
+
+
+class DependencyIndex:
+    """The nodes every node reads from, kept until one of its edges changes.
+
+    Compiling walks these lists from the nodes it starts at, the nodes it
+    reaches are exactly their ancestors.
+    """
+
+    def __init__(self) -> None:
+        self._upstream: Dict[Node, List[Node]] = {}
+
+    def dependencies(self, node: Node) -> List[Node]:
+        upstream = self._upstream.get(node, None)
+        if upstream is None:
+            upstream = node.dependencies()
+            self._upstream[node] = upstream
+        return upstream
+
+    def invalidate(self, node: Node) -> None:
+        self._upstream.pop(node, None)
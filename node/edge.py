@@ -53,6 +53,13 @@ class NodeEdge:
         self.updateConnections()
 
     def _triggerChange(self, cct: ConnectionChangedType) -> None:
+        # whatever reads through this edge has to be compiled again
+        for socket in (self._outputSocket, self._inputSocket):
+            self._nodeScene.sceneCollection.dependencyIndex.invalidate(
+                socket.nodeSlot.node
+            )
+            if socket.nodeSlot.slotType != SlotType.OUTPUT:
+                socket.nodeSlot.node.invalidate()
         self._outputSocket.triggerConnectionChange(self, cct)
         self._inputSocket.triggerConnectionChange(self, cct)
 
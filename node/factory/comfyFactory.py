@@ -1,9 +1,18 @@
-import collections
 from functools import partial
 from itertools import permutations
 from decimal import Decimal
-import json
-from typing import Dict, Callable, Any, Type, Tuple, List, TypedDict, Literal, cast
+from typing import (
+    Dict,
+    Callable,
+    Any,
+    Mapping,
+    Type,
+    Tuple,
+    List,
+    TypedDict,
+    Literal,
+    cast,
+)
 from events import Event
 
 import PySide6.QtCore
@@ -18,6 +27,7 @@ from nodeSlots.slots.namedSlot import NamedSlot
 from style.socketStyle import SocketStyles
 from specialNodes.nodes import *
 from specialNodes.customNode import loadCustomNodes, CustomNode
+from node.factory.nodeDefinitions import LazyNodeDefinitions, parseSpec
 
 import PySide6.QtWidgets as QWgt
 import PySide6.QtGui as QGui
@@ -212,8 +222,12 @@ class _SlotInfo:
 
 
 class ComfyFactory:
-    def __init__(self, socketStyles: SocketStyles) -> None:
-        self._nodeDefinitions: ComfySpec = {}
+    def __init__(self, socketStyles: SocketStyles, lazy: bool = True) -> None:
+        # parse the inputs of a node definition only when the node is used
+        self.lazy = lazy
+        self._nodeDefinitions: Mapping[str, ComfyNodeSpec] = {}
+        # node classes whose slots aren't in the detailed search yet
+        self._unsearched: List[str] = []
         self._specialNodes: Dict[str, Callable[["ComfyFactory", Any], Node]] = {}
         self._menuStructure: MenuData = MenuData("")
         self.socketStyles = socketStyles
@@ -224,6 +238,24 @@ class ComfyFactory:
         self._DetailedSearch: QSearchableMenu | None = None
         self._onCreate: Callable[[Node], None] | None = None
 
+    @property
+    def nodeDefinitions(self) -> Mapping[str, ComfyNodeSpec]:
+        return self._nodeDefinitions
+
+    def addComboOption(self, nodeClass: str, inputName: str, option: str) -> None:
+        """Adds `option` to a combo input of the loaded definitions, for
+        options the server has before the definitions are fetched again."""
+        definition = self._nodeDefinitions.get(nodeClass, None)
+        if definition is None:
+            return
+        inputs = definition["input"]
+        for section in (inputs.get("required", None), inputs.get("optional", None)):
+            spec = section.get(inputName, None) if section is not None else None
+            if spec is not None and isinstance(spec[0], list):
+                if option not in spec[0]:
+                    spec[0].append(option)
+                return
+
     def GenerateMenu(
         self, onCreate: Callable[[Node], None] | None = None
     ) -> QWgt.QMenu:
@@ -267,6 +299,14 @@ class ComfyFactory:
 
     def getDetailedSearch(self) -> QSearchableMenu:
         if self._DetailedSearch is None:
+            if len(self._unsearched) > 0:
+                # definitions go before the custom nodes, like when eager
+                customSearch = self._ExpandSearchList
+                self._ExpandSearchList = []
+                for name in self._unsearched:
+                    self.expandSearchInfoFromDef(name, self._nodeDefinitions[name])
+                self._ExpandSearchList.extend(customSearch)
+                self._unsearched = []
             self._DetailedSearch = QSearchableMenu(
                 self._ExpandSearchList,
                 lambda x: f"{x.displayName} > {x.slotName}",
@@ -376,26 +416,47 @@ class ComfyFactory:
                 )
             )
 
-    def loadNodeDefinitions(self, jsonString: str) -> None:
+    def loadNodeDefinitions(self, jsonString: str | bytes) -> None:
         self._menuStructure = MenuData("")
-        nodeDefinitions = json.loads(
-            jsonString, object_pairs_hook=collections.OrderedDict, parse_float=Decimal
-        )
-        self._nodeDefinitions = nodeDefinitions
-        for key, value in self._nodeDefinitions.items():
-            categories = value["category"].split("/")
-            self._menuStructure.addItem(
-                categories,
-                value["display_name"],
-                key,
-                partial(self._loadNode, name=key),
-            )
-            self.expandSearchInfoFromDef(key, value)
+        # definitions can be reloaded, drop everything that was derived from them
+        self._menu = None
+        self._flatMenu = None
+        self._ExpandSearchList = []
+        self._DetailedSearch = None
+        self._unsearched = []
+        if self.lazy:
+            definitions = LazyNodeDefinitions(jsonString)
+            self._nodeDefinitions = definitions
+            for key in definitions:
+                summary = definitions.summary(key)
+                self._menuStructure.addItem(
+                    summary["category"].split("/"),
+                    summary["display_name"],
+                    key,
+                    partial(self._loadNode, name=key),
+                )
+            self._unsearched = list(definitions)
+        else:
+            nodeDefinitions: ComfySpec = parseSpec(jsonString)
+            self._nodeDefinitions = nodeDefinitions
+            for key, value in nodeDefinitions.items():
+                categories = value["category"].split("/")
+                self._menuStructure.addItem(
+                    categories,
+                    value["display_name"],
+                    key,
+                    partial(self._loadNode, name=key),
+                )
+                self.expandSearchInfoFromDef(key, value)
         for customNode in loadCustomNodes():
             custom_categories = customNode.getCategory()
-            assert custom_categories is not None
             className = customNode.getClassName()
             displayName = customNode.getDisplayName()
+            if custom_categories is None:
+                # made by the editor instead of picked from the menu, it
+                # only needs to load
+                self.setSpecialNode(className, customNode.createNode)
+                continue
             self._menuStructure.addItem(
                 custom_categories.split("/"),
                 displayName,
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Mapping, Tuple
+import json
+import re
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+# plain dicts and floats, the C scanner parses those without calling back
+_plain = json.JSONDecoder()
+
+
+def parseSpec(data: bytes | str) -> Any:
+    """Parses node definitions the way the factory expects them, ordered and
+    with exact decimals."""
+    return json.loads(data, object_pairs_hook=OrderedDict, parse_float=Decimal)
+
+
+class LazyNodeDefinitions(Mapping[str, Any]):
+    """Node definitions of an /object_info payload, parsed per node on first
+    access.
+
+    Indexing decodes one node at a time into plain dicts and floats, which
+    the C scanner does without calling back into Python, and keeps only
+    where the node starts and ends plus its fields other than the inputs.
+    The ordered dicts and decimals the slots are built from are made when
+    the node is first looked up.
+    """
+
+    def __init__(self, data: bytes | str) -> None:
+        self._data = data.decode("utf-8") if isinstance(data, bytes) else data
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._specs: Dict[str, Any] = {}
+        self._index()
+
+    def _skip(self, pos: int, expected: str | None = None) -> int:
+        pos = _whitespace.match(self._data, pos).end()  # type: ignore[union-attr]
+        if expected is not None:
+            if self._data[pos : pos + 1] != expected:
+                raise ValueError(f"expected {expected!r} at {pos}")
+            pos += 1
+        return pos
+
+    def _index(self) -> None:
+        data = self._data
+        pos = self._skip(self._skip(0, "{"))
+        if data[pos : pos + 1] == "}":
+            pos += 1
+        else:
+            while True:
+                name, pos = _plain.raw_decode(data, self._skip(pos))
+                if not isinstance(name, str):
+                    raise ValueError(f"expected a node name at {pos}")
+                pos = self._skip(self._skip(pos, ":"))
+                # parsed with plain types and dropped again, only the span
+                # and the small fields are kept
+                spec, end = _plain.raw_decode(data, pos)
+                if not isinstance(spec, dict):
+                    raise ValueError(f"definition of {name} is not an object")
+                self._spans[name] = (pos, end)
+                self._summaries[name] = {
+                    key: value for key, value in spec.items() if key != "input"
+                }
+                pos = self._skip(end)
+                if data[pos : pos + 1] == "}":
+                    pos += 1
+                    break
+                pos = self._skip(pos, ",")
+        if self._skip(pos) != len(data):
+            raise ValueError(f"extra data at {pos}")
+
+    def summary(self, name: str) -> Dict[str, Any]:
+        """Everything but the inputs of a node, without parsing the inputs."""
+        return self._summaries[name]
+
+    def __getitem__(self, name: str) -> Any:
+        spec = self._specs.get(name, None)
+        if spec is None:
+            start, end = self._spans[name]
+            spec = parseSpec(self._data[start:end])
+            self._specs[name] = spec
+        return spec
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._spans
+
+    @property
+    def parsedCount(self) -> int:
+        return len(self._specs)
@@ -1,6 +1,12 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, List, Callable, Dict, Any, Tuple
-from server import ComfyPromptManager, NodeAddress, NodeResult, PartialPrompt
+from typing import TYPE_CHECKING, List, Callable, Dict, Any, Set, Tuple
+from server import (
+    ComfyPromptManager,
+    NodeAddress,
+    NodeRecord,
+    NodeResult,
+    PartialPrompt,
+)
 
 from PySide6.QtCore import QPointF
 import PySide6.QtWidgets as QWgt
@@ -27,7 +33,9 @@ class Node:
 
         self.title = title
         self.nodeClass = nodeClass
-        self.nodeID = -1
+        # prompt key of the node, saved with the graph so the server can
+        # reuse outputs of unchanged nodes across edits and reloads
+        self.uid = ""
         self.description = description
 
         self._inputs: List[NodeSlot] = []
@@ -37,6 +45,15 @@ class Node:
 
         self._namedInputs = 0
 
+        # prompt of this node from the last compile, dropped when it or
+        # anything upstream changes
+        self.compiled: (
+            Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]] | None
+        ) = None
+        # what compiling it off the UI thread needs, dropped along with the
+        # compiled prompt
+        self.record: NodeRecord | None = None
+
         self.grNode = self.createGUI()
 
         self.nodeScene.addNode(self)
@@ -59,6 +76,8 @@ class Node:
     def setTitle(self, title: str) -> None:
         self.title = title
         self.grNode.changeTitle(title)
+        # its title is part of its record, dropped with everything downstream
+        self.invalidate()
 
     def remove(self) -> None:
         for slot in self.inputs:
@@ -131,7 +150,7 @@ class Node:
                 {
                     "ind": slot.ind,
                     "name": slot._name,
-                    "typeName": slot.socket.socketType,
+                    "typeName": list(slot.socket.socketType.types),
                     "content": slot.saveState(),
                 }
             )
@@ -140,7 +159,7 @@ class Node:
                 {
                     "ind": slot.ind,
                     "name": slot._name,
-                    "typeName": slot.socket.socketType,
+                    "typeName": list(slot.socket.socketType.types),
                     "content": slot.saveState(),
                 }
             )
@@ -158,25 +177,109 @@ class Node:
             self.setTitle(state["title"])
         for slotState in state["input"]:
             for x in self.inputs:
-                if (
-                    x._name == slotState["name"]
-                    and x.socket.socketType == slotState["typeName"]
-                ):
+                if x._name == slotState["name"] and self._sameType(x, slotState):
                     x.loadState(slotState["content"])
-                    continue
+                    break
+            else:
                 print(f'error in inputs: {slotState["name"]} {slotState["typeName"]}')
         for slotState in state["output"]:
             for x in self.outputs:
-                if (
-                    x.ind == slotState["ind"]
-                    and x.socket.socketType == slotState["typeName"]
-                ):
+                if x.ind == slotState["ind"] and self._sameType(x, slotState):
                     x.loadState(slotState["content"])
-                    continue
+                    break
+            else:
                 print(f'error in outputs: {slotState["ind"]} {slotState["typeName"]}')
 
-    def getNodeAddress(self, promptManager: ComfyPromptManager) -> str:
-        return ".".join([self.nodeClass, str(self.nodeID)])
+    @staticmethod
+    def _sameType(slot: NodeSlot, slotState: Dict[str, Any]) -> bool:
+        """Types are saved as lists of type names, anything else matches any
+        type."""
+        typeName = slotState.get("typeName", None)
+        if not isinstance(typeName, list):
+            return True
+        return set(typeName) == set(slot.socket.socketType.types)
+
+    def invalidate(self) -> None:
+        """Drops the compiled prompt and record of this node and of everything
+        downstream.
+
+        Nodes downstream can hold a compiled prompt or record even when this
+        node has neither, so the walk doesn't stop early, only nodes already
+        visited are skipped.
+        """
+        self.nodeScene.invalidateGroup()
+        pending: List[Node] = [self]
+        visited: Set[Node] = {self}
+        while len(pending) > 0:
+            node = pending.pop()
+            node.compiled = None
+            node.record = None
+            for dependent in node.dependents():
+                if dependent not in visited:
+                    visited.add(dependent)
+                    pending.append(dependent)
+
+    def dependents(self) -> List[Node]:
+        """Nodes that read the outputs of this node."""
+        nodes: List[Node] = []
+        for slot in self.outputs:
+            for edge in slot.socket.edges:
+                if edge.outputSocket is slot.socket and edge.inputSocket is not None:
+                    nodes.append(edge.inputSocket.nodeSlot.node)
+        return nodes
+
+    def dependencies(self) -> List[Node]:
+        """Nodes whose outputs this node reads when it's compiled."""
+        nodes: List[Node] = []
+        for slot in self.inputs:
+            for edge in slot.socket.edges:
+                # edges leaving a two way socket are read downstream
+                if edge.outputSocket is None or edge.outputSocket is slot.socket:
+                    continue
+                nodes.append(edge.outputSocket.nodeSlot.node)
+        return nodes
+
+    def snapshot(self) -> NodeRecord:
+        """The compile inputs of this node as plain values, see execute."""
+        if self.record is not None:
+            return self.record
+        inputs: List[Tuple[str, NodeAddress | NodeResult | None, bool]] = []
+        error = None
+        for slot in self.inputs:
+            if len(slot.socket.edges) == 0:
+                if slot.content is None and not slot.optional:
+                    error = f"input {slot.name} is not connected"
+                    break
+                value: NodeAddress | NodeResult | None = NodeResult(slot.toPrompt())
+            else:
+                target = slot.socket.edges[0].outputSocket
+                value = target.nodeSlot.node.resolveOutput(target.nodeSlot.ind)
+            inputs.append((slot.name, value, slot.optional))
+        self.record = NodeRecord(
+            self,
+            self.getNodeAddress(),
+            self.title,
+            self.nodeClass,
+            self.isOutput,
+            self.clientOnly,
+            tuple(inputs),
+            tuple((slot.ind, self.resolveOutput(slot.ind)) for slot in self.outputs),
+            tuple(n.getNodeAddress() for n in self.dependencies()),
+            error,
+        )
+        return self.record
+
+    def resolveOutput(self, ind: int) -> NodeAddress | NodeResult | None:
+        """What reading output `ind` compiles to."""
+        for slot in self.outputs:
+            if slot.ind == ind:
+                if slot.content is not None:
+                    return NodeResult(slot.toPrompt())
+                return NodeAddress(ind, self.getNodeAddress())
+        return None
+
+    def getNodeAddress(self, promptManager: ComfyPromptManager | None = None) -> str:
+        return ".".join([self.nodeClass, self.uid])
 
     def getCashedExecute(
         self, promptManager: ComfyPromptManager
@@ -197,14 +300,14 @@ class Node:
         slotResults: Dict[str, NodeAddress | NodeResult | None] = {}
         optional = []
         for slot in self.inputs:
-            slotResults[slot._name] = slot.execute(promptManager)
+            slotResults[slot._name] = promptManager.executeSlot(slot)
             optional.append(slot.optional)
         for s, o in zip(slotResults.values(), optional):
             if s is None and not o:
                 return None
         slotOutputs: Dict[int, NodeAddress | NodeResult] = {}
         for slot in self.outputs:
-            slotOutput = slot.execute(promptManager)
+            slotOutput = promptManager.executeSlot(slot)
             assert slotOutput is not None
             slotOutputs[slot.ind] = slotOutput
         if self.clientOnly:
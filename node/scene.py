@@ -6,6 +6,7 @@ from node import NodeEdge
 if TYPE_CHECKING:
     from node import Node, NodeSocket, SceneCollection
     from node.factory import ComfyFactory
+    from server import GroupTemplate
 
 from nodeGUI import QNodeGraphicsScene
 
@@ -14,7 +15,6 @@ class NodeScene:
     def __init__(self, sceneCollection: SceneCollection, name: str = "nodeTree"):
         self.nodes: List[Node] = []
         self.edges: List[NodeEdge] = []
-        self.nodeIds: Dict[str, List[int]] = {}
 
         self.sceneCollection = sceneCollection
 
@@ -23,6 +23,14 @@ class NodeScene:
 
         self.name = name
 
+        # this scene compiled for the group nodes using it, dropped when
+        # anything in it changes
+        self.groupTemplate: GroupTemplate | None = None
+        self.groupNodes: Set[Node] = set()
+        # whether running this scene runs output nodes, see hasOutputs in
+        # groupNode, dropped when its nodes change
+        self.hasOutputs: bool | None = None
+
         self.initUI()
 
     def initUI(self) -> None:
@@ -30,22 +38,47 @@ class NodeScene:
         self.grScene.setGrScene(self.scene_width, self.scene_height)
 
     def registerNode(self, node: Node) -> None:
-        if node.nodeClass not in self.nodeIds:
-            self.nodeIds[node.nodeClass] = [0]
-            node.nodeID = 0
-            return
-        ids = self.nodeIds[node.nodeClass]
-        for i, id in enumerate(ids):
-            if i != id:
-                node.nodeID = i
-                ids.insert(i, i)
-                return
-        id = len(ids)
-        node.nodeID = id
-        ids.append(id)
+        """Keeps the id of `node` unless another node of the collection has
+        it, new nodes get a fresh one."""
+        nodeUids = self.sceneCollection.nodeUids
+        if node.uid == "" or nodeUids.get(node.uid, node) is not node:
+            node.uid = self.sceneCollection.newNodeUid()
+        nodeUids[node.uid] = node
 
     def deregisterNode(self, node: Node) -> None:
-        self.nodeIds[node.nodeClass].remove(node.nodeID)
+        if self.sceneCollection.nodeUids.get(node.uid, None) is node:
+            del self.sceneCollection.nodeUids[node.uid]
+
+    def restoreUid(self, node: Node, uid: str) -> None:
+        """Gives `node` the id it was saved with, if it's still free."""
+        if uid == node.uid or uid in self.sceneCollection.nodeUids:
+            return
+        self.deregisterNode(node)
+        node.uid = uid
+        self.registerNode(node)
+        node.invalidate()
+
+    def invalidateGroup(self) -> None:
+        """Drops the compiled group and the prompts of the group nodes
+        inlining it."""
+        if self.groupTemplate is None:
+            return
+        self.groupTemplate = None
+        for node in self.groupNodes:
+            node.invalidate()
+
+    def invalidateOutputs(self) -> None:
+        """Drops whether this scene and the scenes using it as a group have
+        output nodes."""
+        pending: List[NodeScene] = [self]
+        visited: Set[NodeScene] = {self}
+        while len(pending) > 0:
+            nodeScene = pending.pop()
+            nodeScene.hasOutputs = None
+            for node in nodeScene.groupNodes:
+                if node.nodeScene not in visited:
+                    visited.add(node.nodeScene)
+                    pending.append(node.nodeScene)
 
     def undo(self) -> None:
         self.sceneCollection.ntm.undo()
@@ -88,6 +121,14 @@ class NodeScene:
     def _addNode(self, node: Node) -> None:
         self.nodes.append(node)
         self.registerNode(node)
+        # compiled prompts refer to the node by its id, which changes if it
+        # was taken while the node was removed. Its edges are added after it,
+        # so there is nothing downstream yet, and a node still being
+        # constructed may not have its slots to look for any
+        node.compiled = None
+        node.record = None
+        self.invalidateGroup()
+        self.invalidateOutputs()
         self.grScene.addItem(node.grNode)
 
     def addEdge(self, edge: NodeEdge) -> None:
@@ -107,6 +148,9 @@ class NodeScene:
     def _removeNode(self, node: Node) -> None:
         self.nodes.remove(node)
         self.deregisterNode(node)
+        self.sceneCollection.dependencyIndex.invalidate(node)
+        self.invalidateGroup()
+        self.invalidateOutputs()
         self.grScene.removeItem(node.grNode)
 
     def removeEdge(self, edge: NodeEdge) -> None:
@@ -124,6 +168,8 @@ class NodeScene:
         for nodeState in state["nodes"]:
             node = factory.loadNode(nodeState["nodeClass"])
             node.loadState(nodeState)
+            if "uid" in nodeState:
+                self.restoreUid(node, nodeState["uid"])
             nodes.append(node)
         for edgeState in state["edges"]:
             edge = NodeEdge.loadState(self, edgeState, nodes)
@@ -136,7 +182,9 @@ class NodeScene:
         savedNodes = []
         nodesToSave = self.nodes
         for node in nodesToSave:
-            savedNodes.append(node.saveState())
+            nodeState = node.saveState()
+            nodeState["uid"] = node.uid
+            savedNodes.append(nodeState)
         nodeMapping = {n: i for i, n in enumerate(nodesToSave)}
         savedEdges = []
         for edge in self.edges:
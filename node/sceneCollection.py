@@ -1,10 +1,20 @@
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Mapping, Tuple
 from undo import NTM
 from node.factory import ComfyFactory
-from server import ComfyPromptManager
-from node import NodeScene
+from server import (
+    CompileProfile,
+    ComfyPromptManager,
+    NodeRecord,
+    PromptTemplate,
+    threadWriter,
+)
+from node import DependencyIndex, Node, NodeScene
 from PySide6.QtGui import QUndoStack
 import json
+import secrets
+
+if TYPE_CHECKING:
+    from nodeSlots.nodeSlot import NodeSlot
 
 
 class SceneCollection:
@@ -14,6 +24,9 @@ class SceneCollection:
         self.undoStack = QUndoStack()
         self.ntm = NTM(self.undoStack)
         self.nodeFactory = nodeFactory
+        self.dependencyIndex = DependencyIndex()
+        # every node of every scene by its uid
+        self.nodeUids: Dict[str, Node] = {}
         self.rootScene = NodeScene(self)
         self.activeScene = self.rootScene
         self.nodeFactory.activeScene = self.activeScene
@@ -36,9 +49,60 @@ class SceneCollection:
             self.scenes.append(nodeScene)
         self.nodeFactory.activeScene = self.rootScene
         self.rootScene.loadState(state["rootScene"], self.nodeFactory)
+        # restoring slot values goes through their widgets, loading isn't
+        # something to undo
+        self.undoStack.clear()
+
+    def addGroupScene(self, name: str) -> NodeScene:
+        """A new scene for group nodes to run, see GroupNode."""
+        nodeScene = NodeScene(self, name)
+        self.scenes.append(nodeScene)
+        return nodeScene
+
+    def groupScene(self, name: str) -> NodeScene | None:
+        for nodeScene in self.scenes:
+            if nodeScene.name == name:
+                return nodeScene
+        return None
+
+    def newNodeUid(self) -> str:
+        while True:
+            uid = secrets.token_hex(4)
+            if uid not in self.nodeUids:
+                return uid
+
+    def compile(self) -> ComfyPromptManager:
+        """Compiles the root scene, the other scenes are inlined by the group
+        nodes using them."""
+        promptManager = ComfyPromptManager(self.dependencyIndex)
+        promptManager.execute([self.rootScene])
+        return promptManager
+
+    def profile(self) -> CompileProfile:
+        """Compiles every node again, reusing no compiled prompt, and writes
+        the prompt, timing both."""
+        profile = CompileProfile()
+        promptManager = ComfyPromptManager(self.dependencyIndex, profile)
+        promptManager.reuseCompiled = False
+        promptManager.execute([self.rootScene])
+        with profile.phase("serialize"):
+            threadWriter().write(promptManager.partialPrompts).release()
+        return profile
+
+    def compileUpTo(self, node: Node) -> ComfyPromptManager:
+        """Compiles the part of the graph `node` needs, see executeUpTo."""
+        promptManager = ComfyPromptManager(self.dependencyIndex)
+        promptManager.executeUpTo(node, self.nodeFactory.nodeDefinitions)
+        return promptManager
+
+    def snapshot(self) -> Tuple[NodeRecord, ...]:
+        """Immutable copy of what compiling the graph reads, for compiling
+        off the UI thread with compileSnapshot."""
+        return tuple(node.snapshot() for node in self.rootScene.nodes)
 
     def prompt(self) -> Dict[str, Any]:
-        promptManager = ComfyPromptManager()
-        scenes = [self.rootScene] + self.scenes
-        promptDict = promptManager.execute(scenes)
-        return promptDict
+        return self.compile().prompt
+
+    def template(self, slots: Mapping[str, "NodeSlot"]) -> PromptTemplate:
+        """Compiles once into a template that patches the inputs of `slots`."""
+        return PromptTemplate.fromCompile(self.compile(), slots)
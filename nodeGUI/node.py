@@ -101,6 +101,12 @@ class BaseGrNode(QWgt.QGraphicsItem):
     def changeTitle(self, title: str) -> None:
         pass
 
+    def setPreview(self, image: QGui.QImage | None) -> None:
+        pass
+
+    def setHeat(self, heat: float | None, label: str = "") -> None:
+        pass
+
     @property
     def activeNode(self) -> bool:
         return self._active
@@ -125,6 +131,14 @@ class GrNode(BaseGrNode):
         self.title_height = 24.0
         self._padding = 20.0
 
+        self._preview: QGui.QImage | None = None
+        self._previewTop = 0.0
+        self._previewHeight = 0.0
+
+        self._heatBrush: QGui.QBrush | None = None
+        self._heatLabel = ""
+        self._heatFont = QGui.QFont("Sans Serif", 7)
+
         self._resizing = ResizeState()
         self._resize_bounds = 5.0
         self._lBound = resizeBound(
@@ -209,11 +223,41 @@ class GrNode(BaseGrNode):
             slot.grNodeSlot.setPos(0, pos)
             slot.socket.grNodeSocket.setPos(-SLOT_MIN_HEIGHT / 2, pos)
             pos += slot.grNodeSlot._height + 10
+        if self._preview is not None:
+            self._previewTop = pos
+            self._previewHeight = self._fitPreviewHeight(self._preview)
+            pos += self._previewHeight
+        self.prepareGeometryChange()
         self.height = pos + 15
         self._lBound.resize(self.height)
         self._rBound.resize(self.height)
         self.updatePaint()
 
+    def _fitPreviewHeight(self, image: QGui.QImage) -> float:
+        if image.width() == 0:
+            return 0.0
+        return self.width * image.height() / image.width()
+
+    def setPreview(self, image: QGui.QImage | None) -> None:
+        relayout = (image is None) != (self._preview is None) or (
+            image is not None and self._fitPreviewHeight(image) != self._previewHeight
+        )
+        self._preview = image
+        if relayout:
+            self.updateSlots()
+        else:
+            self.update()
+
+    def setHeat(self, heat: float | None, label: str = "") -> None:
+        """Tints the title from green to red by `heat` in [0, 1], None clears it."""
+        if heat is None:
+            self._heatBrush = None
+        else:
+            hue = (1.0 - min(max(heat, 0.0), 1.0)) / 3.0
+            self._heatBrush = QGui.QBrush(QGui.QColor.fromHsvF(hue, 0.85, 0.85))
+        self._heatLabel = label if heat is not None else ""
+        self.update()
+
     def initTitle(self) -> None:
         self.title_label = QGraphicsElidedTextItem(
             self.node.title,
@@ -237,7 +281,7 @@ class GrNode(BaseGrNode):
     ) -> None:
         # title
         painter.setPen(QGui.Qt.PenStyle.NoPen)
-        painter.setBrush(self._brush_title)
+        painter.setBrush(self._heatBrush or self._brush_title)
         painter.drawPath(self._titlePath)
 
         # content
@@ -245,6 +289,23 @@ class GrNode(BaseGrNode):
         painter.setBrush(self._brush_background)
         painter.drawPath(self._contentPath)
 
+        # preview, already scaled to roughly the on screen size
+        if self._preview is not None:
+            painter.drawImage(
+                QRectF(0, self._previewTop, self.width, self._previewHeight),
+                self._preview,
+            )
+
+        # execution time, in the padding below the last slot
+        if self._heatLabel:
+            painter.setPen(self._title_color)
+            painter.setFont(self._heatFont)
+            painter.drawText(
+                QRectF(0, self.height - 15, self.width - self.edge_size, 15),
+                QGui.Qt.AlignmentFlag.AlignRight | QGui.Qt.AlignmentFlag.AlignVCenter,
+                self._heatLabel,
+            )
+
         # outline
         outlinePen = self._pen_default
         if self.isSelected():
@@ -270,6 +331,8 @@ class GrNode(BaseGrNode):
                 slot.grNodeSlot.resize(self.width)
                 pos_y = slot.socket.grNodeSocket.pos().y()
                 slot.socket.grNodeSocket.setPos(self.width - SLOT_MIN_HEIGHT / 2, pos_y)
+            if self._preview is not None:
+                self.updateSlots()
             self.updatePaint()
             self.updateEdges()
 
@@ -30,7 +30,9 @@ class NodeSlot:
         self._name = name
         self.ind = ind
         self.node = node
-        self.content = content
+        # not through the setter, a slot being made has nothing compiled to
+        # drop and its node may still be under construction
+        self._content = content
         self.slotType = slotType
         self._height = height
         self._padding = 10
@@ -51,6 +53,16 @@ class NodeSlot:
     def name(self, value: str) -> None:
         self._name = value
         self.grNodeSlot.name = value
+        self.node.invalidate()
+
+    @property
+    def content(self) -> Any:
+        return self._content
+
+    @content.setter
+    def content(self, value: Any) -> None:
+        self._content = value
+        self.node.invalidate()
 
     def createGUI(self) -> GrNodeSlot:
         return GrNodeSlot(self, self.grContent, self._name, self.slotType, self._height)
@@ -108,7 +120,7 @@ class NodeSlot:
         else:
             if len(self.socket.edges) == 0:
                 if self.content is None and not self.optional:
-                    raise ValueError("slot content can not be None")
+                    raise ValueError(f"input {self.name} is not connected")
                 return NodeResult(self.toPrompt())
             target = self.socket.edges[0].outputSocket
             assert target is not None
@@ -73,6 +73,19 @@ class ComboSlot(NodeSlot):
         self._items = items
         cast(QComboSpinner, self.grItem).updateItems(items)
 
+    def addItem(self, item: str) -> None:
+        """Adds an option the server got after the node was made, like an
+        uploaded image, keeping the current value."""
+        if item in self.items:
+            return
+        value = self.grItem.value
+        items = self.items + [item]
+        cast(ComboSLotTyping, self.socket.socketType).updateItems(items)
+        self.updateItems(items)
+        self.grItem.undoRedoEnabled = False
+        self.grItem.value = value
+        self.grItem.undoRedoEnabled = True
+
     @property
     def items(self) -> List[str]:
         return self._items
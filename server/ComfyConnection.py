@@ -1,69 +1,656 @@
 import websockets.sync.client as client
+import websockets.exceptions
 import PySide6.QtCore as QCor
-from typing import Any, Dict, List
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+import http.client
+import queue
+import threading
+import time
 import uuid
 import json
-import urllib.request as request
+import gzip
+import os
+import re
+import select
+import zlib
 import urllib.parse as parse
 
+from server.promptWriter import threadWriter
+
 server_address = "127.0.0.1:8188"
 client_id = str(uuid.uuid4())
 
+# binary websocket event types
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+
 
 class ComfyConnection:
+    def __init__(
+        self, serverAddress: str = server_address, clientId: str = client_id
+    ) -> None:
+        self.serverAddress = serverAddress
+        self.clientId = clientId
+        self.http = httpPool(serverAddress)
+        self.session = websocketSession(serverAddress, clientId)
+        self.session.start()
+
+    def getNodeDefs(self) -> bytes:
+        return self.http.request("GET", "/object_info")
+
+    def getQueue(self) -> Dict[str, Any]:
+        queue: Dict[str, Any] = json.loads(self.http.request("GET", "/queue"))
+        return queue
+
+    def getHistory(self, promptId: str) -> Dict[str, Any]:
+        history: Dict[str, Any] = json.loads(
+            self.http.request("GET", f"/history/{parse.quote(promptId)}")
+        )
+        return history
+
+    def uploadImage(
+        self, path: str, filename: str, subfolder: str = "", overwrite: bool = True
+    ) -> Dict[str, Any]:
+        """Streams the file at `path` to /upload/image as `filename`."""
+        body = multipartFile(
+            "image",
+            path,
+            filename,
+            {"subfolder": subfolder, "type": "input", "overwrite": str(overwrite)},
+        )
+        result: Dict[str, Any] = json.loads(
+            self.http.request(
+                "POST",
+                "/upload/image",
+                body,
+                {
+                    "Content-Type": body.contentType,
+                    "Content-Length": str(len(body)),
+                },
+            )
+        )
+        return result
+
+    def getImage(self, filename: str, subfolder: str, folderType: str) -> bytes:
+        query = parse.urlencode(
+            {"filename": filename, "subfolder": subfolder, "type": folderType}
+        )
+        return self.http.request("GET", f"/view?{query}")
+
+    def hasImage(
+        self, filename: str, subfolder: str = "", folderType: str = "input"
+    ) -> bool:
+        """True if the server still has the file, asks with HEAD so the file
+        itself isn't sent."""
+        query = parse.urlencode(
+            {"filename": filename, "subfolder": subfolder, "type": folderType}
+        )
+        try:
+            self.http.request("HEAD", f"/view?{query}")
+        except ComfyHTTPError as error:
+            if error.status == 404:
+                return False
+            raise
+        return True
+
+    def postPrompt(
+        self, prompt: Mapping[str, Any], front: bool = False
+    ) -> Dict[str, Any]:
+        """Queues `prompt` on the server, safe to call from any thread.
+
+        `prompt` is a dict or the partial prompts it's made of. With `front`
+        the prompt goes ahead of everything that is pending.
+        """
+        with threadWriter().writeBody(prompt, self.clientId, front) as body:
+            response: Dict[str, Any] = json.loads(
+                self.http.request(
+                    "POST", "/prompt", body, {"Content-Type": "application/json"}
+                )
+            )
+        return response
+
+    def deleteQueued(self, promptIds: List[str]) -> None:
+        """Removes pending prompts, running ones aren't affected."""
+        data = json.dumps({"delete": promptIds}).encode("utf-8")
+        self.http.request("POST", "/queue", data, {"Content-Type": "application/json"})
+
+    def clearQueue(self) -> None:
+        data = json.dumps({"clear": True}).encode("utf-8")
+        self.http.request("POST", "/queue", data, {"Content-Type": "application/json"})
+
+    def interrupt(self) -> None:
+        """Stops the prompt that is currently running."""
+        self.http.request(
+            "POST", "/interrupt", b"{}", {"Content-Type": "application/json"}
+        )
+
+    def sendPrompt(self, prompt: Mapping[str, Any]) -> "promptSignals":
+        response = self.postPrompt(prompt)
+        return self.session.subscribe(response["prompt_id"])
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return self.http.stats()
+
+    def messageStats(self) -> Dict[str, int]:
+        return self.session.router.stats()
+
+    def close(self) -> None:
+        self.session.stop()
+        self.http.close()
+
+
+class ComfyHTTPError(OSError):
+    def __init__(self, status: int, reason: str, body: bytes) -> None:
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class multipartFile:
+    """multipart/form-data body that streams a file from disk.
+
+    Every iteration reopens the file, so a request can be retried.
+    """
+
+    chunkSize = 256 * 1024
+
+    def __init__(
+        self, field: str, path: str, filename: str, fields: Dict[str, str]
+    ) -> None:
+        self.path = path
+        self.boundary = uuid.uuid4().hex
+        self.contentType = f"multipart/form-data; boundary={self.boundary}"
+        head = b""
+        for name, value in fields.items():
+            head += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode()
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; '
+            f'filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        self._head = head
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    def __len__(self) -> int:
+        return len(self._head) + os.path.getsize(self.path) + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunkSize)
+                if not chunk:
+                    break
+                yield chunk
+        yield self._tail
+
+
+class endpointStats:
     def __init__(self) -> None:
-        self.threadpool = QCor.QThreadPool()
-        self.threadpool.setMaxThreadCount(5)
-        pass
+        self.count = 0
+        self.errors = 0
+        self.totalTime = 0.0
+        self.maxTime = 0.0
+        self.wireBytes = 0
+        self.bodyBytes = 0
 
-    def getNodeDefs(self) -> str:
-        req = request.Request(f"http://{server_address}/object_info")
-        return request.urlopen(req).read()
+    def record(self, elapsed: float, wireBytes: int, bodyBytes: int) -> None:
+        self.count += 1
+        self.totalTime += elapsed
+        self.maxTime = max(self.maxTime, elapsed)
+        self.wireBytes += wireBytes
+        self.bodyBytes += bodyBytes
 
-    def sendPrompt(self, prompt: Dict[str, Any]) -> Any:
-        p = {"prompt": prompt, "client_id": client_id}
-        data = json.dumps(p).encode("utf-8")
-        req = request.Request(f"http://{server_address}/prompt", data=data)
-        response = json.loads(request.urlopen(req).read())
-        worker = websocketWorker(response["prompt_id"])
-        self.threadpool.start(worker)
-        return
+    def toDict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "totalTime": self.totalTime,
+            "meanTime": self.totalTime / self.count if self.count > 0 else 0.0,
+            "maxTime": self.maxTime,
+            "wireBytes": self.wireBytes,
+            "bodyBytes": self.bodyBytes,
+        }
 
 
-class websocketSignals(QCor.QObject):
-    ...
+class httpPool:
+    """Thread safe pool of keep-alive connections to a single server."""
 
+    # methods that can be sent twice without changing what the server does
+    idempotentMethods = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
 
-class websocketWorker(QCor.QRunnable):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__()
-        self.args = args
-        self.kwargs = kwargs
-        self.promptId = args[0]
+    def __init__(
+        self, serverAddress: str, maxIdle: int = 8, timeout: float = 60.0
+    ) -> None:
+        self.serverAddress = serverAddress
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(
+            maxIdle
+        )
+        self._statsLock = threading.Lock()
+        self._stats: Dict[str, endpointStats] = {}
 
-    @QCor.Slot()
-    def run(self) -> None:
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            while True:
+                conn = self._idle.get_nowait()
+                if self._alive(conn):
+                    return (conn, True)
+                conn.close()
+        except queue.Empty:
+            host, _, port = self.serverAddress.partition(":")
+            conn = http.client.HTTPConnection(
+                host, int(port) if port else None, timeout=self.timeout
+            )
+            return (conn, False)
+
+    @staticmethod
+    def _alive(conn: http.client.HTTPConnection) -> bool:
+        """False if the server closed the idle connection, an idle connection
+        has nothing to read otherwise."""
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return len(readable) == 0
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
         try:
-            with client.connect(
-                f"ws://{server_address}/ws?clientId={client_id}"
-            ) as webSocket:
-                while True:
-                    packet = webSocket.recv()
-                    print(packet)
-                    if isinstance(packet, str):
-                        message = json.loads(packet)
-                        if "type" in message and message["type"] == "executing":
-                            data = message["data"]
-                            if (
-                                "node" in data
-                                and data["node"] is None
-                                and "prompt_id" in data
-                                and data["prompt_id"] == self.promptId
-                            ):
-                                break
-        except Exception as error:
-            ...
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _endpointStats(self, path: str) -> endpointStats:
+        endpoint = "/" + parse.urlsplit(path).path.split("/")[1]
+        with self._statsLock:
+            if endpoint not in self._stats:
+                self._stats[endpoint] = endpointStats()
+            return self._stats[endpoint]
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | memoryview | Iterable[bytes] | None = None,
+        headers: Dict[str, str] | None = None,
+    ) -> bytes:
+        allHeaders = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        allHeaders.update(headers or {})
+        stats = self._endpointStats(path)
+        start = time.perf_counter()
+        while True:
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, path, body, allHeaders)
+                response = conn.getresponse()
+                raw = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                # the server may have dropped an idle connection, retry on a new
+                # one. Other requests may have reached the server before it
+                # dropped, sending them twice could queue a prompt twice
+                if reused and method in self.idempotentMethods:
+                    continue
+                with self._statsLock:
+                    stats.errors += 1
+                raise
+            except OSError:
+                conn.close()
+                with self._statsLock:
+                    stats.errors += 1
+                raise
+        if response.will_close:
+            conn.close()
         else:
-            ...
-        finally:
-            ...
+            self._release(conn)
+        data = self._decode(raw, response.getheader("Content-Encoding", ""))
+        with self._statsLock:
+            stats.record(time.perf_counter() - start, len(raw), len(data))
+            if response.status >= 400:
+                stats.errors += 1
+        if response.status >= 400:
+            raise ComfyHTTPError(response.status, response.reason, data)
+        return data
+
+    @staticmethod
+    def _decode(raw: bytes, encoding: str) -> bytes:
+        encoding = encoding.strip().lower()
+        if encoding == "gzip":
+            return gzip.decompress(raw)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(raw)
+            except zlib.error:
+                # some servers send raw deflate streams without the zlib header
+                return zlib.decompress(raw, -zlib.MAX_WBITS)
+        return raw
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._statsLock:
+            return {k: v.toDict() for k, v in self._stats.items()}
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class promptSignals(QCor.QObject):
+    """Signals for a single prompt, emitted from the websocket session thread."""
+
+    message = QCor.Signal(str, object)
+    # node id, None once the prompt is done, and time.monotonic() of arrival
+    executing = QCor.Signal(object, float)
+    # value, max and node id, coalesced to messageRouter.progressRate
+    progress = QCor.Signal(int, int, object)
+    # node id and a memoryview of the encoded preview image
+    preview = QCor.Signal(object, object)
+    failed = QCor.Signal(str, object)
+    finished = QCor.Signal()
+
+    def __init__(self, promptId: str) -> None:
+        super().__init__()
+        self.promptId = promptId
+        # messages held back until the subscriber had a chance to connect
+        self._pending: List[Tuple[str, Any, float]] | None = None
+
+
+class typeSignals(QCor.QObject):
+    """Signals for every message of a type, regardless of prompt."""
+
+    message = QCor.Signal(str, object)
+
+
+class messageRouter:
+    """Parses websocket packets and routes them to prompt and type subscribers.
+
+    Only messages somebody listens to are parsed, the type is sniffed from the
+    start of the packet. Progress messages are coalesced per prompt and
+    delivered at most `progressRate` times per second.
+    """
+
+    # messages for prompts nobody subscribed to yet are kept around for this many
+    # prompts, the server can start executing before the POST response arrives
+    maxUnrouted = 64
+    progressRate = 30.0
+    # message types prompt subscribers care about
+    promptTypes = frozenset(
+        (
+            "execution_start",
+            "execution_cached",
+            "executing",
+            "executed",
+            "progress",
+            "execution_error",
+            "execution_interrupted",
+            "execution_success",
+        )
+    )
+    _typePattern = re.compile(r'\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, promptSignals] = {}
+        self._typeSubscribers: Dict[str, typeSignals] = {}
+        self._unrouted: OrderedDict[str, List[Tuple[str, Any, float]]] = OrderedDict()
+        # latest undelivered progress per prompt
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._nextProgress = 0.0
+        # prompt and node the server is currently executing, plain previews
+        # don't say who they belong to
+        self._executing: Tuple[str, str] | None = None
+        self.received = 0
+        self.parsed = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.progressDelivered = 0
+        self.previews = 0
+
+    def subscribe(self, promptId: str) -> promptSignals:
+        """Signals for `promptId`, messages that arrived before are replayed
+        once the event loop runs.
+
+        Must be called on the main thread, the replay is scheduled on the
+        caller's event loop so the caller can connect to the signals first.
+        """
+        app = QCor.QCoreApplication.instance()
+        if app is None or QCor.QThread.currentThread() is not app.thread():
+            raise RuntimeError("messageRouter.subscribe must run on the main thread")
+        signals = promptSignals(promptId)
+        with self._lock:
+            signals._pending = self._unrouted.pop(promptId, [])
+            self._subscribers[promptId] = signals
+        QCor.QTimer.singleShot(0, partial(self._flush, signals))
+        return signals
+
+    def subscribeType(self, msgType: str) -> typeSignals:
+        with self._lock:
+            if msgType not in self._typeSubscribers:
+                self._typeSubscribers[msgType] = typeSignals()
+            return self._typeSubscribers[msgType]
+
+    def _flush(self, signals: promptSignals) -> None:
+        with self._lock:
+            pending = signals._pending or []
+            signals._pending = None
+        for msgType, data, receivedAt in pending:
+            self._route(signals, msgType, data, receivedAt)
+
+    def unsubscribe(self, promptId: str) -> None:
+        with self._lock:
+            self._subscribers.pop(promptId, None)
+            self._progress.pop(promptId, None)
+
+    @classmethod
+    def sniffType(cls, packet: str) -> str | None:
+        match = cls._typePattern.match(packet, 0, 128)
+        return match.group(1) if match is not None else None
+
+    def dispatchText(self, packet: str) -> None:
+        self.received += 1
+        msgType = self.sniffType(packet)
+        if (
+            msgType is not None
+            and msgType not in self.promptTypes
+            and msgType not in self._typeSubscribers
+        ):
+            self.skipped += 1
+            return
+        self.parsed += 1
+        self._dispatch(json.loads(packet))
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        if "type" not in message:
+            return
+        msgType = message["type"]
+        data = message.get("data", None)
+        receivedAt = time.monotonic()
+        typeSubscriber = self._typeSubscribers.get(msgType, None)
+        if typeSubscriber is not None:
+            typeSubscriber.message.emit(msgType, data)
+        if not isinstance(data, dict) or "prompt_id" not in data:
+            return
+        promptId = data["prompt_id"]
+        if msgType == "executing":
+            node = data.get("node", None)
+            self._executing = (promptId, node) if node is not None else None
+        with self._lock:
+            signals = self._subscribers.get(promptId, None)
+            if signals is None:
+                self._unrouted.setdefault(promptId, []).append(
+                    (msgType, data, receivedAt)
+                )
+                while len(self._unrouted) > self.maxUnrouted:
+                    self._unrouted.popitem(last=False)
+                return
+            if signals._pending is not None:
+                signals._pending.append((msgType, data, receivedAt))
+                return
+            if msgType == "progress":
+                if promptId in self._progress:
+                    self.coalesced += 1
+                self._progress[promptId] = data
+                return
+        self._route(signals, msgType, data, receivedAt)
+
+    def dispatchBinary(self, packet: memoryview) -> None:
+        # slices of the memoryview share the packet buffer, the image itself is
+        # only copied once it gets decoded
+        self.received += 1
+        eventType = int.from_bytes(packet[0:4], "big")
+        if eventType == PREVIEW_IMAGE:
+            if self._executing is None:
+                return
+            promptId, nodeId = self._executing
+            image = packet[8:]
+        elif eventType == PREVIEW_IMAGE_WITH_METADATA:
+            metadataLength = int.from_bytes(packet[4:8], "big")
+            try:
+                metadata = json.loads(bytes(packet[8 : 8 + metadataLength]))
+                promptId = metadata["prompt_id"]
+                nodeId = metadata["node_id"]
+            except (ValueError, KeyError, TypeError):
+                return
+            image = packet[8 + metadataLength :]
+        else:
+            self.skipped += 1
+            return
+        with self._lock:
+            signals = self._subscribers.get(promptId, None)
+        # previews are only useful live, they are never buffered
+        if signals is not None:
+            self.previews += 1
+            signals.preview.emit(nodeId, image)
+
+    def timeToProgress(self) -> float:
+        """Seconds until coalesced progress is due, inf if nothing is waiting."""
+        if len(self._progress) == 0:
+            return float("inf")
+        return max(0.0, self._nextProgress - time.monotonic())
+
+    def deliverProgress(self, promptId: str | None = None) -> None:
+        """Emits the latest progress of `promptId`, or of all prompts when due."""
+        with self._lock:
+            if promptId is not None:
+                data = self._progress.pop(promptId, None)
+                progress = {promptId: data} if data is not None else {}
+            else:
+                now = time.monotonic()
+                if now < self._nextProgress:
+                    return
+                self._nextProgress = now + 1.0 / self.progressRate
+                progress = self._progress
+                self._progress = {}
+            targets = [(self._subscribers.get(k, None), v) for k, v in progress.items()]
+        for signals, data in targets:
+            if signals is not None:
+                self.progressDelivered += 1
+                signals.progress.emit(
+                    data.get("value", 0), data.get("max", 0), data.get("node", None)
+                )
+
+    def _route(
+        self,
+        signals: promptSignals,
+        msgType: str,
+        data: Dict[str, Any],
+        receivedAt: float,
+    ) -> None:
+        if msgType == "progress":
+            self.progressDelivered += 1
+            signals.progress.emit(
+                data.get("value", 0), data.get("max", 0), data.get("node", None)
+            )
+            return
+        # progress must not arrive after the message that follows it
+        self.deliverProgress(signals.promptId)
+        signals.message.emit(msgType, data)
+        if msgType == "executing":
+            signals.executing.emit(data.get("node", None), receivedAt)
+            if data.get("node", None) is None:
+                self.unsubscribe(signals.promptId)
+                signals.finished.emit()
+        elif msgType in ("execution_error", "execution_interrupted"):
+            self.unsubscribe(signals.promptId)
+            signals.failed.emit(msgType, data)
+            signals.finished.emit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "parsed": self.parsed,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "progressDelivered": self.progressDelivered,
+            "previews": self.previews,
+        }
+
+
+class websocketSession(QCor.QThread):
+    """Owns the websocket for a client id and feeds it into a messageRouter."""
+
+    connectionChanged = QCor.Signal(bool)
+
+    recvTimeout = 0.5
+    reconnectDelay = (0.5, 10.0)
+
+    def __init__(self, serverAddress: str, clientId: str) -> None:
+        super().__init__()
+        self.serverAddress = serverAddress
+        self.clientId = clientId
+        self.router = messageRouter()
+        self.connected = False
+        self._running = True
+
+    def subscribe(self, promptId: str) -> promptSignals:
+        return self.router.subscribe(promptId)
+
+    def unsubscribe(self, promptId: str) -> None:
+        self.router.unsubscribe(promptId)
+
+    def stop(self) -> None:
+        self._running = False
+        self.wait()
+
+    def run(self) -> None:
+        delay = self.reconnectDelay[0]
+        while self._running:
+            try:
+                with client.connect(
+                    f"ws://{self.serverAddress}/ws?clientId={self.clientId}"
+                ) as webSocket:
+                    delay = self.reconnectDelay[0]
+                    self.connected = True
+                    self.connectionChanged.emit(True)
+                    while self._running:
+                        timeout = min(self.recvTimeout, self.router.timeToProgress())
+                        try:
+                            packet = webSocket.recv(timeout=timeout)
+                        except TimeoutError:
+                            packet = None
+                        if isinstance(packet, str):
+                            self.router.dispatchText(packet)
+                        elif packet is not None:
+                            self.router.dispatchBinary(memoryview(packet))
+                        self.router.deliverProgress()
+            except (OSError, websockets.exceptions.WebSocketException) as error:
+                print(f"websocket {self.serverAddress}: {error}")
+            self.connected = False
+            self.connectionChanged.emit(False)
+            end = time.monotonic() + delay
+            while self._running and time.monotonic() < end:
+                time.sleep(0.1)
+            delay = min(delay * 2, self.reconnectDelay[1])
@@ -1,2 +1,18 @@
-from .comfyPrompt import ComfyPromptManager, NodeAddress, NodeResult, PartialPrompt
+from .comfyPrompt import (
+    ComfyPromptManager,
+    InlinedGroup,
+    NodeAddress,
+    NodeResult,
+    PartialPrompt,
+)
 from .ComfyConnection import ComfyConnection
+from .compileProfile import CompileProfile, NodeProfile
+from .dispatcher import PromptDispatcher
+from .groupTemplate import GroupTemplate
+from .objectInfoCache import ObjectInfoCache, ObjectInfoRefreshWorker
+from .promptSnapshot import CompileResult, CompileWorker, NodeRecord, compileSnapshot
+from .promptTemplate import PromptTemplate, sweep
+from .promptValidator import PromptError, PromptValidator
+from .promptWriter import PromptWriter, threadWriter
+from .submissionQueue import PromptSubmissionQueue, Submission, SubmissionFeed
+from .uploadManager import UploadManager
@@ -1,49 +1,321 @@
 from __future__ import annotations
 
-from typing import Dict, List, Any, TYPE_CHECKING
+from contextlib import nullcontext
+from typing import (
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Any,
+    Mapping,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
 
 if TYPE_CHECKING:
-    from node import Node, NodeScene
+    from node import DependencyIndex, Node, NodeScene
+    from nodeSlots.nodeSlot import NodeSlot
+    from server.compileProfile import CompileProfile
 import json
+import time
+
+# output nodes that show a value of a type, and the input they read it from
+previewNodes: Dict[str, Tuple[str, str]] = {
+    "IMAGE": ("PreviewImage", "images"),
+    "MASK": ("MaskPreview", "mask"),
+}
+# shows values of any type, on servers that have it
+anyPreviewNode = ("PreviewAny", "source")
+# sorted keys, no whitespace and no escaping of non ASCII characters, the
+# form prompts are hashed in
+canonicalEncoder = json.JSONEncoder(
+    sort_keys=True, separators=(",", ":"), ensure_ascii=False
+)
 
 
 class ComfyPromptManager:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        dependencyIndex: DependencyIndex | None = None,
+        profile: CompileProfile | None = None,
+    ) -> None:
+        self.dependencyIndex = dependencyIndex
+        # times the compile when set, see CompileProfile
+        self.profile = profile
+        # when off every node is executed again, for profiling a cold compile
+        self.reuseCompiled = True
         self.idMap: Dict[Node, str] = {}
         self.outputMap: Dict[str, Dict[int, NodeAddress | NodeResult]] = {}
         self.partialPrompts: Dict[str, PartialPrompt] = {}
         self.executionStack: List[Node] = []
+        # built from partialPrompts on first use, PromptWriter writes the
+        # prompt without it
+        self._prompt: Dict[str, Any] | None = None
+        # nodes that failed to compile and why, their output node is left out
+        self.compileErrors: List[Tuple[Node, str]] = []
+        # nodes executed by this compile and nodes whose last prompt was reused
+        self.executedCount = 0
+        self.reusedCount = 0
+        # preview nodes added where a partial prompt was cut off, by the node
+        # whose outputs they show
+        self.previewMap: Dict[str, Node] = {}
+        # nodes left out by eliminateDuplicates, by the node computing the
+        # same thing
+        self.merged: Dict[str, str] = {}
+        # addresses of the output nodes in the prompt, these are never merged
+        self.outputAddresses: Set[str] = set()
+        # nodes inlined from group scenes, by the group node they were
+        # inlined for
+        self.groupMap: Dict[str, Node] = {}
+
+    @property
+    def prompt(self) -> Dict[str, Any]:
+        if self._prompt is None:
+            self._prompt = {
+                k: v.toPrompt() for k, v in self.partialPrompts.items() if not v.isEmpty
+            }
+        return self._prompt
+
+    @prompt.setter
+    def prompt(self, prompt: Dict[str, Any]) -> None:
+        self._prompt = prompt
+
+    def nodeMap(self) -> Dict[str, List[Node]]:
+        """Maps the node ids used in the prompt back to their nodes, more than
+        one where eliminateDuplicates merged nodes into it."""
+        addresses = {address: node for node, address in self.idMap.items()}
+        addresses.update(self.previewMap)
+        addresses.update(self.groupMap)
+        nodeMap: Dict[str, List[Node]] = {}
+        for address, node in addresses.items():
+            nodes = nodeMap.setdefault(self.merged.get(address, address), [])
+            if node not in nodes:
+                nodes.append(node)
+        return nodeMap
+
+    def dependencies(self, node: Node) -> List[Node]:
+        if self.dependencyIndex is None:
+            return node.dependencies()
+        return self.dependencyIndex.dependencies(node)
 
     def executeNode(self, node: Node) -> None:
         self.executionStack.append(node)
 
-    def execute(self, nodescenes: List[NodeScene]) -> Dict[str, Any]:
-        # find output nodes
+    def executeSlot(
+        self, slot: NodeSlot, reroute: bool = False
+    ) -> NodeAddress | NodeResult | None:
+        """slot.execute, timed for its node when profiling. `reroute` counts
+        it as resolving a reroute instead."""
+        if self.profile is None:
+            return slot.execute(self)
+        started = time.perf_counter()
+        try:
+            return slot.execute(self)
+        finally:
+            self.profile.addSlot(slot.node, time.perf_counter() - started, reroute)
+
+    def phase(self, name: str) -> ContextManager[Any]:
+        """Times what runs in it as `name` when profiling."""
+        if self.profile is None:
+            return nullcontext()
+        return self.profile.phase(name)
+
+    def execute(self, nodescenes: List[NodeScene]) -> None:
         outputNodes: List[Node] = []
-        for scene in nodescenes:
-            outputNodes.extend([s for s in scene.nodes if s.isOutput])
-
-        # try construct prompt for each output node
-        for outputNode in outputNodes:
-            try:
-                self.executeNode(outputNode)
-                while len(self.executionStack) > 0:
-                    node = self.executionStack.pop()
-                    result = node.execute(self)
-                    if result is not None:
-                        nodeAddress = node.getNodeAddress(self)
-                        self.idMap[node] = nodeAddress
-                        self.partialPrompts[nodeAddress] = result[0]
-                        self.outputMap[nodeAddress] = result[1]
-            except:
-                ...
-
-        # convert to json
-        prompt: Dict[str, Any] = {}
-        for k, v in self.partialPrompts.items():
-            if not v.isEmpty:
-                prompt[k] = v.toPrompt()
-        return prompt
+        with self.phase("collect"):
+            for scene in nodescenes:
+                outputNodes.extend([s for s in scene.nodes if s.isOutput])
+        self.executeNodes(outputNodes)
+
+    def executeNodes(self, nodes: List[Node]) -> None:
+        """Compiles `nodes` and everything they read from."""
+        # compiled nodes, failed ones map to False
+        done: Dict[Node, bool] = {}
+        with self.phase("traverse"):
+            for node in nodes:
+                if node not in done:
+                    self._compileFrom(node, done)
+        self._dropPrompt()
+
+    def executeUpTo(self, node: Node, nodeDefinitions: Mapping[str, Any]) -> None:
+        """Compiles only `node` and what it reads from, with preview nodes
+        reading its outputs unless it is an output node itself."""
+        done: Dict[Node, bool] = {}
+        with self.phase("traverse"):
+            self._compileFrom(node, done)
+        if done.get(node, False) and not node.isOutput:
+            address = self.idMap[node]
+            for slot in node.outputs:
+                types = slot.socket.socketType.types
+                preview = previewNodes.get(types[0], None) if len(types) == 1 else None
+                if preview is None or preview[0] not in nodeDefinitions:
+                    preview = anyPreviewNode
+                    if preview[0] not in nodeDefinitions:
+                        continue
+                previewAddress = f"{preview[0]}.{address}.{slot.ind}"
+                self.partialPrompts[previewAddress] = PartialPrompt(
+                    {preview[1]: self.outputMap[address][slot.ind]}, preview[0]
+                )
+                self.previewMap[previewAddress] = node
+                self.outputAddresses.add(previewAddress)
+            if len(self.previewMap) == 0:
+                self.compileErrors.append(
+                    (node, "none of its outputs can be previewed")
+                )
+        self._dropPrompt()
+
+    def _dropPrompt(self) -> None:
+        """Drops the prompt dict, partialPrompts changed."""
+        self._prompt = None
+
+    def eliminateDuplicates(self) -> int:
+        """Merges nodes of the same class with the same inputs into one and
+        links their readers to it instead, returns how many were left out.
+
+        Partial prompts are in compile order, so the inputs of a node are
+        already rewritten to the surviving nodes when it is compared. Output
+        nodes are never merged. Cached partial prompts are shared with the
+        nodes, rewritten ones are copies.
+        """
+        survivors: Dict[str, str] = {}
+        partialPrompts: Dict[str, PartialPrompt] = {}
+        for address, partial in self.partialPrompts.items():
+            if partial.isEmpty:
+                partialPrompts[address] = partial
+                continue
+            inputs: Dict[str, NodeAddress | NodeResult | None] = {}
+            rewritten = False
+            for name, value in partial.inputs.items():
+                if isinstance(value, NodeAddress) and value.nodeID in self.merged:
+                    value = NodeAddress(value.slotInd, self.merged[value.nodeID])
+                    rewritten = True
+                inputs[name] = value
+            if rewritten:
+                partial = PartialPrompt(inputs, partial.className)
+            if address not in self.outputAddresses:
+                key = json.dumps(
+                    [partial.className, partial.toPrompt()["inputs"]],
+                    sort_keys=True,
+                    default=repr,
+                )
+                survivor = survivors.setdefault(key, address)
+                if survivor != address:
+                    self.merged[address] = survivor
+                    continue
+            partialPrompts[address] = partial
+        self.partialPrompts = partialPrompts
+        self._dropPrompt()
+        return len(self.merged)
+
+    def _compileFrom(self, root: Node, done: Dict[Node, bool]) -> None:
+        """Compiles `root` and everything it depends on, each node once and
+        after all of its dependencies (iterative depth first search)."""
+        # nodes being compiled, with their dependencies still to visit
+        stack: List[Tuple[Node, Iterator[Node]]] = [
+            (root, iter(self.dependencies(root)))
+        ]
+        onStack = {root}
+        while len(stack) > 0:
+            node, dependencies = stack[-1]
+            dependency = next(dependencies, None)
+            if dependency is not None:
+                if dependency in done:
+                    continue
+                if dependency in onStack:
+                    path = [n for n, _ in stack]
+                    cycle = path[path.index(dependency) :] + [dependency]
+                    self.compileErrors.append(
+                        (
+                            dependency,
+                            "cycle " + " -> ".join(n.title for n in reversed(cycle)),
+                        )
+                    )
+                    continue
+                stack.append((dependency, iter(self.dependencies(dependency))))
+                onStack.add(dependency)
+                continue
+
+            requested = self._compileNode(node, done, onStack)
+            if len(requested) > 0:
+                # the node reads from nodes its dependencies didn't list,
+                # compile those first and try again
+                stack[-1] = (node, iter(requested))
+                continue
+            stack.pop()
+            onStack.discard(node)
+
+    def _compileNode(
+        self, node: Node, done: Dict[Node, bool], waiting: Set[Node]
+    ) -> List[Node]:
+        """Compiles `node`, returns the nodes it is waiting for instead if
+        there are any that can still be compiled before it."""
+        if node.compiled is not None and self.reuseCompiled:
+            self.reusedCount += 1
+            if self.profile is not None:
+                self.profile.addReused(node)
+            self._store(node, node.compiled)
+            done[node] = True
+            return []
+        self.executionStack.clear()
+        self.executedCount += 1
+        try:
+            result = self._execute(node)
+        except Exception as error:
+            self.compileErrors.append((node, str(error)))
+            done[node] = False
+            return []
+        if result is None:
+            requested = [
+                n for n in self.executionStack if n not in done and n not in waiting
+            ]
+            self.executionStack.clear()
+            if len(requested) > 0:
+                return requested
+            # something it reads from failed or is part of a cycle, the error
+            # is reported there
+            done[node] = False
+            return []
+        node.compiled = result
+        self._store(node, result)
+        done[node] = True
+        return []
+
+    def _execute(
+        self, node: Node
+    ) -> Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]] | None:
+        if self.profile is None:
+            return node.execute(self)
+        started = time.perf_counter()
+        try:
+            return node.execute(self)
+        finally:
+            self.profile.addExecute(node, time.perf_counter() - started)
+
+    def _store(
+        self,
+        node: Node,
+        result: Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]],
+    ) -> None:
+        self._add(node, node.getNodeAddress(self), result, node.isOutput)
+
+    def _add(
+        self,
+        node: Node,
+        address: str,
+        result: Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]],
+        isOutput: bool,
+    ) -> None:
+        self.idMap[node] = address
+        if isinstance(result[0], InlinedGroup):
+            self.partialPrompts.update(result[0].partialPrompts)
+            self.outputAddresses.update(result[0].outputAddresses)
+            for inlined in result[0].partialPrompts:
+                self.groupMap[inlined] = node
+        self.partialPrompts[address] = result[0]
+        self.outputMap[address] = result[1]
+        if isOutput:
+            self.outputAddresses.add(address)
 
 
 class NodeAddress:
@@ -70,6 +342,7 @@ class PartialPrompt:
         self.className: str = className
         self.inputs: Dict[str, NodeAddress | NodeResult | None] = inputs
         self.isEmpty: bool = self.className == ""
+        self._json: bytes | None = None
 
     @classmethod
     def empty(cls) -> "PartialPrompt":
@@ -82,3 +355,24 @@ class PartialPrompt:
                 k: v.toPrompt() for k, v in self.inputs.items() if v is not None
             },
         }
+
+    def toJSON(self) -> bytes:
+        """Canonical JSON of toPrompt, see PromptWriter. Partial prompts
+        don't change once compiled, so it's encoded once."""
+        if self._json is None:
+            self._json = canonicalEncoder.encode(self.toPrompt()).encode("utf-8")
+        return self._json
+
+
+class InlinedGroup(PartialPrompt):
+    """The nodes of a group scene, inlined for one group node.
+
+    It is empty itself, compiling it adds its partial prompts instead.
+    """
+
+    def __init__(
+        self, partialPrompts: Dict[str, PartialPrompt], outputAddresses: Set[str]
+    ) -> None:
+        super().__init__({}, "")
+        self.partialPrompts = partialPrompts
+        self.outputAddresses = outputAddresses
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, TYPE_CHECKING
+import json
+import time
+
+if TYPE_CHECKING:
+    from node import Node
+
+
+class NodeProfile:
+    """What compiling one node cost."""
+
+    def __init__(self, address: str, title: str, className: str) -> None:
+        self.address = address
+        self.title = title
+        self.className = className
+        # times execute ran, more than once when it read from nodes that
+        # weren't compiled yet
+        self.visits = 0
+        # times its compiled prompt was reused instead
+        self.reused = 0
+        # seconds in execute, slot and reroute time included
+        self.executeTime = 0.0
+        self.slotCalls = 0
+        self.slotTime = 0.0
+        self.rerouteCalls = 0
+        self.rerouteTime = 0.0
+
+
+class CompileProfile:
+    """Visit counts and times of a compile, per node and per phase.
+
+    ComfyPromptManager fills it in while compiling when it is given one,
+    without one nothing is timed.
+    """
+
+    columns = (
+        "Node",
+        "Class",
+        "Visits",
+        "Reused",
+        "Execute",
+        "Slots",
+        "Slot time",
+        "Reroutes",
+        "Reroute time",
+    )
+
+    def __init__(self) -> None:
+        self.nodes: Dict[Node, NodeProfile] = {}
+        # seconds per phase, in the order they ran
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def node(self, node: Node) -> NodeProfile:
+        profile = self.nodes.get(node, None)
+        if profile is None:
+            profile = NodeProfile(node.getNodeAddress(), node.title, node.nodeClass)
+            self.nodes[node] = profile
+        return profile
+
+    def addExecute(self, node: Node, seconds: float) -> None:
+        profile = self.node(node)
+        profile.visits += 1
+        profile.executeTime += seconds
+
+    def addReused(self, node: Node) -> None:
+        self.node(node).reused += 1
+
+    def addSlot(self, node: Node, seconds: float, reroute: bool = False) -> None:
+        profile = self.node(node)
+        if reroute:
+            profile.rerouteCalls += 1
+            profile.rerouteTime += seconds
+        else:
+            profile.slotCalls += 1
+            profile.slotTime += seconds
+
+    def rows(self) -> List[Tuple[Any, ...]]:
+        return [
+            (
+                p.title,
+                p.className,
+                p.visits,
+                p.reused,
+                p.executeTime,
+                p.slotCalls,
+                p.slotTime,
+                p.rerouteCalls,
+                p.rerouteTime,
+            )
+            for p in self.nodes.values()
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals of the whole compile, times in milliseconds."""
+        profiles = self.nodes.values()
+        return {
+            "phases": {k: round(v * 1000, 3) for k, v in self.phases.items()},
+            "nodes": len(self.nodes),
+            "visits": sum(p.visits for p in profiles),
+            "reused": sum(p.reused for p in profiles),
+            "execute": round(sum(p.executeTime for p in profiles) * 1000, 3),
+            "slots": sum(p.slotCalls for p in profiles),
+            "slotTime": round(sum(p.slotTime for p in profiles) * 1000, 3),
+            "reroutes": sum(p.rerouteCalls for p in profiles),
+            "rerouteTime": round(sum(p.rerouteTime for p in profiles) * 1000, 3),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """summary and every node by prompt address, slowest first."""
+        profiles = sorted(self.nodes.values(), key=lambda p: -p.executeTime)
+        report = self.summary()
+        report["perNode"] = {
+            p.address: {
+                "title": p.title,
+                "class": p.className,
+                "visits": p.visits,
+                "reused": p.reused,
+                "execute": round(p.executeTime * 1000, 3),
+                "slots": p.slotCalls,
+                "slotTime": round(p.slotTime * 1000, 3),
+                "reroutes": p.rerouteCalls,
+                "rerouteTime": round(p.rerouteTime * 1000, 3),
+            }
+            for p in profiles
+        }
+        return report
+
+    def toJSON(self) -> str:
+        return json.dumps(self.report(), indent=2)
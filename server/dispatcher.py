@@ -0,0 +1,193 @@
+from typing import Any, Dict, List, Mapping
+import hashlib
+import threading
+import time
+
+import PySide6.QtCore as QCor
+
+from server.ComfyConnection import ComfyConnection
+from server.comfyPrompt import NodeResult, PartialPrompt
+
+
+class Backend:
+    """Load bookkeeping for a single ComfyUI server."""
+
+    def __init__(self, connection: ComfyConnection) -> None:
+        self.connection = connection
+        self.queueDepth = 0
+        # prompts routed here that the server didn't answer yet
+        self.inFlight = 0
+        # prompts the server queued since the last poll was sent, not yet
+        # part of queueDepth
+        self.acknowledged = 0
+        self.healthy = True
+        self.lastPoll: float | None = None
+
+    @property
+    def serverAddress(self) -> str:
+        return self.connection.serverAddress
+
+    @property
+    def load(self) -> int:
+        return self.queueDepth + self.inFlight + self.acknowledged
+
+
+class QueuePollSignals(QCor.QObject):
+    done = QCor.Signal()
+
+
+class QueuePollWorker(QCor.QRunnable):
+    def __init__(self, dispatcher: "PromptDispatcher") -> None:
+        super().__init__()
+        self.dispatcher = dispatcher
+        self.signals = QueuePollSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        self.dispatcher.pollQueues()
+        self.signals.done.emit()
+
+
+class PromptDispatcher(QCor.QObject):
+    """Routes prompts to the least loaded of several servers.
+
+    Prompts loading the same models stick to the server that ran them last, as
+    long as that server isn't more than `stickySlack` prompts behind the least
+    loaded one, so models don't get loaded on every GPU.
+    """
+
+    modelInputs = (
+        "ckpt_name",
+        "lora_name",
+        "vae_name",
+        "unet_name",
+        "clip_name",
+        "clip_name1",
+        "clip_name2",
+        "control_net_name",
+        "style_model_name",
+        "model_name",
+    )
+
+    def __init__(
+        self,
+        connections: List[ComfyConnection],
+        stickySlack: int = 2,
+        pollInterval: int = 1000,
+    ) -> None:
+        super().__init__()
+        if len(connections) == 0:
+            raise ValueError("dispatcher needs at least one connection")
+        self.backends = [Backend(c) for c in connections]
+        self.stickySlack = stickySlack
+        self._lock = threading.Lock()
+        self._sticky: Dict[str, Backend] = {}
+        self._polling = False
+        self._timer = QCor.QTimer(self)
+        self._timer.setInterval(pollInterval)
+        self._timer.timeout.connect(self._startPoll)
+        if len(self.backends) > 1:
+            self._timer.start()
+
+    @property
+    def primary(self) -> ComfyConnection:
+        return self.backends[0].connection
+
+    def _startPoll(self) -> None:
+        if self._polling:
+            return
+        self._polling = True
+        worker = QueuePollWorker(self)
+        worker.signals.done.connect(self._pollDone)
+        QCor.QThreadPool.globalInstance().start(worker)
+
+    def _pollDone(self) -> None:
+        self._polling = False
+
+    def pollQueues(self) -> None:
+        for backend in self.backends:
+            with self._lock:
+                # these are queued on the server before it answers the poll
+                acknowledged = backend.acknowledged
+            try:
+                queue = backend.connection.getQueue()
+            except (OSError, ValueError) as error:
+                with self._lock:
+                    backend.healthy = False
+                print(f"queue poll {backend.serverAddress}: {error}")
+                continue
+            depth = len(queue.get("queue_running", [])) + len(
+                queue.get("queue_pending", [])
+            )
+            with self._lock:
+                backend.queueDepth = depth
+                backend.acknowledged -= acknowledged
+                backend.healthy = True
+                backend.lastPoll = time.monotonic()
+
+    @classmethod
+    def modelKey(cls, prompt: Mapping[str, Any]) -> str | None:
+        models = set()
+        for node in prompt.values():
+            if isinstance(node, PartialPrompt):
+                inputs = {
+                    name: value.value
+                    for name, value in node.inputs.items()
+                    if isinstance(value, NodeResult)
+                }
+            else:
+                inputs = node.get("inputs", {})
+            for name, value in inputs.items():
+                if name in cls.modelInputs and isinstance(value, str):
+                    models.add(value)
+        if len(models) == 0:
+            return None
+        return hashlib.sha1("\n".join(sorted(models)).encode()).hexdigest()
+
+    def route(self, prompt: Mapping[str, Any]) -> ComfyConnection:
+        """Picks the server for `prompt`, safe to call from any thread."""
+        key = self.modelKey(prompt)
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy]
+            if len(candidates) == 0:
+                candidates = self.backends
+            target = min(candidates, key=lambda b: b.load)
+            sticky = self._sticky.get(key, None) if key is not None else None
+            if (
+                sticky is not None
+                and sticky in candidates
+                and sticky.load <= target.load + self.stickySlack
+            ):
+                target = sticky
+            if key is not None:
+                self._sticky[key] = target
+            target.inFlight += 1
+        return target.connection
+
+    def acknowledge(self, connection: ComfyConnection, queued: bool) -> None:
+        """The POST of a prompt routed to `connection` was answered, `queued`
+        tells whether the server took the prompt."""
+        with self._lock:
+            for backend in self.backends:
+                if backend.connection is connection:
+                    backend.inFlight -= 1
+                    if queued:
+                        backend.acknowledged += 1
+                    return
+
+    def loads(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                b.serverAddress: {
+                    "queueDepth": b.queueDepth,
+                    "inFlight": b.inFlight,
+                    "acknowledged": b.acknowledged,
+                    "healthy": b.healthy,
+                }
+                for b in self.backends
+            }
+
+    def close(self) -> None:
+        self._timer.stop()
+        for backend in self.backends:
+            backend.connection.close()
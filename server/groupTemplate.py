@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Set, Tuple
+
+from server.comfyPrompt import (
+    ComfyPromptManager,
+    InlinedGroup,
+    NodeAddress,
+    NodeResult,
+    PartialPrompt,
+)
+
+
+class GroupTemplate:
+    """A group scene compiled once and inlined for every group node using it.
+
+    Links to the outputs of the group's input node are patch points, filled
+    in with what the inputs of a group node compile to. Every other node is
+    copied under the address of the group node, as "<group node>:<node>".
+    """
+
+    def __init__(
+        self,
+        partialPrompts: Dict[str, PartialPrompt],
+        inputAddress: str,
+        outputs: Dict[int, NodeAddress | NodeResult],
+        outputAddresses: Set[str],
+        errors: List[str],
+    ) -> None:
+        self.partialPrompts = partialPrompts
+        self.inputAddress = inputAddress
+        self.outputs = outputs
+        self.outputAddresses = outputAddresses
+        # why nodes of the group failed to compile
+        self.errors = errors
+        # group inputs something in the group reads
+        self.usedInputs: Set[int] = {
+            value.slotInd
+            for value in self._links()
+            if isinstance(value, NodeAddress) and value.nodeID == inputAddress
+        }
+
+    @classmethod
+    def fromCompile(
+        cls, promptManager: ComfyPromptManager, inputAddress: str, outputAddress: str
+    ) -> "GroupTemplate":
+        """`inputAddress` and `outputAddress` are the nodes whose outputs are
+        the group's inputs and whose inputs are the group's outputs."""
+        return cls(
+            {
+                address: partial
+                for address, partial in promptManager.partialPrompts.items()
+                if not partial.isEmpty
+            },
+            inputAddress,
+            dict(promptManager.outputMap.get(outputAddress, {})),
+            set(promptManager.outputAddresses),
+            [f"{node.title}: {error}" for node, error in promptManager.compileErrors],
+        )
+
+    def _links(self) -> List[NodeAddress | NodeResult | None]:
+        values: List[NodeAddress | NodeResult | None] = list(self.outputs.values())
+        for partial in self.partialPrompts.values():
+            values.extend(partial.inputs.values())
+        return values
+
+    def inline(
+        self, namespace: str, inputs: Mapping[int, NodeAddress | NodeResult]
+    ) -> Tuple[InlinedGroup, Dict[int, NodeAddress | NodeResult]]:
+        """The nodes of the group under `namespace` reading `inputs`, and what
+        the outputs of the group compile to."""
+
+        def patch(value: NodeAddress | NodeResult | None) -> Any:
+            if not isinstance(value, NodeAddress):
+                return value
+            if value.nodeID == self.inputAddress:
+                return inputs[value.slotInd]
+            return NodeAddress(value.slotInd, f"{namespace}:{value.nodeID}")
+
+        partialPrompts = {
+            f"{namespace}:{address}": PartialPrompt(
+                {name: patch(value) for name, value in partial.inputs.items()},
+                partial.className,
+            )
+            for address, partial in self.partialPrompts.items()
+        }
+        outputAddresses = {
+            f"{namespace}:{address}"
+            for address in self.outputAddresses
+            if address in self.partialPrompts
+        }
+        outputs = {ind: patch(value) for ind, value in self.outputs.items()}
+        return InlinedGroup(partialPrompts, outputAddresses), outputs
@@ -0,0 +1,100 @@
+from typing import Dict, Any
+import hashlib
+import json
+import os
+import re
+
+import PySide6.QtCore as QCor
+
+from server.ComfyConnection import ComfyConnection
+
+
+class ObjectInfoCache:
+    """Stores the raw /object_info payload of each server on disk."""
+
+    indexName = "object_info.json"
+
+    def __init__(self, folder: str, serverAddress: str) -> None:
+        self.folder = folder
+        self.serverAddress = serverAddress
+        os.makedirs(self.folder, exist_ok=True)
+        self._indexPath = os.path.join(self.folder, self.indexName)
+        self._index: Dict[str, Dict[str, str]] = self._loadIndex()
+
+    @staticmethod
+    def hashData(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @property
+    def contentHash(self) -> str | None:
+        """Hash of the cached payload of this server."""
+        entry = self._index.get(self.serverAddress, None)
+        return entry["hash"] if entry is not None else None
+
+    def _loadIndex(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.isfile(self._indexPath):
+            return {}
+        try:
+            with open(self._indexPath, "r", encoding="utf-8") as f:
+                index: Dict[str, Dict[str, str]] = json.load(f)
+            return index
+        except (OSError, ValueError):
+            return {}
+
+    def _entryPath(self) -> str:
+        name = re.sub(r"[^\w.-]", "_", self.serverAddress)
+        return os.path.join(self.folder, f"object_info_{name}.json")
+
+    def load(self) -> bytes | None:
+        entry = self._index.get(self.serverAddress, None)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.folder, entry["file"]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, data: bytes) -> bool:
+        """Writes `data` to the cache, returns False if it matched the cached hash."""
+        contentHash = self.hashData(data)
+        if contentHash == self.contentHash:
+            return False
+        path = self._entryPath()
+        self._writeAtomic(path, data)
+        self._index[self.serverAddress] = {
+            "file": os.path.basename(path),
+            "hash": contentHash,
+        }
+        self._writeAtomic(self._indexPath, json.dumps(self._index, indent=2).encode())
+        return True
+
+    @staticmethod
+    def _writeAtomic(path: str, data: bytes) -> None:
+        tmpPath = f"{path}.tmp"
+        with open(tmpPath, "wb") as f:
+            f.write(data)
+        os.replace(tmpPath, path)
+
+
+class ObjectInfoRefreshSignals(QCor.QObject):
+    fetched = QCor.Signal(bytes)
+    failed = QCor.Signal(str)
+
+
+class ObjectInfoRefreshWorker(QCor.QRunnable):
+    """Fetches /object_info off the UI thread."""
+
+    def __init__(self, connection: ComfyConnection) -> None:
+        super().__init__()
+        self.connection = connection
+        self.signals = ObjectInfoRefreshSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        try:
+            data = self.connection.getNodeDefs()
+        except OSError as error:
+            self.signals.failed.emit(str(error))
+        else:
+            self.signals.fetched.emit(data)
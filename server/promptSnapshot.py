@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, NamedTuple, Tuple, TYPE_CHECKING
+import time
+
+import PySide6.QtCore as QCor
+
+from server.comfyPrompt import (
+    ComfyPromptManager,
+    InlinedGroup,
+    NodeAddress,
+    NodeResult,
+    PartialPrompt,
+)
+from server.promptValidator import PromptError, PromptValidator
+from server.submissionQueue import promptHash
+
+if TYPE_CHECKING:
+    from node import Node
+
+
+class NodeRecord(NamedTuple):
+    """Everything compiling a node reads from it, copied on the UI thread.
+
+    `node` only maps results back, it is never read from while compiling.
+    """
+
+    node: Node
+    address: str
+    title: str
+    className: str
+    isOutput: bool
+    clientOnly: bool
+    # name, what it compiled to and whether it's optional
+    inputs: Tuple[Tuple[str, NodeAddress | NodeResult | None, bool], ...]
+    outputs: Tuple[Tuple[int, NodeAddress | NodeResult | None], ...]
+    # addresses of the records it reads from
+    dependencies: Tuple[str, ...]
+    # why the node can't be compiled
+    error: str | None
+    # the group scene inlined for a group node
+    group: InlinedGroup | None = None
+
+
+GraphSnapshot = Tuple[NodeRecord, ...]
+
+
+def compileSnapshot(snapshot: GraphSnapshot) -> ComfyPromptManager:
+    """Compiles a snapshot like ComfyPromptManager.execute compiles the live
+    graph, without touching any node."""
+    promptManager = ComfyPromptManager()
+    records = {record.address: record for record in snapshot}
+    done: Dict[str, bool] = {}
+    for record in snapshot:
+        if record.isOutput and record.address not in done:
+            _compileFrom(promptManager, records, record, done)
+    promptManager._dropPrompt()
+    return promptManager
+
+
+def _compileFrom(
+    promptManager: ComfyPromptManager,
+    records: Dict[str, NodeRecord],
+    root: NodeRecord,
+    done: Dict[str, bool],
+) -> None:
+    stack: List[Tuple[NodeRecord, Iterator[str]]] = [(root, iter(root.dependencies))]
+    onStack = {root.address}
+    while len(stack) > 0:
+        record, dependencies = stack[-1]
+        address = next(dependencies, None)
+        if address is not None:
+            if address in done or address not in records:
+                continue
+            if address in onStack:
+                path = [r for r, _ in stack]
+                start = [r.address for r in path].index(address)
+                cycle = path[start:] + [records[address]]
+                promptManager.compileErrors.append(
+                    (
+                        records[address].node,
+                        "cycle " + " -> ".join(r.title for r in reversed(cycle)),
+                    )
+                )
+                continue
+            stack.append((records[address], iter(records[address].dependencies)))
+            onStack.add(address)
+            continue
+        done[record.address] = _compileRecord(promptManager, record, done)
+        stack.pop()
+        onStack.discard(record.address)
+
+
+def _compileRecord(
+    promptManager: ComfyPromptManager, record: NodeRecord, done: Dict[str, bool]
+) -> bool:
+    if record.error is not None:
+        promptManager.compileErrors.append((record.node, record.error))
+        return False
+    # something it reads from failed or is part of a cycle, the error is
+    # reported there
+    if not all(done.get(address, False) for address in record.dependencies):
+        return False
+    inputs: Dict[str, NodeAddress | NodeResult | None] = {}
+    for name, value, optional in record.inputs:
+        if value is None and not optional:
+            return False
+        inputs[name] = value
+    outputs: Dict[int, NodeAddress | NodeResult] = {}
+    for ind, output in record.outputs:
+        if output is None:
+            return False
+        outputs[ind] = output
+    promptManager.executedCount += 1
+    partial: PartialPrompt
+    if record.group is not None:
+        partial = record.group
+    elif record.clientOnly:
+        partial = PartialPrompt.empty()
+    else:
+        partial = PartialPrompt(inputs, record.className)
+    promptManager._add(record.node, record.address, (partial, outputs), record.isOutput)
+    return True
+
+
+class CompileResult:
+    def __init__(
+        self,
+        promptManager: ComfyPromptManager,
+        errors: List[PromptError],
+        validationTime: float,
+        promptHash: str,
+        eliminated: int,
+        elapsed: float,
+    ) -> None:
+        self.promptManager = promptManager
+        self.errors = errors
+        self.validationTime = validationTime
+        self.promptHash = promptHash
+        self.eliminated = eliminated
+        self.elapsed = elapsed
+
+
+class CompileSignals(QCor.QObject):
+    done = QCor.Signal(object)
+
+
+class CompileWorker(QCor.QRunnable):
+    """Compiles, optimizes, validates and hashes a snapshot."""
+
+    def __init__(
+        self,
+        snapshot: GraphSnapshot,
+        validator: PromptValidator,
+        eliminateDuplicates: bool = True,
+    ) -> None:
+        super().__init__()
+        self.snapshot = snapshot
+        self.validator = validator
+        self.eliminateDuplicates = eliminateDuplicates
+        self.signals = CompileSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        started = time.perf_counter()
+        promptManager = compileSnapshot(self.snapshot)
+        eliminated = 0
+        if self.eliminateDuplicates:
+            eliminated = promptManager.eliminateDuplicates()
+        errors = self.validator.validate(promptManager)
+        key = promptHash(promptManager.partialPrompts) if len(errors) == 0 else ""
+        self.signals.done.emit(
+            CompileResult(
+                promptManager,
+                errors,
+                self.validator.elapsed,
+                key,
+                eliminated,
+                time.perf_counter() - started,
+            )
+        )
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple, TYPE_CHECKING
+import copy
+import itertools
+
+from server.comfyPrompt import ComfyPromptManager, NodeResult
+
+if TYPE_CHECKING:
+    from nodeSlots.nodeSlot import NodeSlot
+
+
+def sweep(**axes: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """Every combination of the values of `axes`, the last one varies
+    fastest: sweep(seed=range(3), cfg=[7, 8]) gives 6 variations."""
+    names = list(axes)
+    for values in itertools.product(*axes.values()):
+        yield dict(zip(names, values))
+
+
+class PromptTemplate:
+    """A compiled prompt with named patch points, inputs that are replaced
+    when a prompt is stamped out of it.
+
+    Stamping copies only the patched nodes, every other node of a stamped
+    prompt is shared with the template and with the other stamped prompts,
+    so they must not be modified in place.
+    """
+
+    def __init__(
+        self, prompt: Dict[str, Any], patchPoints: Mapping[str, Tuple[str, str]]
+    ) -> None:
+        self.prompt = prompt
+        # patch name -> node address and input name
+        self.patchPoints: Dict[str, Tuple[str, str]] = dict(patchPoints)
+        for name, (address, inputName) in self.patchPoints.items():
+            if address not in prompt:
+                raise ValueError(f"patch point {name}: no node {address}")
+            if inputName not in prompt[address]["inputs"]:
+                raise ValueError(f"patch point {name}: {address} has no {inputName}")
+        # patched nodes with their patch points, each node is copied once
+        self._nodes: Dict[str, List[Tuple[str, str]]] = {}
+        for name, (address, inputName) in self.patchPoints.items():
+            self._nodes.setdefault(address, []).append((inputName, name))
+
+    @classmethod
+    def fromCompile(
+        cls, promptManager: ComfyPromptManager, slots: Mapping[str, NodeSlot]
+    ) -> PromptTemplate:
+        """Template of a compiled prompt, patching the inputs of `slots`.
+
+        Only inputs that compiled to a value can be patched, not ones that
+        read from another node.
+        """
+        patchPoints: Dict[str, Tuple[str, str]] = {}
+        for name, slot in slots.items():
+            address = promptManager.idMap.get(slot.node, None)
+            if address is None or promptManager.partialPrompts[address].isEmpty:
+                raise ValueError(f"patch point {name}: {slot.node.title} isn't sent")
+            result = promptManager.partialPrompts[address].inputs.get(slot.name, None)
+            if not isinstance(result, NodeResult):
+                raise ValueError(f"patch point {name}: {slot.name} is connected")
+            patchPoints[name] = (address, slot.name)
+        # the template outlives the compile, values are never shared with it
+        return cls(copy.deepcopy(promptManager.prompt), patchPoints)
+
+    def stamp(self, values: Mapping[str, Any]) -> Dict[str, Any]:
+        """A prompt with the patch points in `values` replaced, the others
+        keep their compiled value."""
+        for name in values:
+            if name not in self.patchPoints:
+                raise KeyError(f"unknown patch point {name}")
+        prompt = dict(self.prompt)
+        for address, inputs in self._nodes.items():
+            node = prompt[address]
+            patched = dict(node["inputs"])
+            for inputName, name in inputs:
+                if name in values:
+                    patched[inputName] = values[name]
+            prompt[address] = {"class_type": node["class_type"], "inputs": patched}
+        return prompt
+
+    def generate(
+        self, variations: Iterable[Mapping[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Stamps a prompt per variation as they are consumed, for
+        PromptSubmissionQueue.submitAll."""
+        for values in variations:
+            yield self.stamp(values)
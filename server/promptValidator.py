@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, TYPE_CHECKING
+import time
+
+from server.comfyPrompt import ComfyPromptManager, NodeAddress, NodeResult
+
+if TYPE_CHECKING:
+    from node import Node
+
+
+class PromptError:
+    """Something in a compiled prompt the server is going to reject."""
+
+    def __init__(
+        self,
+        message: str,
+        node: Node | None = None,
+        nodeId: str | None = None,
+        inputName: str | None = None,
+    ) -> None:
+        self.message = message
+        self.node = node
+        self.nodeId = nodeId
+        self.inputName = inputName
+
+    def __str__(self) -> str:
+        where = self.node.title if self.node is not None else self.nodeId
+        if where is None:
+            return self.message
+        if self.inputName is not None:
+            return f"{where}.{self.inputName}: {self.message}"
+        return f"{where}: {self.message}"
+
+
+class PromptValidator:
+    """Checks compiled prompts against the server's node definitions.
+
+    Only reports what the server's own validation would reject for certain,
+    every error is collected instead of stopping at the first one.
+    """
+
+    def __init__(self, nodeDefinitions: Mapping[str, Any]) -> None:
+        self.nodeDefinitions = nodeDefinitions
+        self.elapsed = 0.0
+
+    def validate(self, promptManager: ComfyPromptManager) -> List[PromptError]:
+        start = time.perf_counter()
+        nodeMap = promptManager.nodeMap()
+        errors = [
+            PromptError(f"could not compile: {message}", node)
+            for node, message in promptManager.compileErrors
+        ]
+        # without definitions, e.g. when the server was never reached, there is
+        # nothing to check against
+        if len(self.nodeDefinitions) > 0:
+            hasOutput = False
+            for nodeId, partial in promptManager.partialPrompts.items():
+                if partial.isEmpty:
+                    continue
+                nodeDef = self.nodeDefinitions.get(partial.className, None)
+                if nodeDef is not None:
+                    hasOutput = hasOutput or bool(nodeDef.get("output_node", False))
+                # reported on every node merged into this one
+                nodes: List[Node | None] = list(nodeMap.get(nodeId, []))
+                if len(nodes) == 0:
+                    nodes.append(None)
+                for node in nodes:
+                    if nodeDef is None:
+                        errors.append(
+                            PromptError(
+                                f"unknown node class {partial.className}", node, nodeId
+                            )
+                        )
+                        continue
+                    errors.extend(
+                        self._validateInputs(promptManager, nodeId, node, nodeDef)
+                    )
+            if not hasOutput and len(promptManager.compileErrors) == 0:
+                errors.append(PromptError("prompt has no output nodes"))
+        self.elapsed = time.perf_counter() - start
+        return errors
+
+    def _validateInputs(
+        self,
+        promptManager: ComfyPromptManager,
+        nodeId: str,
+        node: Node | None,
+        nodeDef: Dict[str, Any],
+    ) -> List[PromptError]:
+        errors: List[PromptError] = []
+        inputs = promptManager.partialPrompts[nodeId].inputs
+        specs = nodeDef.get("input", {})
+        required = specs.get("required", None) or {}
+        optional = specs.get("optional", None) or {}
+        for name, spec in list(required.items()) + list(optional.items()):
+            value = inputs.get(name, None)
+            if value is None:
+                if name in required:
+                    errors.append(
+                        PromptError("required input is missing", node, nodeId, name)
+                    )
+                continue
+            if isinstance(value, NodeAddress):
+                message = self._checkLink(promptManager, value, spec)
+            else:
+                message = self._checkValue(value, spec)
+            if message is not None:
+                errors.append(PromptError(message, node, nodeId, name))
+        return errors
+
+    def _checkLink(
+        self, promptManager: ComfyPromptManager, address: NodeAddress, spec: Any
+    ) -> str | None:
+        target = promptManager.partialPrompts.get(address.nodeID, None)
+        if target is None or target.isEmpty:
+            return f"linked node {address.nodeID} is not part of the prompt"
+        targetDef = self.nodeDefinitions.get(target.className, None)
+        if targetDef is None:
+            # reported on the linked node itself
+            return None
+        outputs = targetDef.get("output", [])
+        if address.slotInd >= len(outputs):
+            return f"{target.className} has no output {address.slotInd}"
+        expected = spec[0]
+        if not isinstance(expected, str):
+            # combo inputs take whatever primitive feeds them
+            return None
+        received = outputs[address.slotInd]
+        if not isinstance(received, str) or "*" in (received, expected):
+            return None
+        if set(received.split(",")).isdisjoint(expected.split(",")):
+            return f"expects {expected}, got {received}"
+        return None
+
+    def _checkValue(self, result: NodeResult, spec: Any) -> str | None:
+        value = result.value
+        kind = spec[0]
+        options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+        if isinstance(kind, list):
+            if value not in kind:
+                return f"{value!r} is not one of the server's options"
+            return None
+        if kind in ("INT", "FLOAT"):
+            # the server converts before checking the range, so do the same
+            try:
+                number = int(value) if kind == "INT" else float(value)
+            except (TypeError, ValueError):
+                return f"expects a number, got {value!r}"
+            if "min" in options and number < options["min"]:
+                return f"{value} is below the minimum of {options['min']}"
+            if "max" in options and number > options["max"]:
+                return f"{value} is above the maximum of {options['max']}"
+        return None
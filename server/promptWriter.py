@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Any, Mapping
+import hashlib
+import threading
+
+from server.comfyPrompt import PartialPrompt, canonicalEncoder
+
+
+class PromptWriter:
+    """Writes prompts as canonical JSON into a buffer kept between prompts.
+
+    Nodes are written in key order straight from their partial prompts, which
+    encode themselves once, so no dict of the whole prompt is built and a node
+    that didn't change since the last compile is only copied. Nodes can also
+    be dicts, like the prompts a PromptTemplate stamps.
+
+    The canonical form is the one promptHash hashes, so the hash is taken
+    from the buffer instead of serializing the prompt again.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._length = 0
+        # the prompt in the last thing written
+        self._promptStart = 0
+        self._promptEnd = 0
+
+    def write(self, prompt: Mapping[str, Any]) -> memoryview:
+        """`prompt` as JSON, valid until the next write. Release the view
+        before writing again, a buffer that is still viewed can't grow."""
+        self._length = 0
+        self._writePrompt(prompt)
+        return memoryview(self._buffer)[: self._length]
+
+    def writeBody(
+        self, prompt: Mapping[str, Any], clientId: str, front: bool = False
+    ) -> memoryview:
+        """The body of a /prompt request queueing `prompt`, see write."""
+        self._length = 0
+        self._put(b'{"client_id":')
+        self._put(canonicalEncoder.encode(clientId).encode("utf-8"))
+        if front:
+            self._put(b',"front":true')
+        self._put(b',"prompt":')
+        self._writePrompt(prompt)
+        self._put(b"}")
+        return memoryview(self._buffer)[: self._length]
+
+    def promptHash(self) -> str:
+        """promptHash of the prompt written last."""
+        with memoryview(self._buffer) as view:
+            return hashlib.sha256(view[self._promptStart : self._promptEnd]).hexdigest()
+
+    def _writePrompt(self, prompt: Mapping[str, Any]) -> None:
+        self._promptStart = self._length
+        separator = b"{"
+        for address in sorted(prompt):
+            node = prompt[address]
+            if isinstance(node, PartialPrompt):
+                if node.isEmpty:
+                    continue
+                data = node.toJSON()
+            else:
+                data = canonicalEncoder.encode(node).encode("utf-8")
+            self._put(separator)
+            self._put(canonicalEncoder.encode(address).encode("utf-8"))
+            self._put(b":")
+            self._put(data)
+            separator = b","
+        if separator == b"{":
+            self._put(separator)
+        self._put(b"}")
+        self._promptEnd = self._length
+
+    def _put(self, data: bytes) -> None:
+        end = self._length + len(data)
+        # overwrites what the last prompt left there, grows only past it
+        self._buffer[self._length : end] = data
+        self._length = end
+
+
+_local = threading.local()
+
+
+def threadWriter() -> PromptWriter:
+    """The PromptWriter of the calling thread, every prompt the thread writes
+    reuses its buffer."""
+    writer: PromptWriter | None = getattr(_local, "writer", None)
+    if writer is None:
+        writer = PromptWriter()
+        _local.writer = writer
+    return writer
@@ -0,0 +1,446 @@
+from collections import OrderedDict, deque
+from functools import partial
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, Set
+import json
+import threading
+import time
+
+import PySide6.QtCore as QCor
+
+from server.ComfyConnection import ComfyConnection, ComfyHTTPError, promptSignals
+from server.dispatcher import PromptDispatcher
+from server.promptWriter import threadWriter
+
+
+def promptHash(prompt: Mapping[str, Any]) -> str:
+    """Hash of the canonical JSON form of a compiled prompt, a dict or the
+    partial prompts it's made of."""
+    writer = threadWriter()
+    writer.write(prompt).release()
+    return writer.promptHash()
+
+
+class Submission:
+    """A compiled prompt on its way to the server."""
+
+    def __init__(
+        self,
+        ticket: int,
+        prompt: Mapping[str, Any],
+        promptHash: str = "",
+        front: bool = False,
+    ) -> None:
+        self.ticket = ticket
+        self.prompt = prompt
+        self.promptHash = promptHash
+        self.front = front
+        self.connection: ComfyConnection | None = None
+        self.promptId: str | None = None
+        self.number: int | None = None
+        self.error: str | None = None
+        self.nodeErrors: Dict[str, Any] = {}
+        self.signals: promptSignals | None = None
+        self.queuedAt = time.perf_counter()
+        self.startedAt: float | None = None
+        self.finishedAt: float | None = None
+        # the server finished executing it without errors
+        self.completed = False
+        # taken off the queue before the server got to it
+        self.cancelled = False
+        self.cancelRequested = False
+
+    @property
+    def accepted(self) -> bool:
+        return self.promptId is not None
+
+    @property
+    def latency(self) -> float | None:
+        """Time from calling submit until the server answered."""
+        if self.finishedAt is None:
+            return None
+        return self.finishedAt - self.queuedAt
+
+
+class SubmissionSignals(QCor.QObject):
+    done = QCor.Signal(object)
+
+
+class SubmissionWorker(QCor.QRunnable):
+    def __init__(
+        self,
+        submission: Submission,
+        dispatcher: PromptDispatcher,
+        submissionQueue: "PromptSubmissionQueue",
+    ) -> None:
+        super().__init__()
+        self.submission = submission
+        self.dispatcher = dispatcher
+        self.submissionQueue = submissionQueue
+        self.signals = SubmissionSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        submission = self.submission
+        self.submissionQueue._started(submission)
+        if submission.cancelRequested:
+            submission.cancelled = True
+            submission.error = "cancelled"
+            submission.finishedAt = time.perf_counter()
+            self.signals.done.emit(submission)
+            return
+        connection = self.dispatcher.route(submission.prompt)
+        submission.connection = connection
+        try:
+            response = connection.postPrompt(submission.prompt, submission.front)
+            submission.promptId = response["prompt_id"]
+            submission.number = response.get("number", None)
+        except ComfyHTTPError as error:
+            submission.error = str(error)
+            try:
+                body = json.loads(error.body)
+                submission.error = body["error"]["message"]
+                submission.nodeErrors = body.get("node_errors", {})
+            except (ValueError, KeyError, TypeError):
+                pass
+        except (OSError, ValueError, KeyError) as error:
+            submission.error = str(error)
+        self.dispatcher.acknowledge(connection, submission.accepted)
+        submission.finishedAt = time.perf_counter()
+        self.signals.done.emit(submission)
+
+
+class CancelSignals(QCor.QObject):
+    done = QCor.Signal(str, bool)
+
+
+class CancelWorker(QCor.QRunnable):
+    """Deletes a pending prompt and checks it didn't start in the meantime."""
+
+    def __init__(self, connection: ComfyConnection, promptId: str) -> None:
+        super().__init__()
+        self.connection = connection
+        self.promptId = promptId
+        self.signals = CancelSignals()
+
+    @staticmethod
+    def _ids(items: List[Any]) -> List[str]:
+        return [item[1] for item in items if len(item) > 1]
+
+    @QCor.Slot()
+    def run(self) -> None:
+        removed = False
+        try:
+            queue = self.connection.getQueue()
+            if self.promptId in self._ids(queue.get("queue_pending", [])):
+                self.connection.deleteQueued([self.promptId])
+                queue = self.connection.getQueue()
+                removed = self.promptId not in self._ids(
+                    queue.get("queue_pending", []) + queue.get("queue_running", [])
+                )
+        except (OSError, ValueError) as error:
+            print(f"could not cancel {self.promptId}: {error}")
+        self.signals.done.emit(self.promptId, removed)
+
+
+class InterruptWorker(QCor.QRunnable):
+    def __init__(self, connection: ComfyConnection) -> None:
+        super().__init__()
+        self.connection = connection
+
+    @QCor.Slot()
+    def run(self) -> None:
+        try:
+            self.connection.interrupt()
+        except OSError as error:
+            print(f"could not interrupt {self.connection.serverAddress}: {error}")
+
+
+class SubmissionFeed(QCor.QObject):
+    """Submits prompts as an iterable yields them, `batchSize` per event loop
+    turn and only while fewer than `maxQueued` submissions wait for a worker,
+    so a long sweep neither blocks the UI thread nor piles up in memory.
+
+    A full queue pauses the feed, the queue resumes it whenever one of its
+    submissions is done.
+    """
+
+    submitted = QCor.Signal(object)
+    finished = QCor.Signal()
+
+    def __init__(
+        self,
+        submissionQueue: "PromptSubmissionQueue",
+        prompts: Iterable[Dict[str, Any]],
+        front: bool = False,
+        batchSize: int = 32,
+        maxQueued: int = 128,
+    ) -> None:
+        super().__init__()
+        self.submissionQueue = submissionQueue
+        self.front = front
+        self.batchSize = batchSize
+        self.maxQueued = maxQueued
+        self.submissions: List[Submission] = []
+        self.done = False
+        self._prompts: Iterator[Dict[str, Any]] = iter(prompts)
+        self._timer = QCor.QTimer(self)
+        self._timer.timeout.connect(self._feed)
+
+    def start(self) -> None:
+        self._timer.start(0)
+
+    def resume(self) -> None:
+        if not self.done and not self._timer.isActive():
+            self._timer.start(0)
+
+    def stop(self) -> None:
+        """Submits nothing more, prompts not pulled yet are never stamped."""
+        self._timer.stop()
+        if not self.done:
+            self.done = True
+            self.finished.emit()
+
+    def _feed(self) -> None:
+        room = min(self.batchSize, self.maxQueued - self.submissionQueue.depth)
+        if room <= 0:
+            self._timer.stop()
+            return
+        for _ in range(room):
+            prompt = next(self._prompts, None)
+            if prompt is None:
+                self.stop()
+                return
+            submission = self.submissionQueue.submit(prompt, self.front)
+            self.submissions.append(submission)
+            self.submitted.emit(submission)
+
+
+class PromptSubmissionQueue(QCor.QObject):
+    """POSTs compiled prompts from worker threads and reports the outcome.
+
+    Prompts identical to one that is still queued or running, or to one of
+    the last `recentSize` completed ones, aren't sent again, submit returns
+    the existing Submission instead.
+    """
+
+    accepted = QCor.Signal(object)
+    rejected = QCor.Signal(object)
+    # server address and prompt id of a prompt that was taken off a queue
+    cancelled = QCor.Signal(str, str)
+
+    def __init__(
+        self,
+        dispatcher: PromptDispatcher,
+        concurrency: int = 2,
+        window: int = 256,
+        recentSize: int = 64,
+    ) -> None:
+        super().__init__()
+        self.dispatcher = dispatcher
+        self._pool = QCor.QThreadPool()
+        self._pool.setMaxThreadCount(concurrency)
+        self._lock = threading.Lock()
+        self._nextTicket = 0
+        self._queued = 0
+        self._inFlight = 0
+        self._acceptedCount = 0
+        self._rejectedCount = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._workers: Dict[Any, QCor.QRunnable] = {}
+        # accepted submissions by prompt id until they are done
+        self._accepted: Dict[str, Submission] = {}
+        self.dedupe = True
+        self.recentSize = recentSize
+        self._pending: Dict[str, Submission] = {}
+        self._recent: OrderedDict[str, Submission] = OrderedDict()
+        self._dedupeHits = 0
+        self._dedupeMisses = 0
+        self._feeds: Set[SubmissionFeed] = set()
+
+    @property
+    def concurrency(self) -> int:
+        return self._pool.maxThreadCount()
+
+    @concurrency.setter
+    def concurrency(self, value: int) -> None:
+        self._pool.setMaxThreadCount(max(1, value))
+
+    @property
+    def depth(self) -> int:
+        """Submissions waiting for a worker."""
+        with self._lock:
+            return self._queued
+
+    def submit(
+        self, prompt: Mapping[str, Any], front: bool = False, key: str | None = None
+    ) -> Submission:
+        """`key` is the promptHash of `prompt` if it's already known."""
+        if not self.dedupe:
+            key = ""
+        elif key is None:
+            key = promptHash(prompt)
+        with self._lock:
+            existing = self._pending.get(key, None) or self._recent.get(key, None)
+            if existing is not None and not existing.cancelRequested:
+                self._dedupeHits += 1
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                return existing
+            if self.dedupe:
+                self._dedupeMisses += 1
+            submission = Submission(self._nextTicket, prompt, key, front)
+            self._nextTicket += 1
+            self._queued += 1
+            if self.dedupe:
+                self._pending[key] = submission
+        worker = SubmissionWorker(submission, self.dispatcher, self)
+        worker.signals.done.connect(self._done)
+        self._workers[submission.ticket] = worker
+        self._pool.start(worker)
+        return submission
+
+    def submitAll(
+        self,
+        prompts: Iterable[Dict[str, Any]],
+        front: bool = False,
+        batchSize: int = 32,
+        maxQueued: int = 128,
+    ) -> SubmissionFeed:
+        """Submits prompts in order as `prompts` yields them, from the event
+        loop, see SubmissionFeed."""
+        feed = SubmissionFeed(self, prompts, front, batchSize, maxQueued)
+        self._feeds.add(feed)
+        feed.finished.connect(partial(self._feeds.discard, feed))
+        feed.start()
+        return feed
+
+    def _started(self, submission: Submission) -> None:
+        submission.startedAt = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._inFlight += 1
+
+    def _done(self, submission: Submission) -> None:
+        self._workers.pop(submission.ticket, None)
+        with self._lock:
+            self._inFlight -= 1
+            if submission.latency is not None:
+                self._latencies.append(submission.latency)
+            if submission.accepted:
+                self._acceptedCount += 1
+            else:
+                self._rejectedCount += 1
+        if submission.accepted:
+            assert submission.connection is not None
+            assert submission.promptId is not None
+            submission.signals = submission.connection.session.subscribe(
+                submission.promptId
+            )
+            submission.signals.failed.connect(partial(self._forget, submission))
+            submission.signals.finished.connect(partial(self._finished, submission))
+            self._accepted[submission.promptId] = submission
+            self.accepted.emit(submission)
+            if submission.cancelRequested:
+                self.cancelPrompt(submission.connection, submission.promptId)
+        else:
+            self._forget(submission)
+            self.rejected.emit(submission)
+        for feed in list(self._feeds):
+            feed.resume()
+
+    def _forget(self, submission: Submission, *args: Any) -> None:
+        with self._lock:
+            if self._pending.get(submission.promptHash, None) is submission:
+                del self._pending[submission.promptHash]
+
+    def _finished(self, submission: Submission) -> None:
+        if submission.promptId is not None:
+            self._accepted.pop(submission.promptId, None)
+        with self._lock:
+            if self._pending.get(submission.promptHash, None) is not submission:
+                # failed, identical prompts have to run again
+                return
+            del self._pending[submission.promptHash]
+            submission.completed = True
+            self._recent[submission.promptHash] = submission
+            while len(self._recent) > self.recentSize:
+                self._recent.popitem(last=False)
+
+    def submission(self, promptId: str) -> Submission | None:
+        """The accepted, not yet finished submission for `promptId`."""
+        return self._accepted.get(promptId, None)
+
+    def cancel(self, submission: Submission) -> None:
+        """Takes `submission` off the queue if the server didn't start it yet."""
+        if submission.completed or submission.cancelled:
+            return
+        submission.cancelRequested = True
+        # identical prompts sent from now on are sent again
+        self._forget(submission)
+        if not submission.accepted:
+            # the worker skips it, or it's already being posted and gets
+            # cancelled once accepted
+            return
+        assert submission.connection is not None
+        assert submission.promptId is not None
+        self.cancelPrompt(submission.connection, submission.promptId)
+
+    def cancelPrompt(self, connection: ComfyConnection, promptId: str) -> None:
+        """Deletes a pending prompt, also ones not sent through this queue."""
+        key = ("cancel", promptId)
+        if key in self._workers:
+            return
+        worker = CancelWorker(connection, promptId)
+        worker.signals.done.connect(partial(self._cancelled, connection))
+        self._workers[key] = worker
+        self._pool.start(worker)
+
+    def _cancelled(
+        self, connection: ComfyConnection, promptId: str, removed: bool
+    ) -> None:
+        self._workers.pop(("cancel", promptId), None)
+        if not removed:
+            return
+        submission = self._accepted.pop(promptId, None)
+        if submission is not None:
+            submission.cancelled = True
+            self._forget(submission)
+            connection.session.unsubscribe(promptId)
+            assert submission.signals is not None
+            submission.signals.failed.emit(
+                "execution_cancelled", {"prompt_id": promptId}
+            )
+            submission.signals.finished.emit()
+        self.cancelled.emit(connection.serverAddress, promptId)
+
+    def interrupt(self, connection: ComfyConnection) -> None:
+        self._pool.start(InterruptWorker(connection))
+
+    def forgetResults(self) -> None:
+        """Drops completed prompts, identical prompts will be sent again."""
+        with self._lock:
+            self._recent.clear()
+
+    def waitForDone(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            latencies: List[float] = sorted(self._latencies)
+            metrics: Dict[str, float] = {
+                "depth": self._queued,
+                "inFlight": self._inFlight,
+                "accepted": self._acceptedCount,
+                "rejected": self._rejectedCount,
+                "concurrency": self.concurrency,
+                "dedupeHits": self._dedupeHits,
+                "dedupeMisses": self._dedupeMisses,
+            }
+        if len(latencies) > 0:
+            metrics["latencyMean"] = sum(latencies) / len(latencies)
+            metrics["latencyP50"] = latencies[len(latencies) // 2]
+            metrics["latencyP95"] = latencies[
+                min(len(latencies) - 1, int(len(latencies) * 0.95))
+            ]
+            metrics["latencyMax"] = latencies[-1]
+        return metrics
@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import os
+import threading
+
+import PySide6.QtCore as QCor
+
+from server.ComfyConnection import ComfyConnection
+
+
+def fileHash(path: str, chunkSize: int = 1024 * 1024) -> str:
+    """sha256 of a file, read in chunks so large files don't end up in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunkSize)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadSignals(QCor.QObject):
+    done = QCor.Signal(str, object, object)
+
+
+class UploadWorker(QCor.QRunnable):
+    def __init__(
+        self,
+        uploadManager: "UploadManager",
+        connection: ComfyConnection,
+        path: str,
+    ) -> None:
+        super().__init__()
+        self.uploadManager = uploadManager
+        self.connection = connection
+        self.path = path
+        self.signals = UploadSignals()
+
+    @QCor.Slot()
+    def run(self) -> None:
+        try:
+            name = self.uploadManager.ensureUploaded(self.connection, self.path)
+        except (OSError, ValueError, KeyError) as error:
+            self.signals.done.emit(self.path, self.connection, error)
+            return
+        self.signals.done.emit(self.path, self.connection, name)
+
+
+class UploadManager(QCor.QObject):
+    """Uploads input images to /upload/image once per server.
+
+    Files are named after their content hash on the server, the hash to name
+    map of every server is kept in `mapPath` so files the server already has
+    are skipped, also across sessions. Known files are checked on the server
+    before skipping them, so removed ones are uploaded again.
+    """
+
+    uploaded = QCor.Signal(str, str, str)
+    failed = QCor.Signal(str, str, str)
+
+    def __init__(self, mapPath: str, maxThreads: int = 4) -> None:
+        super().__init__()
+        self.mapPath = mapPath
+        self._lock = threading.Lock()
+        # held while writing the map, so the last write has the newest snapshot
+        self._saveLock = threading.Lock()
+        # serverAddress -> content hash -> filename on that server
+        self._servers: Dict[str, Dict[str, str]] = {}
+        # path -> (size, mtime, content hash)
+        self._files: Dict[str, Tuple[int, int, str]] = {}
+        self._hashing: Dict[str, threading.Lock] = {}
+        self._uploading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._pool = QCor.QThreadPool()
+        self._pool.setMaxThreadCount(maxThreads)
+        self._workers: Dict[Tuple[str, str], UploadWorker] = {}
+        self.uploads = 0
+        self.skipped = 0
+        self.uploadedBytes = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.mapPath, "r", encoding="utf-8") as f:
+                data: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._servers = data.get("servers", {})
+        self._files = {
+            path: (entry[0], entry[1], entry[2])
+            for path, entry in data.get("files", {}).items()
+        }
+
+    def _save(self) -> None:
+        with self._saveLock:
+            with self._lock:
+                data = json.dumps(
+                    {
+                        "servers": self._servers,
+                        "files": {p: list(e) for p, e in self._files.items()},
+                    }
+                )
+            tmpPath = f"{self.mapPath}.tmp"
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmpPath, self.mapPath)
+
+    def contentHash(self, path: str) -> str:
+        """Content hash of `path`, only rehashed when size or mtime changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._files.get(path, None)
+            if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                return cached[2]
+            pathLock = self._hashing.setdefault(path, threading.Lock())
+        with pathLock:
+            with self._lock:
+                cached = self._files.get(path, None)
+            if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                return cached[2]
+            digest = fileHash(path)
+            with self._lock:
+                self._files[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    @staticmethod
+    def serverName(digest: str, path: str) -> str:
+        return f"{digest[:32]}{os.path.splitext(path)[1].lower()}"
+
+    def knownName(self, serverAddress: str, path: str) -> str | None:
+        digest = self.contentHash(path)
+        with self._lock:
+            return self._servers.get(serverAddress, {}).get(digest, None)
+
+    def ensureUploaded(self, connection: ComfyConnection, path: str) -> str:
+        """Returns the name of `path` on the server, uploading it if needed.
+
+        Blocks, so call it from a worker thread.
+        """
+        digest = self.contentHash(path)
+        with self._lock:
+            # copies of the same file wait for each other instead of uploading twice
+            uploadLock = self._uploading.setdefault(
+                (connection.serverAddress, digest), threading.Lock()
+            )
+        with uploadLock:
+            with self._lock:
+                name = self._servers.get(connection.serverAddress, {}).get(digest)
+            if name is not None:
+                subfolder, _, filename = name.rpartition("/")
+                if connection.hasImage(filename, subfolder):
+                    with self._lock:
+                        self.skipped += 1
+                    return name
+                with self._lock:
+                    self._servers[connection.serverAddress].pop(digest, None)
+            response = connection.uploadImage(path, self.serverName(digest, path))
+            name = response["name"]
+            if response.get("subfolder", ""):
+                name = f"{response['subfolder']}/{name}"
+            with self._lock:
+                self._servers.setdefault(connection.serverAddress, {})[digest] = name
+                self.uploads += 1
+                self.uploadedBytes += os.path.getsize(path)
+        self._save()
+        return name
+
+    def upload(self, connection: ComfyConnection, paths: List[str]) -> None:
+        """Uploads `paths` in parallel, reporting through uploaded and failed."""
+        for path in paths:
+            key = (connection.serverAddress, path)
+            if key in self._workers:
+                continue
+            worker = UploadWorker(self, connection, path)
+            worker.signals.done.connect(self._onDone)
+            self._workers[key] = worker
+            self._pool.start(worker)
+
+    def _onDone(self, path: str, connection: ComfyConnection, result: Any) -> None:
+        self._workers.pop((connection.serverAddress, path), None)
+        if isinstance(result, str):
+            self.uploaded.emit(connection.serverAddress, path, result)
+        else:
+            self.failed.emit(connection.serverAddress, path, str(result))
+
+    def waitForDone(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "skipped": self.skipped,
+                "uploadedBytes": self.uploadedBytes,
+                "pending": len(self._workers),
+            }
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from typing import (
     TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
 )
 from constants import SlotType
 from node.socket import SocketTyping
@@ -39,7 +42,9 @@ class ExpandableNode(Node):
         factory = self.nodeScene.sceneCollection.nodeFactory
         painter = factory.socketStyles.getSocketPainter("", "node", False)
         slotType = cce.socket.nodeSlot.slotType
-        namedSlot = NamedSlot(self, "", 0, "", painter, slotType, False)
+        # the new slot goes last
+        ind = len(self.outputs if slotType == SlotType.OUTPUT else self.inputs)
+        namedSlot = NamedSlot(self, "", ind, "", painter, slotType, False)
         if slotType == SlotType.OUTPUT:
             self.removeOutputSlot(namedSlot)
         else:
@@ -61,6 +66,7 @@ class ExpandableNode(Node):
             self.addOutputSlot(newSlot)
         else:
             self.addInputSlot(newSlot)
+        self.onExpandableSlotAdded(socket.nodeSlot)
 
     def _removeSlot(
         self,
@@ -77,6 +83,36 @@ class ExpandableNode(Node):
             self.removeOutputSlot(newSlot)
         else:
             self.removeInputSlot(newSlot)
+        self.onExpandableSlotRemoved(socket.nodeSlot)
+
+    def loadState(self, state: Dict[str, Any]) -> None:
+        # slots added by connecting the last one, loading edges doesn't
+        # connect that one
+        self._loadExpandedSlots(state["input"], SlotType.INPUT)
+        self._loadExpandedSlots(state["output"], SlotType.OUTPUT)
+        super().loadState(state)
+
+    def _loadExpandedSlots(
+        self, slotStates: List[Dict[str, Any]], slotType: SlotType
+    ) -> None:
+        factory = self.nodeScene.sceneCollection.nodeFactory
+        slots = self.outputs if slotType == SlotType.OUTPUT else self.inputs
+        for slotState in slotStates:
+            if slotState["name"] == "" or any(
+                slot.name == slotState["name"] for slot in slots
+            ):
+                continue
+            slot = [slot for slot in slots if slot.name == ""][-1]
+            # saved as a list of type names
+            socketType = SocketTyping(*slotState["typeName"])
+            typeName = socketType.types[0] if len(socketType.types) == 1 else ""
+            painter = factory.socketStyles.getSocketPainter(typeName, "node", False)
+            newSlot = NamedSlot(self, "", len(slots), "", painter, slotType, False)
+            slot.socket.onConnectionChanged -= self._expand
+            newSlot.socket.onConnectionChanged += self._expand
+            slot.name = slotState["name"]
+            slot.socket.socketType = socketType
+            slot.socket.grNodeSocket.socketPainter = painter
 
     def onExpandableSlotAdded(self, slot: NodeSlot) -> None:
         pass
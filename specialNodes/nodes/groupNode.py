@@ -3,7 +3,9 @@ from __future__ import annotations
 from typing import (
     TYPE_CHECKING,
     Any,
+    Dict,
     Optional,
+    Set,
     TypeVar,
     Generic,
     cast,
@@ -18,11 +20,23 @@ import PySide6.QtGui
 import PySide6.QtWidgets as QWgt
 import PySide6.QtCore as QCor
 import PySide6.QtGui as QGui
+from constants import SlotType
 from nodeSlots.nodeSlot import NodeSlot
+from nodeSlots.slots.namedSlot import NamedSlot
+from server import (
+    ComfyPromptManager,
+    GroupTemplate,
+    InlinedGroup,
+    NodeAddress,
+    NodeRecord,
+    NodeResult,
+    PartialPrompt,
+)
 from specialNodes.nodes.expandableNode import ExpandableNode
 
 
 if TYPE_CHECKING:
+    from node import SceneCollection
     from node.factory import ComfyFactory
 
 from node import Node, NodeScene
@@ -40,6 +54,7 @@ class GroupIn(ExpandableNode, CustomNode):
         title: str = "undefined",
     ) -> None:
         super().__init__(nodeScene, nodeClass, isOutput, description, title)
+        self.clientOnly = True
 
     @classmethod
     def getClassName(cls) -> str:
@@ -90,14 +105,359 @@ class GroupIn(ExpandableNode, CustomNode):
         self.grNode.updateSlots()
         for slot in slots:
             slot.socket.updateEdges()
+        self.invalidate()
+        updateGroupNodes(self.nodeScene)
 
     def delete(self, targetSlot: ListItem) -> None:
         self.removeOutputSlot(targetSlot.slot)
         ind = self.lstWgt.indexFromItem(targetSlot.item).row()
         self.lstWgt.removeItemWidget(targetSlot.item)
         self.lstWgt.model().removeRow(ind)
-        for slot in self.outputs:
+        for i, slot in enumerate(self.outputs):
+            slot.ind = i
             slot.socket.updateEdges()
+        self.invalidate()
+        updateGroupNodes(self.nodeScene)
+
+    def onExpandableSlotAdded(self, slot: NodeSlot) -> None:
+        updateGroupNodes(self.nodeScene)
+
+    def onExpandableSlotRemoved(self, slot: NodeSlot) -> None:
+        updateGroupNodes(self.nodeScene)
+
+
+@registerCustomNode
+class GroupOut(ExpandableNode, CustomNode):
+    def __init__(
+        self,
+        nodeScene: NodeScene,
+        nodeClass: str,
+        isOutput: bool = False,
+        description: str = "",
+        title: str = "undefined",
+    ) -> None:
+        super().__init__(nodeScene, nodeClass, isOutput, description, title)
+        self.clientOnly = True
+
+    @classmethod
+    def getClassName(cls) -> str:
+        return "GroupOut"
+
+    @classmethod
+    def getDisplayName(cls) -> str:
+        return "Group Output"
+
+    @classmethod
+    def getCategory(cls) -> str | None:
+        return "Layout"
+
+    @classmethod
+    def createNode(cls, factory: ComfyFactory, nodeDef: Any) -> Node:
+        assert factory.activeScene is not None
+        node = cls(
+            factory.activeScene,
+            cls.getClassName(),
+            description="group node output",
+            title=cls.getDisplayName(),
+        )
+        node.addExpandableInput()
+        return node
+
+    def onExpandableSlotAdded(self, slot: NodeSlot) -> None:
+        updateGroupNodes(self.nodeScene)
+
+    def onExpandableSlotRemoved(self, slot: NodeSlot) -> None:
+        updateGroupNodes(self.nodeScene)
+
+    def execute(
+        self, promptManager: ComfyPromptManager
+    ) -> Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]] | None:
+        cashed = self.getCashedExecute(promptManager)
+        if cashed is not None:
+            return cashed
+        # the outputs of the group are what the inputs read
+        slotResults: Dict[int, NodeAddress | NodeResult | None] = {}
+        for slot in self.inputs:
+            if len(slot.socket.edges) > 0:
+                slotResults[slot.ind] = promptManager.executeSlot(slot)
+        slotOutputs: Dict[int, NodeAddress | NodeResult] = {}
+        for ind, result in slotResults.items():
+            if result is None:
+                return None
+            slotOutputs[ind] = result
+        return (PartialPrompt.empty(), slotOutputs)
+
+
+@registerCustomNode
+class GroupNode(Node, CustomNode):
+    """Runs the nodes of a group scene, its inputs are the outputs of the
+    GroupIn node in there and its outputs the inputs of the GroupOut node.
+
+    The group is compiled once into a GroupTemplate kept on the scene, and
+    inlined for every group node under its address.
+    """
+
+    def __init__(
+        self,
+        nodeScene: NodeScene,
+        nodeClass: str,
+        isOutput: bool = False,
+        description: str = "",
+        title: str = "undefined",
+    ) -> None:
+        self.groupScene: NodeScene | None = None
+        super().__init__(nodeScene, nodeClass, isOutput, description, title)
+
+    @classmethod
+    def getClassName(cls) -> str:
+        return "GroupNode"
+
+    @classmethod
+    def getDisplayName(cls) -> str:
+        return "Group"
+
+    @classmethod
+    def getCategory(cls) -> str | None:
+        # needs a group scene, placed with OpAddGroup instead
+        return None
+
+    @classmethod
+    def createNode(cls, factory: ComfyFactory, nodeDef: Any) -> Node:
+        assert factory.activeScene is not None
+        return cls(
+            factory.activeScene,
+            cls.getClassName(),
+            description="group node",
+            title=cls.getDisplayName(),
+        )
+
+    @property
+    def isOutput(self) -> bool:
+        # output nodes in the group run for every group node
+        return self.groupScene is not None and hasOutputs(self.groupScene)
+
+    @isOutput.setter
+    def isOutput(self, value: bool) -> None:
+        # Node.__init__ sets it
+        if value:
+            raise AttributeError("group nodes are outputs when their group has any")
+
+    def setGroupScene(self, groupScene: NodeScene) -> None:
+        if self.groupScene is not None:
+            self.groupScene.groupNodes.discard(self)
+        self.groupScene = groupScene
+        groupScene.groupNodes.add(self)
+        self.nodeScene.invalidateOutputs()
+        self.updateSlots()
+        self.invalidate()
+
+    def updateSlots(self) -> None:
+        """Gives this node a slot for every slot of the GroupIn and GroupOut
+        nodes of its group."""
+        if self.groupScene is None:
+            return
+        groupIn, groupOut = groupInterface(self.groupScene)
+        self._updateSlots(
+            self.inputs, groupIn.outputs[:-1] if groupIn else [], SlotType.INPUT
+        )
+        self._updateSlots(
+            self.outputs, groupOut.inputs[:-1] if groupOut else [], SlotType.OUTPUT
+        )
+
+    def _updateSlots(
+        self, slots: List[NodeSlot], sources: List[NodeSlot], slotType: SlotType
+    ) -> None:
+        unused = {slot.ind: slot for slot in slots}
+        for source in sources:
+            slot = unused.pop(source.ind, None)
+            if slot is None:
+                slot = NamedSlot(
+                    self,
+                    source.name,
+                    source.ind,
+                    "",
+                    source.socket.grNodeSocket.socketPainter,
+                    slotType,
+                    # the group may not read it
+                    slotType == SlotType.INPUT,
+                )
+            elif slot.name != source.name:
+                slot.name = source.name
+            slot.socket.socketType = source.socket.socketType
+        for slot in unused.values():
+            if slotType == SlotType.INPUT:
+                self.removeInputSlot(slot)
+            else:
+                self.removeOutputSlot(slot)
+
+    def saveState(self) -> Dict[str, Any]:
+        state = super().saveState()
+        state["groupScene"] = None if self.groupScene is None else self.groupScene.name
+        return state
+
+    def loadState(self, state: Dict[str, Any]) -> None:
+        name = state.get("groupScene", None)
+        if name is not None:
+            groupScene = self.nodeScene.sceneCollection.groupScene(name)
+            if groupScene is None:
+                print(f"group scene not found: {name}")
+            else:
+                self.setGroupScene(groupScene)
+        super().loadState(state)
+
+    def inline(
+        self, inputs: Dict[int, NodeAddress | NodeResult]
+    ) -> Tuple[InlinedGroup, Dict[int, NodeAddress | NodeResult]]:
+        """The group inlined with what the connected inputs compile to."""
+        if self.groupScene is None:
+            raise ValueError("group node has no group")
+        template = compileGroup(self.groupScene)
+        if len(template.errors) > 0:
+            raise ValueError(f"{self.groupScene.name}: {template.errors[0]}")
+        names = {slot.ind: slot.name for slot in self.inputs}
+        for ind in template.usedInputs:
+            if ind not in inputs:
+                raise ValueError(f"input {names.get(ind, ind)} is not connected")
+        for slot in self.outputs:
+            if slot.ind not in template.outputs:
+                raise ValueError(
+                    f"output {slot.name} is not connected in {self.groupScene.name}"
+                )
+        return template.inline(self.getNodeAddress(), inputs)
+
+    def execute(
+        self, promptManager: ComfyPromptManager
+    ) -> Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]] | None:
+        cashed = self.getCashedExecute(promptManager)
+        if cashed is not None:
+            return cashed
+        slotResults: Dict[int, NodeAddress | NodeResult | None] = {}
+        for slot in self.inputs:
+            if len(slot.socket.edges) > 0:
+                slotResults[slot.ind] = promptManager.executeSlot(slot)
+        inputs: Dict[int, NodeAddress | NodeResult] = {}
+        for ind, result in slotResults.items():
+            if result is None:
+                return None
+            inputs[ind] = result
+        return self.inline(inputs)
+
+    def snapshot(self) -> NodeRecord:
+        if self.record is not None:
+            return self.record
+        inputs: Dict[int, NodeAddress | NodeResult] = {}
+        for slot in self.inputs:
+            if len(slot.socket.edges) > 0:
+                target = slot.socket.edges[0].outputSocket
+                value = target.nodeSlot.node.resolveOutput(target.nodeSlot.ind)
+                # otherwise what it reads fails and the error is reported there
+                if value is not None:
+                    inputs[slot.ind] = value
+        group: InlinedGroup | None = None
+        outputs: Dict[int, NodeAddress | NodeResult] = {}
+        error = None
+        try:
+            group, outputs = self.inline(inputs)
+        except ValueError as e:
+            error = str(e)
+        self.record = NodeRecord(
+            self,
+            self.getNodeAddress(),
+            self.title,
+            self.nodeClass,
+            self.isOutput,
+            False,
+            (),
+            tuple(outputs.items()),
+            tuple(n.getNodeAddress() for n in self.dependencies()),
+            error,
+            group,
+        )
+        return self.record
+
+    def resolveOutput(self, ind: int) -> NodeAddress | NodeResult | None:
+        return dict(self.snapshot().outputs).get(ind, None)
+
+
+def groupInterface(nodeScene: NodeScene) -> Tuple[GroupIn | None, GroupOut | None]:
+    """The nodes whose slots are the inputs and outputs of a group scene."""
+    groupIn = next((n for n in nodeScene.nodes if isinstance(n, GroupIn)), None)
+    groupOut = next((n for n in nodeScene.nodes if isinstance(n, GroupOut)), None)
+    return groupIn, groupOut
+
+
+def newGroupScene(collection: SceneCollection, name: str) -> NodeScene:
+    """A new group scene named `name`, or `name` with a number if that is
+    taken, with its GroupIn and GroupOut nodes."""
+    groupName, i = name, 1
+    while collection.groupScene(groupName) is not None:
+        i += 1
+        groupName = f"{name} {i}"
+    groupScene = collection.addGroupScene(groupName)
+    factory = collection.nodeFactory
+    activeScene = factory.activeScene
+    factory.activeScene = groupScene
+    try:
+        factory.loadNode("GroupIn").grNode.setPos(QCor.QPointF(-300, 0))
+        factory.loadNode("GroupOut").grNode.setPos(QCor.QPointF(300, 0))
+    finally:
+        factory.activeScene = activeScene
+    return groupScene
+
+
+def updateGroupNodes(nodeScene: NodeScene) -> None:
+    for node in nodeScene.groupNodes:
+        if isinstance(node, GroupNode):
+            node.updateSlots()
+
+
+def hasOutputs(nodeScene: NodeScene) -> bool:
+    """Whether running the scene runs output nodes, kept on the scene until
+    its nodes or the nodes of its groups change."""
+    if nodeScene.hasOutputs is None:
+        nodeScene.hasOutputs = _hasOutputs(nodeScene, set())
+    return nodeScene.hasOutputs
+
+
+def _hasOutputs(nodeScene: NodeScene, visited: Set[NodeScene]) -> bool:
+    visited.add(nodeScene)
+    for node in nodeScene.nodes:
+        if isinstance(node, GroupNode):
+            groupScene = node.groupScene
+            if groupScene is not None and groupScene not in visited:
+                if _hasOutputs(groupScene, visited):
+                    return True
+        elif node.isOutput:
+            return True
+    return False
+
+
+# group scenes being compiled, a group node in one of them is a cycle
+_compiling: Set[NodeScene] = set()
+
+
+def compileGroup(nodeScene: NodeScene) -> GroupTemplate:
+    """Compiles a group scene, once until something in it changes."""
+    if nodeScene.groupTemplate is not None:
+        return nodeScene.groupTemplate
+    if nodeScene in _compiling:
+        raise ValueError(f"group {nodeScene.name} contains itself")
+    groupIn, groupOut = groupInterface(nodeScene)
+    roots = [n for n in nodeScene.nodes if n.isOutput]
+    if groupOut is not None:
+        roots.append(groupOut)
+    promptManager = ComfyPromptManager(nodeScene.sceneCollection.dependencyIndex)
+    _compiling.add(nodeScene)
+    try:
+        promptManager.executeNodes(roots)
+    finally:
+        _compiling.discard(nodeScene)
+    nodeScene.groupTemplate = GroupTemplate.fromCompile(
+        promptManager,
+        "" if groupIn is None else groupIn.getNodeAddress(),
+        "" if groupOut is None else groupOut.getNodeAddress(),
+    )
+    return nodeScene.groupTemplate
 
 
 class MoveableList(QWgt.QListWidget):
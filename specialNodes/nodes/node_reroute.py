@@ -4,7 +4,7 @@ from typing import Any, Callable, Dict, List, Tuple, TYPE_CHECKING, cast
 from customWidgets.elidedGraphicsItem import QGraphicsElidedTextItem
 from node.socket import SocketTyping
 from nodeGUI.edge import PreviewEdge
-from server import ComfyPromptManager, NodeAddress, NodeResult, PartialPrompt
+from server import ComfyPromptManager, NodeAddress, NodeRecord, NodeResult, PartialPrompt
 
 from nodeGUI import GrNodeSocket
 
@@ -95,13 +95,55 @@ class RerouteNode(Node, CustomNode):
         if "title" in state:
             self.setTitle(state["title"])
 
+    def dependencies(self) -> List[Node]:
+        socket = cast(RerouteSocket, self.rerouteSlot.socket)
+        if socket.outputConnection is None:
+            return []
+        target = socket.outputConnection.outputSocket
+        assert target is not None
+        return [target.nodeSlot.node]
+
+    def dependents(self) -> List[Node]:
+        socket = cast(RerouteSocket, self.rerouteSlot.socket)
+        return [
+            con.edge.travelFrom(socket).nodeSlot.node
+            for con in socket.rerouteConnections
+            if con.edge is not socket.outputConnection
+        ]
+
+    def snapshot(self) -> NodeRecord:
+        if self.record is not None:
+            return self.record
+        socket = cast(RerouteSocket, self.rerouteSlot.socket)
+        self.record = NodeRecord(
+            self,
+            self.getNodeAddress(),
+            self.title,
+            self.nodeClass,
+            self.isOutput,
+            True,
+            (),
+            ((0, self.resolveOutput(0)),),
+            tuple(n.getNodeAddress() for n in self.dependencies()),
+            None if socket.outputConnection is not None else "reroute has no input",
+        )
+        return self.record
+
+    def resolveOutput(self, ind: int) -> NodeAddress | NodeResult | None:
+        socket = cast(RerouteSocket, self.rerouteSlot.socket)
+        if socket.outputConnection is None:
+            return None
+        target = socket.outputConnection.outputSocket
+        assert target is not None
+        return target.nodeSlot.node.resolveOutput(target.nodeSlot.ind)
+
     def execute(
         self, promptManager: ComfyPromptManager
     ) -> Tuple[PartialPrompt, Dict[int, NodeAddress | NodeResult]] | None:
         cashed = self.getCashedExecute(promptManager)
         if cashed is not None:
             return cashed
-        rerouteSlotResult = self.rerouteSlot.execute(promptManager)
+        rerouteSlotResult = promptManager.executeSlot(self.rerouteSlot, True)
         if rerouteSlotResult is None:
             return None
         return (PartialPrompt.empty(), {0: rerouteSlotResult})
@@ -199,7 +241,7 @@ class RerouteSlot(NodeSlot):
     ) -> NodeAddress | NodeResult | None:
         socket = cast(RerouteSocket, self.socket)
         if socket.outputConnection is None:
-            raise ValueError("slot content can not be None")
+            raise ValueError("reroute has no input")
         target = socket.outputConnection.outputSocket
         assert target is not None
         if target.nodeSlot.node not in promptManager.idMap:
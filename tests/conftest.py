@@ -0,0 +1,62 @@
+from typing import Iterator
+import gc
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.compile import fixture
+from benchmarks.fakeComfy import FakeComfyServer, FakeTimings
+from node.factory.comfyFactory import ComfyFactory
+from style.socketStyle import SocketStyles
+
+
+@pytest.fixture(scope="session")
+def app() -> Iterator[QApplication]:
+    instance = QApplication.instance() or QApplication([])
+    assert isinstance(instance, QApplication)
+    yield instance
+
+
+@pytest.fixture(autouse=True)
+def collectGraphs(app: QApplication) -> Iterator[None]:
+    """Node graphs are reference cycles holding widgets, they are collected
+    here on the GUI thread instead of by whichever thread allocates next."""
+    yield
+    gc.collect()
+
+
+@pytest.fixture
+def factory(app: QApplication) -> ComfyFactory:
+    """A factory with the node definitions the benchmarks use."""
+    factory = ComfyFactory(SocketStyles())
+    with open(fixture, "rb") as f:
+        factory.loadNodeDefinitions(f.read())
+    return factory
+
+
+@pytest.fixture
+def fakeServer() -> Iterator[FakeComfyServer]:
+    """A fake ComfyUI server that takes a while to accept a prompt."""
+    server = FakeComfyServer(timings=FakeTimings(postLatency=0.1)).start()
+    yield server
+    server.stop()
+
+
+exitStatus = 0
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    global exitStatus
+    exitStatus = exitstatus
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_unconfigure(config: pytest.Config) -> None:
+    # PySide can crash tearing down the scene graph at interpreter exit
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(exitStatus)
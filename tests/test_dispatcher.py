@@ -0,0 +1,86 @@
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.fakeComfy import FakeComfyServer, FakeTimings
+from server import ComfyConnection, PromptDispatcher
+
+
+def prompt(ckpt: str | None = None) -> Dict[str, Any]:
+    inputs: Dict[str, Any] = {"width": 512}
+    if ckpt is not None:
+        inputs["ckpt_name"] = ckpt
+    return {"1": {"class_type": "EmptyLatentImage", "inputs": inputs}}
+
+
+@pytest.fixture
+def servers(app: QApplication) -> Iterator[List[FakeComfyServer]]:
+    # slow enough that queued prompts are still there when polled
+    servers = [
+        FakeComfyServer(timings=FakeTimings(nodeTime=5)).start() for _ in range(3)
+    ]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def dispatcher(servers: List[FakeComfyServer]) -> Iterator[PromptDispatcher]:
+    dispatcher = PromptDispatcher(
+        [ComfyConnection(s.serverAddress) for s in servers], stickySlack=2
+    )
+    yield dispatcher
+    dispatcher.close()
+
+
+def addresses(dispatcher: PromptDispatcher, prompts: List[Dict[str, Any]]) -> List[str]:
+    return [dispatcher.route(p).serverAddress for p in prompts]
+
+
+def test_least_loaded(
+    servers: List[FakeComfyServer], dispatcher: PromptDispatcher
+) -> None:
+    for _ in range(3):
+        servers[0].queuePrompt(prompt(), "other")
+    servers[1].queuePrompt(prompt(), "other")
+    dispatcher.pollQueues()
+    routed = addresses(dispatcher, [prompt() for _ in range(4)])
+    second, third = servers[1].serverAddress, servers[2].serverAddress
+    assert routed == [third, second, third, second]
+
+
+def test_sticky_within_slack(
+    servers: List[FakeComfyServer], dispatcher: PromptDispatcher
+) -> None:
+    first = dispatcher.route(prompt("a.safetensors")).serverAddress
+    # stays until it is more than stickySlack prompts behind the least loaded
+    routed = addresses(dispatcher, [prompt("a.safetensors") for _ in range(2)])
+    assert routed == [first, first]
+    assert dispatcher.route(prompt("a.safetensors")).serverAddress != first
+
+
+def test_unhealthy_backend_is_skipped(
+    servers: List[FakeComfyServer], dispatcher: PromptDispatcher
+) -> None:
+    servers[0].stop()
+    dispatcher.pollQueues()
+    assert not dispatcher.backends[0].healthy
+    routed = addresses(dispatcher, [prompt() for _ in range(4)])
+    assert servers[0].serverAddress not in routed
+    assert len(set(routed)) == 2
+
+
+def test_poll_keeps_unanswered_prompts(
+    servers: List[FakeComfyServer], dispatcher: PromptDispatcher
+) -> None:
+    connection = dispatcher.route(prompt())
+    backend = [b for b in dispatcher.backends if b.connection is connection][0]
+    # polled before the server got the POST
+    dispatcher.pollQueues()
+    assert backend.load == 1
+    connection.postPrompt(prompt(), False)
+    dispatcher.acknowledge(connection, True)
+    assert backend.load == 1
+    dispatcher.pollQueues()
+    assert (backend.queueDepth, backend.load) == (1, 1)
@@ -0,0 +1,47 @@
+from graphOps.ops.opEnterGroup import OpEnterGroup
+from gui.view import QNodeGraphicsView
+from node import NodeScene, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from specialNodes.nodes.groupNode import GroupNode, newGroupScene
+
+
+def placeGroup(
+    factory: ComfyFactory, nodeScene: NodeScene, group: NodeScene
+) -> GroupNode:
+    factory.activeScene = nodeScene
+    groupNode = factory.loadNode("GroupNode")
+    assert isinstance(groupNode, GroupNode)
+    groupNode.setGroupScene(group)
+    return groupNode
+
+
+def test_group_output_follows_nested_groups(factory: ComfyFactory) -> None:
+    collection = SceneCollection(factory)
+    inner = newGroupScene(collection, "group")
+    outer = newGroupScene(collection, "group")
+    assert [s.name for s in collection.scenes] == ["group", "group 2"]
+    placeGroup(factory, outer, inner)
+    groupNode = placeGroup(factory, collection.rootScene, outer)
+    assert not groupNode.isOutput
+
+    factory.activeScene = inner
+    save = factory.loadNode("SaveImage")
+    assert groupNode.isOutput
+    inner.removeNode(save)
+    assert not groupNode.isOutput
+
+
+def test_tab_opens_the_selected_group(factory: ComfyFactory) -> None:
+    collection = SceneCollection(factory)
+    group = newGroupScene(collection, "group")
+    groupNode = placeGroup(factory, collection.rootScene, group)
+    view = QNodeGraphicsView(collection.rootScene)
+    op = next(op for op in view._graphOps if isinstance(op, OpEnterGroup))
+
+    groupNode.grNode.setSelected(True)
+    op.doAction(view)
+    assert view.nodeScene is group
+    assert factory.activeScene is group
+    op.doAction(view)
+    assert view.nodeScene is collection.rootScene
+    assert factory.activeScene is collection.rootScene
@@ -0,0 +1,50 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List
+import threading
+
+import pytest
+
+from server.ComfyConnection import httpPool
+
+
+class droppingHandler(BaseHTTPRequestHandler):
+    """Answers GETs and drops the connection after reading a POST, like a
+    server that queued a prompt and went away before answering."""
+
+    protocol_version = "HTTP/1.1"
+    posts: List[bytes] = []
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_POST(self) -> None:
+        self.posts.append(self.rfile.read(int(self.headers["Content-Length"])))
+        self.close_connection = True
+
+
+@pytest.fixture
+def server() -> Iterator[ThreadingHTTPServer]:
+    droppingHandler.posts = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), droppingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_post_is_not_retried_on_a_reused_connection(
+    server: ThreadingHTTPServer,
+) -> None:
+    host, port = server.server_address[:2]
+    pool = httpPool(f"{host!s}:{port}")
+    assert pool.request("GET", "/queue") == b"{}"
+    with pytest.raises(OSError):
+        pool.request("POST", "/prompt", b'{"prompt":{}}')
+    assert droppingHandler.posts == [b'{"prompt":{}}']
@@ -0,0 +1,38 @@
+from typing import Tuple
+
+from benchmarks.throughput import connect, txt2img
+from node import Node, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from server import compileSnapshot
+
+
+def steps(factory: ComfyFactory, value: int) -> Tuple[SceneCollection, Node, Node]:
+    """The default workflow with its sampler steps read from a primitive."""
+    collection = txt2img(factory)
+    sampler = [n for n in collection.rootScene.nodes if n.nodeClass == "KSampler"][0]
+    primitive = factory.loadNode("IntegerPrimitive")
+    connect(collection, primitive, 0, sampler, "steps")
+    primitive.outputs[0].content = value
+    return collection, sampler, primitive
+
+
+def test_rename_then_edit(factory: ComfyFactory) -> None:
+    collection, sampler, primitive = steps(factory, 7)
+    prompt = compileSnapshot(collection.snapshot()).prompt
+    assert prompt[sampler.getNodeAddress()]["inputs"]["steps"] == 7
+
+    primitive.setTitle("renamed")
+    primitive.outputs[0].content = 42
+    prompt = compileSnapshot(collection.snapshot()).prompt
+    assert prompt[sampler.getNodeAddress()]["inputs"]["steps"] == 42
+    assert collection.compile().prompt == prompt
+
+
+def test_edit_reaches_records_past_cleared_node(factory: ComfyFactory) -> None:
+    collection, sampler, primitive = steps(factory, 7)
+    compileSnapshot(collection.snapshot())
+    # dropped without reaching the sampler
+    primitive.record = None
+    primitive.outputs[0].content = 42
+    prompt = compileSnapshot(collection.snapshot()).prompt
+    assert prompt[sampler.getNodeAddress()]["inputs"]["steps"] == 42
@@ -0,0 +1,37 @@
+import json
+import threading
+from typing import Any, List
+
+from PySide6.QtWidgets import QApplication
+
+from server.ComfyConnection import messageRouter
+
+
+def test_backlog_is_replayed_after_subscribing(app: QApplication) -> None:
+    router = messageRouter()
+    router.dispatchText(
+        json.dumps({"type": "execution_start", "data": {"prompt_id": "p"}})
+    )
+    signals = router.subscribe("p")
+    messages: List[str] = []
+    signals.message.connect(lambda msgType, data: messages.append(msgType))
+    assert messages == []
+    app.processEvents()
+    assert messages == ["execution_start"]
+
+
+def test_subscribe_off_the_main_thread_raises(app: QApplication) -> None:
+    router = messageRouter()
+    errors: List[Any] = []
+
+    def subscribe() -> None:
+        try:
+            router.subscribe("p")
+        except RuntimeError as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=subscribe)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    assert "p" not in router._subscribers
@@ -0,0 +1,28 @@
+from benchmarks.throughput import connect, txt2img
+from node.factory.comfyFactory import ComfyFactory
+
+
+def test_merged_nodes_map_to_their_survivor(factory: ComfyFactory) -> None:
+    collection = txt2img(factory)
+    nodes = {n.nodeClass: n for n in collection.rootScene.nodes}
+    # a second decode of the same latent with a copy of the same checkpoint
+    ckpt = factory.loadNode("CheckpointLoaderSimple")
+    decode = factory.loadNode("VAEDecode")
+    save = factory.loadNode("SaveImage")
+    connect(collection, nodes["KSampler"], 0, decode, "samples")
+    connect(collection, ckpt, 2, decode, "vae")
+    connect(collection, decode, 0, save, "images")
+
+    promptManager = collection.compile()
+    promptManager.eliminateDuplicates()
+    nodeMap = promptManager.nodeMap()
+    assert set(nodeMap) == set(promptManager.prompt)
+    addresses = {a: n for n, a in promptManager.idMap.items()}
+    for address, survivor in promptManager.merged.items():
+        assert addresses[address] in nodeMap[survivor]
+    for original, copy in (
+        (nodes["CheckpointLoaderSimple"], ckpt),
+        (nodes["VAEDecode"], decode),
+    ):
+        assert nodeMap[original.getNodeAddress()] == [original, copy]
+    assert nodeMap[save.getNodeAddress()] == [save]
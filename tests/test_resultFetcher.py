@@ -0,0 +1,61 @@
+from pathlib import Path
+import os
+import threading
+from typing import Any, List, Tuple
+
+import PySide6.QtCore as QCor
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.fakeComfy import FakeComfyServer, solidPng
+from gui.resultFetcher import ImageDiskCache, ImageRef, ResultFetcher
+from server import ComfyConnection
+
+
+def test_thumbnail_is_reported_for_its_size_and_on_failure(
+    app: QApplication, fakeServer: FakeComfyServer, tmp_path: Path
+) -> None:
+    fakeServer.images["found.png"] = solidPng(64, 64)
+    connection = ComfyConnection(fakeServer.serverAddress)
+    fetcher = ResultFetcher(str(tmp_path))
+    ready: List[Tuple[Any, ...]] = []
+    fetcher.thumbnailReady.connect(lambda *args: ready.append(args))
+    found = ImageRef(fakeServer.serverAddress, "found.png", "", "output")
+    missing = ImageRef(fakeServer.serverAddress, "missing.png", "", "output")
+    small, large = QCor.QSize(16, 16), QCor.QSize(32, 32)
+    try:
+        fetcher.requestThumbnail(connection, found, small)
+        fetcher.requestThumbnail(connection, found, large)
+        fetcher.requestThumbnail(connection, missing, small)
+        fetcher._pool.waitForDone()
+        app.processEvents()
+    finally:
+        connection.close()
+
+    images = {ResultFetcher.thumbnailKey(r, s): i for r, s, i in ready}
+    assert len(images) == 3
+    assert images[ResultFetcher.thumbnailKey(found, small)].width() == 16
+    assert images[ResultFetcher.thumbnailKey(found, large)].width() == 32
+    assert images[ResultFetcher.thumbnailKey(missing, small)].isNull()
+
+
+def test_concurrent_puts_of_one_image_dont_collide(tmp_path: Path) -> None:
+    cache = ImageDiskCache(str(tmp_path), 1024 * 1024)
+    ref = ImageRef("server", "image.png", "", "output")
+    data = solidPng(16, 16)
+    errors: List[BaseException] = []
+
+    def put() -> None:
+        try:
+            for _ in range(50):
+                cache.put(ref, data)
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=put) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cache.get(ref) == data
+    assert os.listdir(tmp_path) == [os.path.basename(cache.path(ref) or "")]
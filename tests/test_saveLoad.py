@@ -0,0 +1,67 @@
+from pathlib import Path
+import json
+
+from benchmarks.groups import grouped
+from benchmarks.throughput import connect, txt2img
+from node import NodeEdge, SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from nodeSlots.slots.comboSlot import ComboSlot
+from specialNodes.nodes.groupNode import GroupNode
+from specialNodes.nodes.node_reroute import RerouteNode
+
+
+def roundTrip(
+    factory: ComfyFactory, collection: SceneCollection, path: Path
+) -> SceneCollection:
+    """Saves `collection` to a file and loads it again, like the work folder."""
+    path.write_text(collection.toJSON())
+    loaded = SceneCollection(factory)
+    loaded.fromJSON(path.read_text())
+    return loaded
+
+
+def canonical(collection: SceneCollection) -> str:
+    return json.dumps(collection.compile().prompt, sort_keys=True)
+
+
+def test_save_load_keeps_uids_and_values(factory: ComfyFactory, tmp_path: Path) -> None:
+    collection = txt2img(factory)
+    nodes = {n.nodeClass: n for n in collection.rootScene.nodes}
+    reroute = factory.loadNode("Reroute")
+    assert isinstance(reroute, RerouteNode)
+    NodeEdge(
+        collection.rootScene,
+        nodes["VAEDecode"].outputs[0].socket,
+        reroute.rerouteSlot.socket,
+    )
+    save = nodes["SaveImage"]
+    images = [s for s in save.inputs if s.name == "images"][0]
+    NodeEdge(collection.rootScene, reroute.rerouteSlot.socket, images.socket)
+    primitive = factory.loadNode("IntegerPrimitive")
+    connect(collection, primitive, 0, nodes["KSampler"], "steps")
+    primitive.outputs[0].content = 33
+    text = [s for s in nodes["CLIPTextEncode"].inputs if s.name == "text"][0]
+    text.content = "a lighthouse"
+    ckpt = [s for s in nodes["CheckpointLoaderSimple"].inputs if s.name == "ckpt_name"][
+        0
+    ]
+    assert isinstance(ckpt, ComboSlot)
+    ckpt.grItem.value = ckpt.items[-1]
+
+    loaded = roundTrip(factory, collection, tmp_path / "tree.pnt")
+    assert {n.uid for n in loaded.rootScene.nodes} == {
+        n.uid for n in collection.rootScene.nodes
+    }
+    assert canonical(loaded) == canonical(collection)
+    assert loaded.undoStack.count() == 0
+
+
+def test_save_load_keeps_groups(factory: ComfyFactory, tmp_path: Path) -> None:
+    collection = grouped(factory, 3, 2)
+
+    loaded = roundTrip(factory, collection, tmp_path / "groups.pnt")
+    assert [s.name for s in loaded.scenes] == [s.name for s in collection.scenes]
+    groupNodes = [n for n in loaded.rootScene.nodes if isinstance(n, GroupNode)]
+    assert len(groupNodes) == 2
+    assert all(n.groupScene is loaded.scenes[0] for n in groupNodes)
+    assert canonical(loaded) == canonical(collection)
@@ -0,0 +1,59 @@
+from typing import Any, Dict, Iterator
+
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.fakeComfy import FakeComfyServer
+from server import ComfyConnection, PromptDispatcher, PromptSubmissionQueue
+
+prompt = {"1": {"class_type": "EmptyLatentImage", "inputs": {"width": 512}}}
+
+
+def test_cancelled_prompt_is_sent_again(
+    app: QApplication, fakeServer: FakeComfyServer
+) -> None:
+    dispatcher = PromptDispatcher([ComfyConnection(fakeServer.serverAddress)])
+    queue = PromptSubmissionQueue(dispatcher)
+    try:
+        first = queue.submit(prompt)
+        queue.cancel(first)
+        second = queue.submit(prompt)
+        assert second is not first
+        assert queue.submit(prompt) is second
+        queue.waitForDone()
+        app.processEvents()
+        assert not second.cancelRequested
+    finally:
+        dispatcher.close()
+
+
+def test_submit_all_pulls_prompts_in_batches(
+    app: QApplication, fakeServer: FakeComfyServer
+) -> None:
+    dispatcher = PromptDispatcher([ComfyConnection(fakeServer.serverAddress)])
+    queue = PromptSubmissionQueue(dispatcher, concurrency=1)
+    pulled = 0
+
+    def prompts(count: int) -> Iterator[Dict[str, Any]]:
+        nonlocal pulled
+        for width in range(count):
+            pulled += 1
+            yield {"1": {"class_type": "EmptyLatentImage", "inputs": {"width": width}}}
+
+    try:
+        feed = queue.submitAll(prompts(10), batchSize=3, maxQueued=4)
+        # nothing is pulled on the caller's stack
+        assert pulled == 0
+        app.processEvents()
+        assert 0 < pulled <= 4
+        # every round the workers drain the queue and the feed refills it
+        for _ in range(10):
+            if feed.done:
+                break
+            queue.waitForDone()
+            app.processEvents()
+        assert feed.done
+        assert pulled == 10
+        assert [s.ticket for s in feed.submissions] == list(range(10))
+        queue.waitForDone()
+    finally:
+        dispatcher.close()
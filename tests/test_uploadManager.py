@@ -0,0 +1,36 @@
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from benchmarks.fakeComfy import FakeComfyServer, solidPng
+from server import ComfyConnection, UploadManager
+
+
+def test_image_removed_on_the_server_is_uploaded_again(
+    fakeServer: FakeComfyServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "input.png"
+    path.write_bytes(solidPng(8, 8))
+    connection = ComfyConnection(fakeServer.serverAddress)
+
+    # the fake server doesn't take uploads, put the file where /view finds it
+    def uploadImage(path: str, filename: str, **kwargs: Any) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            fakeServer.images[filename] = f.read()
+        return {"name": filename, "subfolder": "", "type": "input"}
+
+    monkeypatch.setattr(connection, "uploadImage", uploadImage)
+    mapPath = str(tmp_path / "uploads.json")
+    try:
+        name = UploadManager(mapPath).ensureUploaded(connection, str(path))
+        manager = UploadManager(mapPath)
+        assert manager.ensureUploaded(connection, str(path)) == name
+        assert manager.stats()["skipped"] == 1
+
+        del fakeServer.images[name]
+        assert manager.ensureUploaded(connection, str(path)) == name
+        assert manager.stats()["uploads"] == 1
+        assert name in fakeServer.images
+    finally:
+        connection.close()
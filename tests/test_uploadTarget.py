@@ -0,0 +1,24 @@
+from benchmarks.throughput import connect
+from node import SceneCollection
+from node.factory.comfyFactory import ComfyFactory
+from nodeSlots.slots.comboSlot import ComboSlot
+from server import PromptValidator
+
+
+def test_uploaded_name_passes_validation(factory: ComfyFactory) -> None:
+    collection = SceneCollection(factory)
+    load = factory.loadNode("LoadImage")
+    save = factory.loadNode("SaveImage")
+    connect(collection, load, 0, save, "images")
+    slot = [s for s in load.inputs if s.name == "image"][0]
+    assert isinstance(slot, ComboSlot)
+    name = "0123456789abcdef0123456789abcdef.png"
+
+    # what the main window does once the first server has the file
+    slot.addItem(name)
+    slot.grItem.value = name
+    factory.addComboOption("LoadImage", "image", name)
+
+    promptManager = collection.compile()
+    assert promptManager.prompt[load.getNodeAddress()]["inputs"]["image"] == name
+    assert PromptValidator(factory.nodeDefinitions).validate(promptManager) == []